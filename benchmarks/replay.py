@@ -0,0 +1,442 @@
+"""
+Replays a stream of gateway events into `DiscordBot` and reports how fast the handlers are.
+
+The handlers run for real (database layer included) against stub Discord objects, so no token and
+no network are needed. By default the database is a SQLite stand-in; pass `--mysql` to use a real
+(throwaway!) MySQL database instead.
+
+Usage (from the repository root):
+    python -m benchmarks.replay --events 20000
+    python -m benchmarks.replay --save stream.ndjson      # record the synthetic stream
+    python -m benchmarks.replay --load stream.ndjson      # replay a recorded stream
+    python -m benchmarks.replay --rest-latency 50 --concurrency 64 --json results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+
+import mysql.connector
+
+from benchmarks.sqlite_backend import SQLiteServer
+from benchmarks.stubs import (Sample, StubEmoji, StubReactionPayload, World, CountingConnection, counters,
+                              current_sample)
+
+EVENT_TYPES = ["message", "reaction_add", "reaction_remove", "member_join"]
+DEFAULT_MIX = {"message": 0.70, "reaction_add": 0.15, "reaction_remove": 0.10, "member_join": 0.05}
+
+STAR = "⭐"
+ROLE_EMOJIS = ["🔴", "🟢", "🔵"]
+WORDS = ["ciao", "hello", "scacchi", "torneo", "partita", "gg", "lol", "domani", "stasera", "bot", "server", "meme"]
+
+
+def generate(n_events, n_guilds=3, n_users=500, mix=None, seed=0):
+    """
+    Builds a synthetic but plausible event stream: mostly chat, stars concentrated on recent
+    messages (so boards are crossed), reaction roles, removals of earlier reactions and joins.
+
+    Returns:
+        tuple: The setup (guild settings and reaction-role messages) and the list of events.
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+
+    guilds = []
+    role_messages = []
+    for g in range(n_guilds):
+        guild_id = 1000 + g
+        base = guild_id * 100
+        guilds.append({
+            "guild_id": guild_id,
+            "chat_channels": [base + 1, base + 2, base + 3],
+            "board_channel": base + 10,
+            "level_channel": base + 11,
+            "announce_channel": base + 12,
+            "min_reactions": 3,
+            "join_role": base + 50,
+        })
+        for m in range(2):
+            role_messages.append({
+                "guild_id": guild_id,
+                "channel_id": base + 20,
+                "message_id": base * 1000 + m,
+                "roles": {emoji: base + 60 + m * 10 + i for i, emoji in enumerate(ROLE_EMOJIS)},
+            })
+
+    events = []
+    recent = defaultdict(list)  # guild_id -> recent (channel_id, message_id)
+    active = []  # reactions that can be removed
+    next_message = 10 ** 12
+    next_user = 10 ** 9
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+
+    while len(events) < n_events:
+        kind = rng.choices(kinds, weights)[0]
+        guild = rng.choice(guilds)
+        guild_id = guild["guild_id"]
+        user_id = 10 ** 6 + rng.randrange(n_users)
+
+        if kind == "reaction_remove" and not active:
+            kind = "reaction_add"
+        if kind == "reaction_add" and not recent[guild_id] and rng.random() < 0.6:
+            kind = "message"
+
+        if kind == "message":
+            next_message += 1
+            channel_id = rng.choice(guild["chat_channels"])
+            recent[guild_id] = (recent[guild_id] + [(channel_id, next_message)])[-20:]
+            events.append({
+                "type": "message", "guild_id": guild_id, "channel_id": channel_id, "message_id": next_message,
+                "author_id": user_id, "content": " ".join(rng.choices(WORDS, k=rng.randint(1, 25))),
+            })
+        elif kind == "reaction_add":
+            if recent[guild_id] and rng.random() < 0.6:
+                channel_id, message_id = rng.choice(recent[guild_id])
+                emoji = STAR
+            else:
+                role_message = rng.choice([m for m in role_messages if m["guild_id"] == guild_id])
+                channel_id, message_id = role_message["channel_id"], role_message["message_id"]
+                emoji = rng.choice(ROLE_EMOJIS)
+            event = {"type": "reaction_add", "guild_id": guild_id, "channel_id": channel_id,
+                     "message_id": message_id, "user_id": user_id, "emoji": emoji}
+            active.append(event)
+            events.append(event)
+        elif kind == "reaction_remove":
+            added = active.pop(rng.randrange(len(active)))
+            events.append({**added, "type": "reaction_remove"})
+        else:
+            next_user += 1
+            events.append({"type": "member_join", "guild_id": guild_id, "user_id": next_user})
+
+    return {"guilds": guilds, "role_messages": role_messages}, events
+
+
+def save(path, setup, events):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "setup", **setup}) + "\n")
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def load(path):
+    setup, events = {"guilds": [], "role_messages": []}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if event["type"] == "setup":
+                setup = {"guilds": event.get("guilds", []), "role_messages": event.get("role_messages", [])}
+            else:
+                events.append(event)
+    return setup, events
+
+
+def install_database(args):
+    """Routes every connection of the pool to the chosen backend, counting the statements they run."""
+    if args.mysql:
+        real_connect = mysql.connector.connect
+
+        def connect(**connect_args):
+            connect_args.update(host=args.mysql_host, user=args.mysql_user, database=args.mysql_database)
+            if args.mysql_password is not None:
+                connect_args["password"] = args.mysql_password
+            return CountingConnection(real_connect(**connect_args))
+    else:
+        server = SQLiteServer(args.sqlite or os.path.join(tempfile.mkdtemp(prefix="discordbot-bench-"), "bench.db"))
+
+        def connect(**connect_args):
+            return CountingConnection(server.connect(**connect_args))
+
+    mysql.connector.connect = connect
+
+
+def import_bot():
+    """Imports bot.py, providing a placeholder `config` module when there is no local one."""
+    try:
+        importlib.import_module("config")
+    except ImportError:
+        config = types.ModuleType("config")
+        config.TOKEN = ""
+        config.PREFIX = "!"
+        config.GUILD_ID = [1000]
+        sys.modules["config"] = config
+    return importlib.import_module("bot")
+
+
+def make_bot_class(bot_module):
+    class ReplayBot(bot_module.DiscordBot):
+        """`DiscordBot` whose Discord lookups and REST calls are answered by a `World`."""
+        def __init__(self, world):
+            super().__init__()
+            self.world = world
+
+        @property
+        def user(self):
+            return self.world.bot_user
+
+        def get_guild(self, guild_id):
+            return self.world.guild(guild_id)
+
+        async def fetch_guild(self, guild_id, *, with_counts=True):
+            await self.world.rest()
+            return self.world.guild(guild_id)
+
+        def get_channel(self, channel_id):
+            return self.world.channels.get(channel_id)
+
+        async def fetch_channel(self, channel_id):
+            await self.world.rest()
+            return self.world.channels.get(channel_id)
+
+    return ReplayBot
+
+
+async def seed(bot_module, world, setup):
+    """Configures the guilds and reaction-role messages of the stream through the bot's own systems."""
+    for guild in setup["guilds"]:
+        guild_id = guild["guild_id"]
+        for channel_id in guild["chat_channels"]:
+            world.channel(channel_id, guild_id)
+        for key in ("board_channel", "level_channel", "announce_channel"):
+            world.channel(guild[key], guild_id)
+
+        config = bot_module.guild_config
+        await config.set_board_channel(guild_id, guild["board_channel"])
+        await config.set_min_reactions(guild_id, guild["min_reactions"])
+        await config.set_channel(guild_id, guild["level_channel"], "level")
+        await config.set_channel(guild_id, guild["announce_channel"], "announce")
+        await config.set_join_role(guild_id, guild["join_role"])
+        await config.set_description(guild_id, "Benvenuto %u!")
+
+    roles_system = bot_module.roles_system
+    for message in setup["role_messages"]:
+        world.channel(message["channel_id"], message["guild_id"])
+        if not roles_system.is_role_message(message["message_id"]):
+            await roles_system.aio.create_message(message["message_id"])
+        for emoji, role_id in message["roles"].items():
+            if roles_system.get_role(message["message_id"], emoji) is None:
+                await roles_system.aio.add_role(message["message_id"], role_id, emoji)
+
+
+def build(bot, world, event):
+    """Turns a recorded event into the handler to call and its stub argument."""
+    kind = event["type"]
+    guild = world.guild(event["guild_id"])
+
+    if kind == "message":
+        channel = world.channel(event["channel_id"], guild.id)
+        author = guild.member(event["author_id"])
+        message = channel.message(event["message_id"], author, event["content"])
+        return bot.on_message, message
+
+    if kind in ("reaction_add", "reaction_remove"):
+        world.channel(event["channel_id"], guild.id)
+        emoji = event["emoji"]
+        payload = StubReactionPayload(
+            message_id=event["message_id"],
+            channel_id=event["channel_id"],
+            guild_id=guild.id,
+            user_id=event["user_id"],
+            emoji=StubEmoji(id=emoji) if isinstance(emoji, int) else StubEmoji(name=emoji),
+            event_type="REACTION_ADD" if kind == "reaction_add" else "REACTION_REMOVE",
+            member=guild.member(event["user_id"]) if kind == "reaction_add" else None
+        )
+        handler = bot.on_raw_reaction_add if kind == "reaction_add" else bot.on_raw_reaction_remove
+        return handler, payload
+
+    if kind == "member_join":
+        return bot.on_member_join, guild.member(event["user_id"])
+
+    raise ValueError(f"Unknown event type: {kind}")
+
+
+async def replay(bot, world, events, concurrency):
+    """Feeds the events to their handlers, at most `concurrency` at a time, and measures each of them."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def run(event):
+        sample = Sample(event["type"])
+        current_sample.set(sample)
+        handler, argument = build(bot, world, event)
+        start = time.perf_counter()
+        try:
+            await handler(argument)
+        except Exception as e:
+            sample.error = f"{type(e).__name__}: {e}"
+        finally:
+            sample.latency = time.perf_counter() - start
+            samples.append(sample)
+            semaphore.release()
+
+    tasks = []
+    for event in events:
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(run(event)))
+    await asyncio.gather(*tasks)
+
+    # Let the tasks spawned by the handlers (e.g. level-up announcements) finish
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and task.get_name().startswith("discord.py")]
+    if pending:
+        await asyncio.wait(pending, timeout=10)
+    return samples
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples, elapsed):
+    by_kind = defaultdict(list)
+    for sample in samples:
+        by_kind[sample.kind].append(sample)
+
+    rows = {}
+    for kind in EVENT_TYPES + sorted(set(by_kind) - set(EVENT_TYPES)) + ["total"]:
+        group = samples if kind == "total" else by_kind.get(kind)
+        if not group:
+            continue
+        latencies = [sample.latency for sample in group]
+        rows[kind] = {
+            "count": len(group),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "queries_per_event": sum(sample.queries for sample in group) / len(group),
+            "rest_per_event": sum(sample.rest for sample in group) / len(group),
+            "errors": sum(1 for sample in group if sample.error),
+        }
+
+    return {
+        "events": len(samples),
+        "seconds": elapsed,
+        "events_per_second": len(samples) / elapsed if elapsed else 0.0,
+        "background_queries": counters.background_queries,
+        "handlers": rows,
+    }
+
+
+def report(result, errors):
+    print(f"{'event':<16}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'queries/ev':>12}{'rest/ev':>10}{'errors':>8}")
+    for kind, row in result["handlers"].items():
+        print(f"{kind:<16}{row['count']:>8}{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}"
+              f"{row['queries_per_event']:>12.2f}{row['rest_per_event']:>10.2f}{row['errors']:>8}")
+    print(f"\n{result['events']} events in {result['seconds']:.2f}s -> {result['events_per_second']:.0f} events/s"
+          f" ({result['background_queries']} queries outside handlers)")
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+        print(f"  {count}x {error}")
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown event type '{kind}'")
+        mix[kind] = float(weight)
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay gateway events into DiscordBot and measure the handlers.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--events", type=int, default=10000, help="number of synthetic events (default: 10000)")
+    source.add_argument("--load", metavar="FILE", help="replay a recorded NDJSON stream instead")
+    parser.add_argument("--save", metavar="FILE", help="write the synthetic stream to an NDJSON file")
+    parser.add_argument("--guilds", type=int, default=3)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--mix", type=parse_mix, help="event weights, e.g. message=0.5,reaction_add=0.3")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=200, help="events replayed before measuring (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=16, help="events handled at the same time (default: 16)")
+    parser.add_argument("--rest-latency", type=float, default=0.0, metavar="MS", help="simulated Discord REST latency")
+    parser.add_argument("--blacklist-size", type=int, default=1000, help="number of random blacklisted words")
+    parser.add_argument("--sqlite", metavar="FILE", help="SQLite file to use (default: a new temporary one)")
+    parser.add_argument("--mysql", action="store_true", help="use a real MySQL server instead of SQLite")
+    parser.add_argument("--mysql-host", default="localhost")
+    parser.add_argument("--mysql-user", default="root")
+    parser.add_argument("--mysql-password")
+    parser.add_argument("--mysql-database", default="discordbot_bench")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON, to compare runs")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's logging output")
+    return parser.parse_args(argv)
+
+
+async def run_benchmark(args, bot_module, setup, events):
+    from utils.blacklist import BlacklistMatcher
+
+    # A realistic blacklist that never matches the synthetic chat, so every message is fully scanned
+    rng = random.Random(args.seed)
+    words = ["".join(rng.choices("qxzjkw", k=rng.randint(5, 9))) for _ in range(args.blacklist_size)]
+    blacklist_path = os.path.join(tempfile.mkdtemp(prefix="discordbot-bench-"), "blacklist.json")
+    with open(blacklist_path, "w", encoding="utf-8") as f:
+        json.dump({"words": words}, f)
+    bot_module.blacklist = BlacklistMatcher(blacklist_path, casefold=True, accents=True)
+
+    world = World(rest_latency=args.rest_latency / 1000)
+    bot = make_bot_class(bot_module)(world)
+
+    async with bot:
+        await bot.setup_hook()
+        await seed(bot_module, world, setup)
+
+        warmup, measured = events[:args.warmup], events[args.warmup:]
+        await replay(bot, world, warmup, args.concurrency)
+
+        counters.background_queries = 0
+        start = time.perf_counter()
+        samples = await replay(bot, world, measured, args.concurrency)
+        elapsed = time.perf_counter() - start
+
+    return samples, elapsed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.load:
+        setup, events = load(args.load)
+    else:
+        setup, events = generate(args.events + args.warmup, args.guilds, args.users, args.mix, args.seed)
+        if args.save:
+            save(args.save, setup, events)
+
+    install_database(args)
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    with output:
+        bot_module = import_bot()
+        samples, elapsed = asyncio.run(run_benchmark(args, bot_module, setup, events))
+        bot_module.close_pools()
+
+    logging.disable(logging.NOTSET)
+    result = summarize(samples, elapsed)
+    errors = defaultdict(int)
+    for sample in samples:
+        if sample.error:
+            errors[sample.error] += 1
+    report(result, errors)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import re
+import sqlite3
+import threading
+
+from mysql.connector import errors
+
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# MySQL-only syntax rewritten into its SQLite equivalent, applied in order
+REWRITES = [
+    (re.compile(r"\bBIGINT\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bAUTO_INCREMENT\b", re.I), ""),
+    (re.compile(r"\bENUM\s*\([^)]*\)", re.I), "TEXT"),
+    (re.compile(r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.I), ""),
+    (re.compile(r"\b(DEFAULT\s+)?CHARACTER\s+SET\s+\w+", re.I), ""),
+    (re.compile(r"\bCOLLATE\s+\w+", re.I), ""),
+    (re.compile(r"\bENGINE\s*=\s*\w+", re.I), ""),
+    (re.compile(r",\s*(INDEX|KEY)\s*\w*\s*\([^)]*\)", re.I), ""),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bBINARY\s+", re.I), ""),
+    (re.compile(r"\bFOR\s+UPDATE\b", re.I), ""),
+    (re.compile(r"\bGREATEST\s*\(", re.I), "MAX("),
+    (re.compile(r"\bLEAST\s*\(", re.I), "MIN("),
+    (re.compile(r"\b(UTC_TIMESTAMP|NOW)\s*\(\s*\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I), r"excluded.\1"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r";\s*$"), ""),
+]
+
+PRIMARY_KEY_QUERY = re.compile(r"information_schema\.KEY_COLUMN_USAGE", re.I)
+DDL = re.compile(r"^\s*(CREATE|ALTER|DROP)\b", re.I)
+INSERT = re.compile(r"^\s*INSERT\b", re.I)
+
+
+def translate(query: str) -> str:
+    """
+    Rewrites a MySQL statement as used by the `*System` classes into SQLite's dialect.
+
+    Only the syntax used by this bot is covered. Note that SQLite evaluates the assignments of an
+    upsert against the old row, while MySQL's `ON DUPLICATE KEY UPDATE` applies them left to right.
+    """
+    for pattern, replacement in REWRITES:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+class SQLiteCursor:
+    """Just enough of `MySQLCursor` for `BaseDatabase`, backed by a sqlite3 cursor."""
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+        self._rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        if PRIMARY_KEY_QUERY.search(query):
+            # Only asked for by the primary key migrations: answer from SQLite's own catalog
+            columns = self._cursor.execute(f"PRAGMA table_info({params[0]})").fetchall()
+            self._rows = [(column[1],) for column in sorted(columns, key=lambda c: c[5]) if column[5]]
+            self.rowcount = len(self._rows)
+            return
+
+        sql = translate(query)
+        self._connection._last_insert_id = None
+        try:
+            self._cursor.execute(sql, tuple(params or ()))
+        except sqlite3.Error as e:
+            if DDL.match(sql):
+                # Schema the stand-in can't express (e.g. MySQL-only indexes) is skipped, not fatal
+                logger.warning(f"SQLite stand-in skipped a schema statement: {e}")
+                self._rows, self.rowcount = [], 0
+                return
+            raise errors.DatabaseError(msg=f"{e} in: {sql.strip()}") from e
+
+        self._rows = self._cursor.fetchall() if self._cursor.description else []
+        self.rowcount = self._cursor.rowcount if not self._cursor.description else len(self._rows)
+        explicit = self._connection._last_insert_id
+        if explicit is not None:
+            self.lastrowid = explicit
+        elif INSERT.match(sql) and self.rowcount > 1:
+            # MySQL reports the ID of the first row of a multi-row insert, SQLite the last one
+            self.lastrowid = self._cursor.lastrowid - self.rowcount + 1
+        else:
+            self.lastrowid = self._cursor.lastrowid
+
+    def executemany(self, query, seq_params):
+        for params in seq_params:
+            self.execute(query, params)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    Just enough of `MySQLConnection` for `ConnectionPool` and `BaseDatabase`, backed by a SQLite file.
+
+    Every pooled connection opens its own sqlite3 connection to the same file, so concurrent
+    queries from the database executor behave like separate MySQL sessions.
+    """
+    def __init__(self, path, busy_timeout=30):
+        self._db = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.create_function("LAST_INSERT_ID", 1, self._set_last_insert_id)
+        self._last_insert_id = None
+        self.in_transaction = False
+
+    def _set_last_insert_id(self, value):
+        # LAST_INSERT_ID(expr): remember expr for `lastrowid`, like MySQL's OK packet
+        self._last_insert_id = value
+        return value
+
+    def cursor(self, buffered=True):
+        return SQLiteCursor(self)
+
+    def start_transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        self.in_transaction = True
+
+    def commit(self):
+        if self.in_transaction:
+            self._db.execute("COMMIT")
+        self.in_transaction = False
+
+    def rollback(self):
+        if self.in_transaction:
+            self._db.execute("ROLLBACK")
+        self.in_transaction = False
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def reconnect(self, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        self._db.close()
+
+
+class SQLiteServer:
+    """
+    Stand-in for a MySQL server: hands out `SQLiteConnection`s to the same database file.
+
+    Attributes:
+        path (str): The SQLite database file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def connect(self, **connect_args):
+        with self._lock:
+            return SQLiteConnection(self.path)
@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+# Sample of the event currently being replayed, so queries and REST calls are charged to it
+current_sample = contextvars.ContextVar("current_sample", default=None)
+
+
+@dataclass
+class Sample:
+    """
+    Measurements of a single replayed event.
+
+    Attributes:
+        kind (str): The event type (e.g. "message").
+        latency (float): Seconds spent in the handler.
+        queries (int): Statements sent to the database by the handler (and the tasks it spawned).
+        rest (int): Discord REST calls made by the handler.
+        error (str): The exception raised by the handler, if any.
+    """
+    kind: str
+    latency: float = 0.0
+    queries: int = 0
+    rest: int = 0
+    error: Optional[str] = None
+
+
+class Counters:
+    """Totals of queries and REST calls, including the ones made outside of any event (e.g. periodic flushes)."""
+    def __init__(self):
+        self.queries = 0
+        self.background_queries = 0
+        self.rest = 0
+        self._lock = threading.Lock()
+
+    def query(self):
+        sample = current_sample.get()
+        with self._lock:
+            self.queries += 1
+            if sample is None:
+                self.background_queries += 1
+            else:
+                sample.queries += 1
+
+    def rest_call(self):
+        sample = current_sample.get()
+        with self._lock:
+            self.rest += 1
+            if sample is not None:
+                sample.rest += 1
+
+
+counters = Counters()
+
+
+class CountingCursor:
+    """Wraps a database cursor to count the statements it runs."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=(), *args, **kwargs):
+        counters.query()
+        return self._cursor.execute(query, params, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    """Wraps a database connection so that every cursor it opens is counted."""
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class World:
+    """
+    The fake Discord state the replayed events refer to. Guilds, channels, members and messages
+    are created on first reference, and every REST call waits `rest_latency` seconds.
+
+    Attributes:
+        rest_latency (float): Simulated round-trip of a Discord REST call, in seconds.
+        bot_user (StubUser): The bot's own user.
+    """
+    def __init__(self, rest_latency=0.0, bot_user_id=1):
+        self.rest_latency = rest_latency
+        self.bot_user = StubUser(self, bot_user_id, "bench-bot", bot=True)
+        self.guilds = {}
+        self.channels = {}
+        self._ids = itertools.count(10 ** 15)
+
+    def next_id(self):
+        return next(self._ids)
+
+    async def rest(self):
+        counters.rest_call()
+        if self.rest_latency:
+            await asyncio.sleep(self.rest_latency)
+        else:
+            await asyncio.sleep(0)
+
+    def guild(self, guild_id) -> "StubGuild":
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = StubGuild(self, guild_id)
+        return guild
+
+    def channel(self, channel_id, guild_id) -> "StubChannel":
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = StubChannel(self, channel_id, self.guild(guild_id))
+        return channel
+
+
+@dataclass
+class StubAsset:
+    url: str
+
+
+class StubUser:
+    def __init__(self, world, user_id, name=None, bot=False):
+        self.world = world
+        self.id = user_id
+        self.name = name or f"user{user_id}"
+        self.display_name = self.name
+        self.bot = bot
+        self.avatar = None
+        self.default_avatar = StubAsset(f"https://cdn.discordapp.com/embed/avatars/{user_id % 6}.png")
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    @property
+    def display_avatar(self):
+        return self.avatar or self.default_avatar
+
+    async def edit(self, **kwargs):
+        await self.world.rest()
+
+    def __eq__(self, other):
+        return isinstance(other, StubUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class StubMember(StubUser):
+    def __init__(self, world, user_id, guild, bot=False):
+        super().__init__(world, user_id, bot=bot)
+        self.guild = guild
+        self.roles = []
+
+    async def add_roles(self, *roles, reason=None):
+        await self.world.rest()
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        await self.world.rest()
+        self.roles = [role for role in self.roles if role not in roles]
+
+
+@dataclass(eq=False)
+class StubRole:
+    id: int
+    guild: "StubGuild"
+
+    @property
+    def name(self):
+        return f"role{self.id}"
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+
+class StubGuild:
+    def __init__(self, world, guild_id):
+        self.world = world
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.members = {}
+        self.roles = {}
+
+    def member(self, user_id) -> StubMember:
+        member = self.members.get(user_id)
+        if member is None:
+            member = self.members[user_id] = StubMember(self.world, user_id, self)
+        return member
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+    async def fetch_member(self, user_id):
+        await self.world.rest()
+        return self.member(user_id)
+
+    def get_role(self, role_id):
+        role = self.roles.get(role_id)
+        if role is None:
+            role = self.roles[role_id] = StubRole(role_id, self)
+        return role
+
+    async def fetch_role(self, role_id):
+        await self.world.rest()
+        return self.get_role(role_id)
+
+
+@dataclass(eq=False)
+class StubAttachment:
+    filename: str
+    url: str
+
+    async def read(self):
+        return b""
+
+
+class StubMessage:
+    def __init__(self, world, message_id, channel, author, content=""):
+        self.world = world
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.attachments = []
+        self.embeds = []
+
+    @property
+    def jump_url(self):
+        return f"https://discord.com/channels/{self.guild.id}/{self.channel.id}/{self.id}"
+
+    async def delete(self, delay=None):
+        await self.world.rest()
+        self.channel.messages.pop(self.id, None)
+
+    async def edit(self, **kwargs):
+        await self.world.rest()
+        self.content = kwargs.get("content", self.content)
+
+
+class StubChannel:
+    def __init__(self, world, channel_id, guild):
+        self.world = world
+        self.id = channel_id
+        self.guild = guild
+        self.name = f"channel{channel_id}"
+        self.messages = {}
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    def message(self, message_id, author=None, content="") -> StubMessage:
+        message = self.messages.get(message_id)
+        if message is None:
+            author = author or self.guild.member(self.world.bot_user.id + 1)
+            message = self.messages[message_id] = StubMessage(self.world, message_id, self, author, content)
+        return message
+
+    async def send(self, content=None, embed=None, **kwargs):
+        await self.world.rest()
+        return self.message(self.world.next_id(), self.world.bot_user, content or "")
+
+    async def fetch_message(self, message_id):
+        await self.world.rest()
+        return self.message(message_id)
+
+    def get_partial_message(self, message_id):
+        return self.message(message_id)
+
+
+@dataclass
+class StubEmoji:
+    name: str
+    id: Optional[int] = None
+
+
+@dataclass
+class StubReactionPayload:
+    """Mirrors the attributes of `discord.RawReactionActionEvent` read by the handlers."""
+    message_id: int
+    channel_id: int
+    guild_id: int
+    user_id: int
+    emoji: StubEmoji
+    event_type: str
+    member: Optional[StubMember] = None
+    burst: bool = False
@@ -2,26 +2,39 @@ import asyncio
 from dataclasses import dataclass
 
 from cogs.basic import Basic
+from cogs.board import Board
 from cogs.channel import Channel
 from cogs.chess import ChessEvent
 from cogs.roles import Roles
+from cogs.stats import Stats
 import discord
 from discord.ext import commands
 from cogs.level import LevelCog
+from cogs.moderation import Moderation
 import config
 from config import GUILD_ID
 from utils import roles_system
+from utils.blacklist import BlacklistMatcher
+from utils.board_reconciler import BoardReconciler
 from utils.chess_db import ChessSystem
+from utils.database import close_pools
 from utils.debug import Logger
 import os
+from utils.guild_config import GuildConfigCache
+from utils.level_rewards import LevelRewards
 from utils.level_system import LevelSystem
+from utils.metrics import InstrumentedCommandTree, metrics, rest_trace
 from utils.embed_factory import EmbedFactory
-import json
-import re
+from utils.moderation_system import ModerationSystem
 from utils.roles_system import RoleSystem
+from utils.starboard import Starboard
 from utils.server_system import ServerSystem
+from utils.rank_index import RankIndex
+from utils.resolver import Resolver
+from utils.xp_accumulator import XPAccumulator
 from utils.board_system import BoardSystem
 from views.ticket_view import TicketView, TicketControlView
+from views.chess_view import match_view
 
 # Initilize logger
 logger = Logger(os.path.basename(__file__).replace(".py", ""))
@@ -69,24 +82,38 @@ chess_system = ChessSystem(
     database=database
 )
 
+moderation_system = ModerationSystem(
+    host=host,
+    user=user,
+    password=password,
+    database=database
+)
+
+guild_config = GuildConfigCache(server_system, board_system)
+rank_index = RankIndex(level_system)
+level_rewards = LevelRewards(server_system)
+xp_accumulator = XPAccumulator(level_system, rank_index=rank_index)
+
+# XP earned with every message
+MESSAGE_XP = 10
+
 initial_extensions = [
     "cogs.basic",
     "cogs.embed",
     "cogs.group_commands",
-    "cogs.test",
-    "cogs.moderation"
+    "cogs.test"
 ]
 
-blacklist = []
-
-with open('configs/blacklist.json') as f:
-    d = json.load(f)
-    for word in d["words"]:
-        blacklist.append(word)
+blacklist = BlacklistMatcher('configs/blacklist.json', casefold=True, accents=True)
 
 class DiscordBot(commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix=config.PREFIX, intents=intents)
+        # Every REST call is traced and charged to the handler being measured
+        super().__init__(command_prefix=config.PREFIX, intents=intents, tree_cls=InstrumentedCommandTree,
+                         http_trace=rest_trace())
+        self.resolver = Resolver(self)
+        self.starboard = Starboard(self, board_system, guild_config, self.resolver)
+        self.reconciler = BoardReconciler(board_system, self.starboard, self.resolver)
 
     async def setup_hook(self):
         # List here all your cogs, they will be automatically loaded
@@ -98,14 +125,20 @@ class DiscordBot(commands.Bot):
                 logger.error(f"Failed to load extension {ext}", exc_info=e)
         
         try:
-            await self.add_cog(LevelCog(self, level_system))
+            await self.add_cog(LevelCog(self, level_system, xp_accumulator))
             logger.info(f"Loaded extension: cogs.level")
             await self.add_cog(Roles(self, roles_system))
             logger.info("Loaded extension: cogs.roles")
-            await self.add_cog(Channel(self, server_system, board_system))
+            await self.add_cog(Channel(self, server_system, guild_config, level_rewards))
             logger.info("Loaded extension: cogs.channel")
+            await self.add_cog(Moderation(self, moderation_system, guild_config))
+            logger.info("Loaded extension: cogs.moderation")
             await self.add_cog(ChessEvent(self, chess_system))
             logger.info("Loaded extension: cogs.chess")
+            await self.add_cog(Stats(self, metrics, self.resolver))
+            logger.info("Loaded extension: cogs.stats")
+            await self.add_cog(Board(self, self.reconciler))
+            logger.info("Loaded extension: cogs.board")
         except Exception as e:
             logger.error(f"Failed to load extension", exc_info=e)
 
@@ -120,6 +153,26 @@ class DiscordBot(commands.Bot):
         self.add_view(TicketView())
         self.add_view(TicketControlView())
 
+        try:
+            # Match buttons of the round in progress, all from one query
+            active_matches = await chess_system.aio.get_active_matches()
+            for match in active_matches:
+                self.add_view(match_view(chess_system, *match))
+            logger.info(f"Restored the views of {len(active_matches)} chess matches")
+        except Exception as e:
+            logger.error("Failed to restore the chess match views", exc_info=e)
+
+        xp_accumulator.start()
+
+    async def close(self):
+        try:
+            # Write the XP still buffered in memory before the connections go away
+            await xp_accumulator.close()
+        except Exception as e:
+            logger.error("Failed to flush XP on shutdown", exc_info=e)
+        await super().close()
+
+    @metrics.instrument()
     async def on_ready(self):
         logger.info(f"We have logged in as {bot.user.name} (ID: {bot.user.id}")
         logger.info(f"Connected to {len(bot.guilds)} guild(s)")
@@ -150,68 +203,69 @@ class DiscordBot(commands.Bot):
         except Exception as e:
             logger.error("Failed to update presence", exc_info=e)
 
+    @metrics.instrument()
     async def on_message(self, message: discord.Message):
         if message.author.bot:
             return
         
-        res = any(elem in message.content for elem in blacklist)
-        if res:
+        word = blacklist.search(message.content)
+        if word:
+            logger.info(f"Deleting message {message.id} from {message.author.id}: blacklisted word '{word}'")
             await message.delete()
             return
 
-        # _, level = level_system.add_xp(message.author.id, message.guild.id, amount=10)
-        # xp, user_level = level_system.get_user(message.author.id, message.guild.id)
-
-        #try:
-        #    roles = server_system.get_all_roles(message.guild.id, user_level)
-        #    logger.info(roles)
-        #    to_add = []
-        #    if len(roles) > 0:
-        #        for role_id in roles:
-        #            role = await message.guild.fetch_role(role_id[0])
-        #            to_add.append(role)
-        #        logger.info(to_add)
-        #        await message.author.add_roles(*to_add)
-        #except Exception as e:
-        #    logger.error("Error in role level:", exc_info=e)
-
-        #if xp == 0:
-            # embed = EmbedFactory.create_embed(
-            #     title="Level up!",
-            #     description=f"🎉 {message.author.mention} just leveled up!",
-            #     colour=discord.Color.yellow(),
-            #     author="Level",
-            #     thumbnail=message.author.avatar.url
-            # )
-            #
-            # embed.add_field(name="New level", value=user_level, inline=True)
-            #
-            # guild_id = message.guild.id
-            #
-            # channel_id = server_system.get_level_channel(guild_id)[0]
-            #
-            # logger.info(f"Found channel: {channel_id}")
-            #
-            # level_channel = self.get_channel(channel_id)
-            #
-            # if level_channel:
-            #     await level_channel.send(embed=embed)
-            # else:
-            #     await self.announce_channel.send(content="Channel not found")
+        if message.guild is None:
+            return
+
+        _, user_level, leveled_up = await xp_accumulator.add_xp(message.author.id, message.guild.id, MESSAGE_XP)
+        if leveled_up:
+            self.dispatch("level_up", message.author, user_level)
+
+    @metrics.instrument()
+    async def on_level_up(self, member: discord.Member, user_level: int):
+        logger.info(f"{member.name} reached level {user_level} in guild {member.guild.id}")
+
+        # Solo al level up: i ruoli vengono dalla cache della gilda, una sola richiesta per tutti
+        try:
+            await level_rewards.grant(member, user_level)
+        except Exception as e:
+            logger.error("Error in role level:", exc_info=e)
+
+        embed = EmbedFactory.create_embed(
+            title="Level up!",
+            description=f"🎉 {member.mention} just leveled up!",
+            colour=discord.Color.yellow(),
+            author="Level",
+            thumbnail=member.display_avatar.url
+        )
+
+        embed.add_field(name="New level", value=user_level, inline=True)
 
+        config = await guild_config.get(member.guild.id)
+        channel_id = config.level_channel
+
+        level_channel = self.get_channel(channel_id) if channel_id else None
+
+        if level_channel:
+            await level_channel.send(embed=embed)
+        else:
+            logger.warning(f"No level channel configured for guild {member.guild.id}")
+
+    @metrics.instrument()
     async def on_member_join(self, member: discord.Member):
         logger.info(f"New member joined: {member.name}")
 
         guild_id = member.guild.id
-        description = server_system.get_description(guild_id)
+        config = await guild_config.get(guild_id)
+        description = config.description
         #non dimenticarti di leggere le ⁠📕regole e prendere dei ⁠📖ruoli ! :heart:
 
         try:
-            role_id_data = server_system.get_role(guild_id)
-            if role_id_data:
-                role_id = role_id_data[0]
-                role = await member.guild.fetch_role(role_id)
-                await member.add_roles(role)
+            role_id = config.join_role
+            if role_id:
+                role = await self.resolver.role(member.guild, role_id)
+                if role:
+                    await member.add_roles(role)
         except Exception as e:
             logger.warning(f"No role found or impossible to add: {e}")
 
@@ -221,20 +275,10 @@ class DiscordBot(commands.Bot):
             description=description.replace("%u", f"{member.mention}")
         )
 
-        print("canali: ")
-        channels = server_system.get_channels(guild_id)
-        print(channels)
-
-        if channels:
-            for item in channels:
-                # Check if the item is actually a tuple/list with 2 elements before unpacking
-                if isinstance(item, (tuple, list)) and len(item) == 2:
-                    channel_id, desc = item
-                    channel = self.get_channel(channel_id)
-                    if channel:
-                        embed.add_field(name=desc, value=channel.mention, inline=False)
-                else:
-                    logger.warning(f"Unexpected data format in channels list: {item}")
+        for desc, channel_id in config.channels.items():
+            channel = self.get_channel(channel_id)
+            if channel:
+                embed.add_field(name=desc, value=channel.mention, inline=False)
 
         # FIX AVATAR: Se l'utente non ha un avatar personalizzato, usa quello di default di Discord
         avatar_url = member.avatar.url if member.avatar else member.default_avatar.url
@@ -244,7 +288,7 @@ class DiscordBot(commands.Bot):
         #    url="https://media2.giphy.com/media/v1.Y2lkPTc5MGI3NjExdmF2MTc2YjBxamZ3aXdvMnF6cGdrc2s1dDR1YnR3aGVqb2c2Yjd3bSZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/ExMGjbktr4phe/giphy.gif")
 
         # FIX ANNOUNCE: Rimuoviamo il [0] superfluo perché il metodo restituisce già l'ID pulito
-        channel_id = server_system.get_announce_channel(guild_id)
+        channel_id = config.announce_channel
 
         if channel_id:
             channel = self.get_channel(channel_id)
@@ -256,6 +300,7 @@ class DiscordBot(commands.Bot):
             logger.warning(f"Nessun canale announce configurato per la gilda {guild_id}")
 
     
+    @metrics.instrument()
     async def on_member_leave(self, member: discord.Member):
         logger.info(f"Member left: {member.name}")
         #
@@ -282,11 +327,13 @@ class DiscordBot(commands.Bot):
         # else:
         #     logger.warning(f"Nessun canale announce configurato per la gilda {guild_id}")
 
+    @metrics.instrument()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
         logger.info("--- Reaction Add Event Triggered ---")
 
-        if payload.member and payload.member.bot:
-            logger.info("Ignored: Reaction is from a bot.")
+        # Same filter as the removals and the reconciler's star_count: only the bot's own reactions are ignored
+        if payload.user_id == self.user.id:
+            logger.info("Ignored: Reaction is from this bot.")
             return
 
         # Use emoji.id for custom emojis, or emoji.name for standard Unicode emojis
@@ -298,111 +345,19 @@ class DiscordBot(commands.Bot):
 
         # Standard Unicode emojis have payload.emoji.id as None, so check payload.emoji.name
         if payload.emoji.name == target_emoji:
-            # 1. Update and check reaction count
-            board_system.add_reaction(payload.message_id)
-            n_reactions = board_system.get_reactions(payload.message_id)[0]
-
-            min_react = board_system.get_min_reactions(payload.guild_id)
-            logger.info(f"Current reactions: {n_reactions} / Target: {min_react}")
-
-            # 2. Check if we hit the exact threshold for boarding
-            if n_reactions == min_react:
-                logger.info("Threshold reached! Fetching original message...")
-
-                source_channel = self.get_channel(payload.channel_id) or await self.fetch_channel(payload.channel_id)
-                if not source_channel:
-                    logger.error(f"Could not find source channel {payload.channel_id}.")
-                    return
-
-                try:
-                    message = await source_channel.fetch_message(payload.message_id)
-                    logger.info(f"Successfully fetched message from {message.author.name}")
-                except discord.NotFound:
-                    logger.error(f"Message {payload.message_id} not found. It may have been deleted.")
-                    return
-                except discord.Forbidden:
-                    logger.error("Bot lacks 'Read Message History' permissions in the source channel.")
-                    return
-
-                # 3. Build Embed
-                description = f"{message.content}\n\n**[Jump to message!]({message.jump_url})**"
-                embed = EmbedFactory.create_embed(
-                    description=description,
-                    colour=discord.Color.gold(),
-                    timestamp=True
-                )
-
-                avatar_url = message.author.avatar.url if message.author.avatar else message.author.default_avatar.url
-                embed.set_author(name=message.author.display_name, icon_url=avatar_url)
-
-                # Extract first image attachment if it exists
-                if message.attachments:
-                    for attachment in message.attachments:
-                        if any(attachment.filename.lower().endswith(ext) for ext in
-                               ['png', 'jpg', 'jpeg', 'gif', 'webp']):
-                            embed.set_image(url=attachment.url)
-                            logger.info("Image attachment found and added to embed.")
-                            break
-
-                # 4. Fetch Board Channel from BoardSystem
-                channel_id = board_system.get_board_channel(payload.guild_id)
-                logger.info(f"Board Channel ID found: {channel_id}")
-
-                if channel_id:
-                    channel = self.get_channel(channel_id) or await self.fetch_channel(channel_id)
-
-                    if channel:
-                        sent_msg = await channel.send(
-                            content="get a load of this chud...", embed=embed)
-                        logger.info("Successfully sent featured message to board channel!")
-
-                        board_system.add_boarded(payload.message_id, sent_msg.id)
-                        logger.info(f"Saved to DB: Original {payload.message_id} -> Board {sent_msg.id}")
-                    else:
-                        logger.error(f"Board channel {channel_id} not found.")
-                else:
-                    logger.warning("No board channel set for this guild. Use /setboard to set it.")
-
-            # 5. NEW: Check if we hit the "extra 2" threshold to change the bot's PFP
-            elif n_reactions == min_react + 2:
-                logger.info("Threshold + 2 reached! Checking for image to set as bot pfp...")
-
-                source_channel = self.get_channel(payload.channel_id) or await self.fetch_channel(payload.channel_id)
-                if not source_channel:
-                    return
-
-                try:
-                    message = await source_channel.fetch_message(payload.message_id)
-                except (discord.NotFound, discord.Forbidden):
-                    return
-
-                if message.attachments:
-                    for attachment in message.attachments:
-                        # Note: 'webp' is excluded here because standard Discord avatars usually require PNG/JPG/GIF formats.
-                        if any(attachment.filename.lower().endswith(ext) for ext in ['png', 'jpg', 'jpeg', 'gif']):
-                            try:
-                                # Read the image file as bytes
-                                image_bytes = await attachment.read()
-
-                                # Edit the bot's user profile with the new bytes
-                                await self.user.edit(avatar=image_bytes)
-                                logger.info(f"Successfully updated bot profile picture to {attachment.filename}!")
-
-                                # Break out of the loop so we only process the first valid image
-                                break
-                            except discord.HTTPException as e:
-                                # Discord heavily rate-limits avatar changes (usually a few times an hour).
-                                logger.error(f"Failed to update avatar (may be rate-limited): {e}")
-            else:
-                logger.info("Threshold not met (or already surpassed), skipping embed creation.")
+            # Conteggio e decisione sulla board passano dal coordinatore, un messaggio alla volta
+            await self.starboard.reaction(payload.guild_id, payload.channel_id, payload.message_id, 1)
 
         # --- Role Logic ---
-        role_data = roles_system.get_role(payload.message_id, emoji_identifier)
-        if role_data:
-            role_id = role_data[0] if isinstance(role_data, tuple) else role_data
+        if payload.member and payload.member.bot:
+            logger.info("Ignored: Reaction is from a bot.")
+            return
+
+        role_id = roles_system.get_role(payload.message_id, emoji_identifier)
+        if role_id:
             try:
-                server: discord.Guild = self.get_guild(payload.guild_id) or await self.fetch_guild(payload.guild_id)
-                role: discord.Role = server.get_role(role_id) or await server.fetch_role(role_id)
+                server: discord.Guild = await self.resolver.guild(payload.guild_id)
+                role: discord.Role = await self.resolver.role(server, role_id) if server else None
 
                 if role:
                     await payload.member.add_roles(role)
@@ -410,6 +365,7 @@ class DiscordBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Failed to add role. Error: {e}")
 
+    @metrics.instrument()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
         logger.info(f"Payload: {payload}")
         if payload.user_id == self.user.id:
@@ -417,71 +373,51 @@ class DiscordBot(commands.Bot):
 
         emoji_identifier = payload.emoji.id or payload.emoji.name
 
-        guild: discord.Guild = self.get_guild(payload.guild_id) or await self.fetch_guild(payload.guild_id)
-
-        try:
-            member: discord.Member = guild.get_member(payload.user_id) or await guild.fetch_member(payload.user_id)
-        except discord.NotFound:
-            logger.warning(f"Member not found in guild {guild.id} for user ID {payload.user_id}")
-            return
-
-        logger.info(f"Received reaction: {emoji_identifier} by {member.name}")
+        logger.info(f"Received reaction removal: {emoji_identifier} by {payload.user_id}")
 
         # Standard Unicode star emoji target
         target_emoji = '⭐'
 
         if payload.emoji.name == target_emoji:
-            # 1. Recupera l'ID del messaggio della board PRIMA di rimuovere la riga dal DB
-            board_message_id = board_system.get_boarded(payload.message_id)
-            if isinstance(board_message_id, tuple):
-                board_message_id = board_message_id[0]
-
-            # 2. Rimuovi la reazione dal database
-            board_system.remove_reaction(payload.message_id)
-
-            # 3. Controlla le reazioni rimaste
-            reactions = board_system.get_reactions(payload.message_id)
-            min_react = board_system.get_min_reactions(payload.guild_id)
-
-            # 4. Calcola il numero effettivo di reazioni
-            current_reactions = 0
-            if reactions is not None:
-                current_reactions = reactions[0] if isinstance(reactions, tuple) else reactions
-
-            # Se le reazioni scendono sotto il minimo, elimina il messaggio dalla board
-            if current_reactions < min_react:
-                if board_message_id:
-                    channel_id = board_system.get_board_channel(payload.guild_id)
-                    channel = self.get_channel(channel_id) if channel_id else None
-
-                    if channel:
-                        try:
-                            message = await channel.fetch_message(board_message_id)
-                            logger.info("Successfully fetched boarded message from board channel.")
-                            await message.delete()
-                            logger.info(
-                                f"Deleted board message {board_message_id} because reactions fell below threshold.")
-                        except discord.NotFound:
-                            logger.error(
-                                f"Board message {board_message_id} not found. It may have been manually deleted.")
-                        except discord.Forbidden:
-                            logger.error("Bot lacks permissions in the board channel.")
+            await self.starboard.reaction(payload.guild_id, payload.channel_id, payload.message_id, -1)
 
         # --- Role Logic ---
-        role_data = roles_system.get_role(payload.message_id, emoji_identifier)
-        if not role_data:
-            logger.warning(f"No role mapping found for message ID {payload.message_id} and emoji {emoji_identifier}")
+        role_id = roles_system.get_role(payload.message_id, emoji_identifier)
+        if not role_id:
             return
 
-        role_id = role_data[0] if isinstance(role_data, tuple) else role_data
+        # Guild and member are only needed (and fetched) for actual reaction-role messages
+        guild: discord.Guild = await self.resolver.guild(payload.guild_id)
+        if not guild:
+            return
+
+        member: discord.Member = await self.resolver.member(guild, payload.user_id)
+        if not member:
+            logger.warning(f"Member not found in guild {guild.id} for user ID {payload.user_id}")
+            return
+
+        role: discord.Role = await self.resolver.role(guild, role_id)
+        if not role:
+            logger.warning(f"Role with ID {role_id} not found in guild {guild.id}")
+            return
 
         try:
-            role: discord.Role = guild.get_role(role_id) or await guild.fetch_role(role_id)
-            if role:
-                await member.remove_roles(role)
-                logger.info(f"Removed role: {role.name} from {member.name}")
+            await member.remove_roles(role)
+            logger.info(f"Removed role: {role.name} from {member.name}")
         except discord.NotFound:
-            logger.warning(f"Role with ID {role_id} not found in guild {guild.id}")
+            logger.warning(f"Member {member.id} left guild {guild.id} before the role was removed")
+
+    @metrics.instrument()
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent):
+        # Tutte le reazioni rimosse in blocco: nessun evento per le singole stelle
+        logger.info(f"Reactions cleared on message {payload.message_id}")
+        await self.starboard.reset(payload.guild_id, payload.channel_id, payload.message_id, 0)
+
+    @metrics.instrument()
+    async def on_raw_reaction_clear_emoji(self, payload: discord.RawReactionClearEmojiEvent):
+        if payload.emoji.name == '⭐':
+            logger.info(f"⭐ cleared on message {payload.message_id}")
+            await self.starboard.reset(payload.guild_id, payload.channel_id, payload.message_id, 0)
 
 bot = DiscordBot()
 channel = None
@@ -497,15 +433,24 @@ async def main():
     except Exception as e:
         logger.critical("Bot crashed!", exc_info=e)
     finally:
-        embed = EmbedFactory.create_embed(
-            title="Stopped.",
-            description="🟥 The bot has been stopped!",
-            colour=discord.Color.red(),
-            author=False
-        )
-
-        await bot.announce_channel.send(embed=embed)
-        logger.info("Bot has shut down!")
+        try:
+            # Only set when the announcement channel is configured in on_ready
+            announce_channel = getattr(bot, "announce_channel", None)
+            if announce_channel is not None and not bot.is_closed():
+                embed = EmbedFactory.create_embed(
+                    title="Stopped.",
+                    description="🟥 The bot has been stopped!",
+                    colour=discord.Color.red(),
+                    author=False
+                )
+                await announce_channel.send(embed=embed)
+        except Exception as e:
+            logger.error("Failed to announce the shutdown", exc_info=e)
+        finally:
+            # Always reached, so the database connections are closed whatever happened above.
+            # Off the event loop: it waits for the queries still running on the database executor
+            await asyncio.to_thread(close_pools)
+            logger.info("Bot has shut down!")
 
 
 
@@ -0,0 +1,85 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+from datetime import datetime, timedelta
+from config import GUILD_ID
+from utils.board_reconciler import BoardReconciler
+from utils.embed_factory import EmbedFactory
+from utils.debug import Logger
+import os
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Minutes between two reconciliations of the board
+RECONCILE_INTERVAL = 30
+
+
+class Board(commands.Cog):
+    """
+    Cog keeping the board counters honest: reconciles them with Discord periodically and on demand.
+    """
+
+    def __init__(self, bot, reconciler: BoardReconciler):
+        """
+        Initializes the Board cog.
+
+        Args:
+            bot (discord.Bot): The bot instance.
+            reconciler (BoardReconciler): Re-reads the real ⭐ counts and fixes the board.
+        """
+        self.bot = bot
+        self.reconciler = reconciler
+
+    async def cog_load(self):
+        self.reconcile.start()
+
+    async def cog_unload(self):
+        self.reconcile.cancel()
+        self.reconciler.starboard.close()
+
+    @tasks.loop(minutes=RECONCILE_INTERVAL)
+    async def reconcile(self):
+        try:
+            await self.reconciler.run()
+        except Exception as e:
+            logger.error("Board reconciliation failed", exc_info=e)
+
+    @reconcile.before_loop
+    async def before_reconcile(self):
+        # The first run catches up with what happened while the bot was offline
+        await self.bot.wait_until_ready()
+
+    @app_commands.command(name="reconcile", description="Re-count the ⭐ of the recently starred messages and fix the board.")
+    @app_commands.describe(hours="Check the messages starred in the last hours, instead of since the last check.")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guilds(*GUILD_ID)
+    async def reconcile_command(self, interaction: discord.Interaction, hours: app_commands.Range[int, 1, 720] = None):
+        """
+        Runs a reconciliation right away.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered the command.
+            hours (int, optional): How far back to look, the last run's watermark by default.
+        """
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+        stats = await self.reconciler.run(since)
+
+        embed = EmbedFactory.create_embed(
+            interaction=interaction,
+            title="Board reconciled",
+            description=(
+                f"Checked {stats['checked']} messages: {stats['corrected']} corrected, "
+                f"{stats['repaired']} board posts repaired, {stats['deleted']} no longer exist, "
+                f"{stats['failed']} could not be read."
+            ),
+            colour=discord.Color.gold(),
+            author="Board"
+        )
+        await interaction.edit_original_response(embed=embed)
+        logger.info(f"Board reconciled by {interaction.user.name}: {stats}")
+
+
+async def setup(bot):
+    pass
@@ -9,8 +9,9 @@ from utils.debug import Logger
 import os
 
 from utils.embed_factory import EmbedFactory
+from utils.guild_config import GuildConfigCache
+from utils.level_rewards import LevelRewards
 from utils.server_system import ServerSystem
-from utils.board_system import BoardSystem  # IMPORTANTE: Aggiungi questa importazione
 from views.ticket_view import TicketView
 
 logger = Logger(os.path.basename(__file__).replace(".py", ""))
@@ -18,21 +19,22 @@ logger = Logger(os.path.basename(__file__).replace(".py", ""))
 
 # All cogs need to inherit the class commands.Cog
 class Channel(commands.Cog):
-    # Aggiunto board_system nei parametri
-    def __init__(self, bot, server_system: ServerSystem, board_system: BoardSystem):
+    # Le impostazioni del server passano dalla cache, che aggiorna anche il database
+    def __init__(self, bot, server_system: ServerSystem, guild_config: GuildConfigCache, level_rewards: LevelRewards):
         self.bot = bot
         self.server_system = server_system
-        self.board_system = board_system
-        # Passiamo board_system alla classe Set
-        self.bot.tree.add_command(self.Set(server_system, bot, board_system))
-        self.bot.tree.add_command(self.Role(server_system, bot))
+        self.guild_config = guild_config
+        self.level_rewards = level_rewards
+        # Passiamo guild_config alla classe Set
+        self.bot.tree.add_command(self.Set(guild_config, bot))
+        self.bot.tree.add_command(self.Role(level_rewards, bot))
 
     @app_commands.command(name="onjoin", description="Set a role on join.")
     @app_commands.guilds(*GUILD_ID)
     @app_commands.describe(role="Role to add on join")
     async def role(self, interaction: discord.Interaction, role: discord.Role):
         try:
-            self.server_system.set_role(interaction.guild_id, role.id)
+            await self.guild_config.set_join_role(interaction.guild_id, role.id)
         except Exception as e:
             embed = EmbedFactory.create_embed(
                 title="Errore",
@@ -55,9 +57,10 @@ class Channel(commands.Cog):
 
     @app_commands.guilds(*GUILD_ID)
     class Role(app_commands.Group):
-        def __init__(self, server_system: ServerSystem, bot: commands.Bot):
+        def __init__(self, level_rewards: LevelRewards, bot: commands.Bot):
             super().__init__(name="role", description="Role levels settings.")
-            self.server_system = server_system
+            # I ruoli passano dall'indice dei premi, che aggiorna anche il database
+            self.level_rewards = level_rewards
             self.bot = bot
 
         @app_commands.command(name="set", description="Set a new role level.")
@@ -65,7 +68,7 @@ class Channel(commands.Cog):
         @app_commands.describe(role="Role you want to set", level="Level of the role")
         async def set(self, interaction: discord.Interaction, role: discord.Role, level: int):
             try:
-                self.server_system.add_role(interaction.guild_id, role.id, level)
+                await self.level_rewards.set_role(interaction.guild_id, role.id, level)
             except Exception as e:
                 embed = EmbedFactory.create_embed(
                     title="Error",
@@ -87,11 +90,9 @@ class Channel(commands.Cog):
 
     @app_commands.guilds(*GUILD_ID)
     class Set(app_commands.Group):
-        # Aggiunto board_system nei parametri
-        def __init__(self, server_system: ServerSystem, bot: commands.Bot, board_system: BoardSystem):
+        def __init__(self, guild_config: GuildConfigCache, bot: commands.Bot):
             super().__init__(name="channel", description="Set server channels.")
-            self.server_system = server_system
-            self.board_system = board_system
+            self.guild_config = guild_config
             self.bot = bot
             logger.info("Loaded command group: Set")
 
@@ -99,7 +100,7 @@ class Channel(commands.Cog):
         @app_commands.command(name="board", description="Set this channel as the board channel.")
         @app_commands.guilds(*GUILD_ID)
         async def board(self, interaction: discord.Interaction):
-            self.board_system.set_board_channel(interaction.guild_id, interaction.channel_id)
+            await self.guild_config.set_board_channel(interaction.guild_id, interaction.channel_id)
 
             embed = EmbedFactory.create_embed(
                 title="Board channel set",
@@ -117,7 +118,7 @@ class Channel(commands.Cog):
         @app_commands.command(name="level", description="Set this channel as level channel.")
         @app_commands.guilds(*GUILD_ID)
         async def level(self, interaction: discord.Interaction):
-            self.server_system.add_channel(interaction.guild_id, interaction.channel_id, "level")
+            await self.guild_config.set_channel(interaction.guild_id, interaction.channel_id, "level")
 
             embed = EmbedFactory.create_embed(
                 title="Level channel set",
@@ -133,7 +134,7 @@ class Channel(commands.Cog):
         @app_commands.command(name="announcements", description="Set this channel as announcements channel.")
         @app_commands.guilds(*GUILD_ID)
         async def announcements(self, interaction: discord.Interaction):
-            self.server_system.add_channel(interaction.guild_id, interaction.channel_id, "announce")
+            await self.guild_config.set_channel(interaction.guild_id, interaction.channel_id, "announce")
             embed = EmbedFactory.create_embed(
                 title="Announcements channel set",
                 description=f"You've set {interaction.channel.mention} as announcements channel.",
@@ -149,7 +150,7 @@ class Channel(commands.Cog):
         @app_commands.guilds(*GUILD_ID)
         async def ticket(self, interaction: discord.Interaction):
             # 1. Register the channel in your system
-            self.server_system.add_channel(interaction.guild_id, interaction.channel_id, "ticket")
+            await self.guild_config.set_channel(interaction.guild_id, interaction.channel_id, "ticket")
 
             # 2. Ephemeral confirmation for the user who ran the command
             confirm_embed = EmbedFactory.create_embed(
@@ -179,8 +180,8 @@ class Channel(commands.Cog):
         @app_commands.describe(description="Description of added channel")
         @app_commands.guilds(*GUILD_ID)
         async def add(self, interaction: discord.Interaction, description: str, channel: discord.TextChannel = None):
-            self.server_system.add_channel(interaction.guild_id,
-                                           interaction.channel_id if channel == None else channel.id, description)
+            await self.guild_config.set_channel(interaction.guild_id,
+                                                interaction.channel_id if channel == None else channel.id, description)
             embed = EmbedFactory.create_embed(
                 title="New channel added!",
                 description=f"You've added {interaction.channel.mention} to the channel list.",
@@ -198,7 +199,7 @@ class Channel(commands.Cog):
         @app_commands.guilds(*GUILD_ID)
         async def announce(self, interaction: discord.Interaction, title: str, value: str,
                            author: str = "Server System"):
-            channel_id = self.server_system.get_announce_channel(interaction.guild_id)
+            channel_id = (await self.guild_config.get(interaction.guild_id)).announce_channel
 
             embed = EmbedFactory.create_embed(
                 title=title,
@@ -218,7 +219,7 @@ class Channel(commands.Cog):
         @app_commands.describe(value="Description for the join message")
         @app_commands.guilds(*GUILD_ID)
         async def desc(self, interaction: discord.Interaction, value: str):
-            self.server_system.set_description(interaction.guild_id, value)
+            await self.guild_config.set_description(interaction.guild_id, value)
 
             embed = EmbedFactory.create_embed(
                 title="New description set",
@@ -5,11 +5,12 @@ from discord import app_commands
 from config import GUILD_ID
 from utils.debug import Logger
 import os
-import random
 
 from utils.embed_factory import EmbedFactory
 from utils.chess_db import ChessSystem
-from views.chess_view import MatchAcceptView
+from utils.sender import send_all
+from utils.swiss import Pairing, SwissPairer
+from views.chess_view import MatchAcceptView, StandingsView
 
 logger = Logger(os.path.basename(__file__).replace(".py", ""))
 
@@ -26,10 +27,11 @@ class ChessEvent(commands.Cog):
             super().__init__(name="chess", description="Comandi relativi al campionato di scacchi.")
             self.chess_system = chess_system
             self.bot = bot
+            self.pairer = SwissPairer(chess_system)
 
         @app_commands.command(name="signup", description="Iscriviti all'evento di scacchi!")
         async def signup(self, interaction: discord.Interaction):
-            self.chess_system.sign_up(interaction.user.id)
+            await self.chess_system.aio.sign_up(interaction.user.id)
             embed = EmbedFactory.create_embed(
                 title="Buona fortuna!",
                 description="Ti sei ufficialmente iscritto a scacchilarp!",
@@ -44,13 +46,13 @@ class ChessEvent(commands.Cog):
             target = member or interaction.user
 
             # Controlla prima se è iscritto
-            score = self.chess_system.get_score(target.id)
+            score = await self.chess_system.aio.get_score(target.id)
             if score is None:
                 await interaction.response.send_message(f"⚠️ {target.mention} non è iscritto al torneo.",
                                                         ephemeral=True)
                 return
 
-            player_matches = self.chess_system.get_player_matches(target.id)
+            player_matches = await self.chess_system.aio.get_player_matches(target.id)
 
             if not player_matches["active"] and not player_matches["past"]:
                 await interaction.response.send_message(
@@ -98,18 +100,53 @@ class ChessEvent(commands.Cog):
 
             await interaction.response.send_message(embed=embed)
 
+        @app_commands.command(name="standings", description="Mostra la classifica del torneo.")
+        @app_commands.describe(page="La pagina da mostrare (lascia vuoto per quella in cui ti trovi)")
+        async def standings(self, interaction: discord.Interaction, page: int = None):
+            # Classifica tenuta in memoria: nessuna query per chi la consulta
+            standings = self.chess_system.standings
+            table = standings.table()
+
+            if page is None:
+                rank = standings.rank(interaction.user.id)
+                page = (rank - 1) // StandingsView.PAGE_SIZE if rank else 0
+            else:
+                page -= 1
+
+            view = StandingsView(table, interaction.user.id, page)
+            embed = view.create_embed()
+
+            rank = standings.rank(interaction.user.id)
+            if rank:
+                embed.add_field(name="La tua posizione", value=f"**{rank}°** su {len(table)}")
+
+            await interaction.response.send_message(embed=embed, view=view)
+
         @app_commands.command(name="profile", description="Mostra il profilo del giocatore.")
         async def profile(self, interaction: discord.Interaction, member: discord.Member = None):
-            score = self.chess_system.get_score(interaction.user.id if member == None else member.id)
+            user_id = interaction.user.id if member == None else member.id
+            score = await self.chess_system.aio.get_score(user_id)
 
             if score is not None:
+                rating, rd, games = await self.chess_system.aio.get_rating(user_id)
                 embed = EmbedFactory.create_embed(
                     title=interaction.user.name if member == None else member.name,
-                    description=f"Score: **{score}** punti",
+                    description=f"Score: **{score}** punti\nRating: **{rating:.0f}** ± {2 * rd:.0f} ({games} partite)",
                     colour=discord.Colour.random(),
                     thumbnail=interaction.user.avatar.url if member == None else member.avatar.url,
                     interaction=interaction
                 )
+
+                # Una riga in più per calcolare la variazione anche della partita più vecchia mostrata
+                history = await self.chess_system.aio.get_rating_history(user_id, limit=6)
+                if history:
+                    lines = []
+                    for (match_id, after, _), previous in zip(history, history[1:] + [None]):
+                        before = previous[1] if previous else None
+                        change = f" ({after - before:+.0f})" if before is not None else ""
+                        lines.append(f"**Match #{match_id}**: {after:.0f}{change}")
+                    embed.add_field(name="Storico Rating", value="\n".join(lines[:5]), inline=False)
+
                 await interaction.response.send_message(embed=embed)
             else:
                 embed = EmbedFactory.create_embed(
@@ -125,7 +162,7 @@ class ChessEvent(commands.Cog):
         @app_commands.command(name="drop_chess", description="Elimina le tables")
         @app_commands.checks.has_role(1539463835931377765)
         async def drop_chess(self, interaction: discord.Interaction):
-            self.chess_system.drop_tables()
+            await self.chess_system.aio.drop_tables()
 
         @app_commands.command(name="create_match", description="Crea un match.")
         @app_commands.describe(player1="Primo player", player2="Secondo player")
@@ -133,12 +170,12 @@ class ChessEvent(commands.Cog):
         async def create_match(self, interaction: discord.Interaction, player1: discord.Member, player2: discord.Member):
             await interaction.response.defer(ephemeral=True)
 
-            self.chess_system.sign_up(player1.id)
-            self.chess_system.sign_up(player2.id)
+            await self.chess_system.aio.sign_up(player1.id)
+            await self.chess_system.aio.sign_up(player2.id)
 
             await interaction.followup.send(f"Generazione match in corso...")
 
-            match_id = self.chess_system.new_match(player1.id, player2.id)
+            match_id = await self.chess_system.aio.new_match(player1.id, player2.id)
 
             p1 = interaction.guild.get_member(player1.id)
             p2 = interaction.guild.get_member(player2.id)
@@ -151,37 +188,36 @@ class ChessEvent(commands.Cog):
                     interaction=interaction
                 )
 
-                view = MatchAcceptView(self.chess_system, match_id, p1, p2)
+                view = MatchAcceptView(self.chess_system, match_id, p1.id, p2.id)
                 await interaction.channel.send(content=f"{p1.mention} {p2.mention}", embed=embed, view=view)
 
         @app_commands.command(name="generate_round",
                               description="Crea e pubblica i match in un canale specifico (Solo Staff).")
-        @app_commands.describe(channel="Il canale dove pubblicare i match")
+        @app_commands.describe(channel="Il canale dove pubblicare i match",
+                               dry_run="Mostra solo gli abbinamenti, senza creare i match")
         @app_commands.checks.has_role(1539471475885482065)
-        async def generate_round(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        async def generate_round(self, interaction: discord.Interaction, channel: discord.TextChannel,
+                                 dry_run: bool = False):
             await interaction.response.defer(ephemeral=True)
 
-            players = self.chess_system.get_all_players()
+            # Abbinamenti col sistema svizzero: per punteggio, senza rivincite, bye a rotazione
+            pairing = await self.pairer.plan()
 
-            if len(players) < 2:
+            if pairing is None:
                 await interaction.followup.send("Non ci sono abbastanza giocatori iscritti per generare dei match.")
                 return
 
-            random.shuffle(players)
-
-            bye_player = None
-            if len(players) % 2 != 0:
-                bye_player = players.pop()
+            if dry_run:
+                await interaction.followup.send(embed=self._pairing_embed(interaction, pairing))
+                return
 
             await interaction.followup.send(f"Generazione match in corso nel canale {channel.mention}...")
 
-            # Pair and post matches directly to the channel
-            for i in range(0, len(players), 2):
-                p1_id = players[i]
-                p2_id = players[i + 1]
-
-                match_id = self.chess_system.new_match(p1_id, p2_id)
+            # Tutti i match del turno in una sola transazione
+            match_ids = await self.pairer.commit(pairing)
 
+            messages = []
+            for (p1_id, p2_id), match_id in zip(pairing.pairs, match_ids):
                 # Fetch members to pass to the view
                 p1 = interaction.guild.get_member(p1_id)
                 p2 = interaction.guild.get_member(p2_id)
@@ -194,17 +230,44 @@ class ChessEvent(commands.Cog):
                         interaction=interaction
                     )
 
-                    view = MatchAcceptView(self.chess_system, match_id, p1, p2)
-                    await channel.send(content=f"{p1.mention} {p2.mention}", embed=embed, view=view)
+                    view = MatchAcceptView(self.chess_system, match_id, p1.id, p2.id)
+                    messages.append({"content": f"{p1.mention} {p2.mention}", "embed": embed, "view": view})
+
+            if pairing.bye:
+                messages.append({"content": f"⏸️ <@{pairing.bye}> riposa in questo turno (numero dispari di giocatori)."})
 
-            if bye_player:
-                await channel.send(f"⏸️ <@{bye_player}> riposa in questo turno (numero dispari di giocatori).")
+            # Post matches directly to the channel, a few at a time
+            message_ids = await send_all(channel, messages)
+            logger.info(f"Round published in channel {channel.id}: {len(match_ids)} matches, "
+                        f"{sum(1 for m in message_ids if m is not None)}/{len(messages)} messages posted")
+
+        def _pairing_embed(self, interaction: discord.Interaction, pairing: Pairing):
+            lines = [
+                f"`{board}.` <@{p1}> ({pairing.scores[p1]}) vs <@{p2}> ({pairing.scores[p2]})"
+                for board, (p1, p2) in enumerate(pairing.pairs, start=1)
+            ]
+            # Mostriamo solo i primi 40 tavoli per non sforare i limiti di testo di Discord
+            description = "\n".join(lines[:40])
+            if len(lines) > 40:
+                description += f"\n\n*...e altri {len(lines) - 40} tavoli.*"
+
+            embed = EmbedFactory.create_embed(
+                title=f"Anteprima turno: {len(pairing.pairs)} match",
+                description=description,
+                colour=discord.Color.blue(),
+                interaction=interaction
+            )
+            if pairing.bye:
+                embed.add_field(name="Riposa", value=f"<@{pairing.bye}>")
+            if pairing.rematches:
+                embed.add_field(name="⚠️ Rivincite inevitabili", value=str(pairing.rematches))
+            return embed
 
         @app_commands.command(name="close_day",
                               description="Chiude la giornata, penalizza chi non ha giocato e annulla i match (Solo Staff).")
         @app_commands.checks.has_role(1539471475885482065)
         async def close_day(self, interaction: discord.Interaction):
-            penalized = self.chess_system.process_end_of_day_penalties()
+            penalized = await self.chess_system.aio.process_end_of_day_penalties()
 
             if penalized:
                 mentions = " ".join([f"<@{pid}>" for pid in penalized])
@@ -213,13 +276,24 @@ class ChessEvent(commands.Cog):
                 await interaction.response.send_message(
                     "✅ Giornata chiusa. Tutti i giocatori hanno confermato i loro match oggi!")
 
+        @app_commands.command(name="recompute_ratings",
+                              description="Ricalcola tutti i rating dallo storico delle partite (Solo Staff).")
+        @app_commands.checks.has_role(1539471475885482065)
+        async def recompute_ratings(self, interaction: discord.Interaction):
+            await interaction.response.defer(ephemeral=True)
+
+            games = await self.chess_system.aio.recompute_ratings()
+            logger.info(f"Ratings recomputed from {games} matches by {interaction.user.name}")
+
+            await interaction.followup.send(f"✅ Rating ricalcolati da {games} partite concluse.")
+
         @app_commands.command(name="force_signup",
                               description="Iscrive forzatamente un utente all'evento (Solo Staff).")
         @app_commands.describe(user="L'utente da iscrivere")
         @app_commands.checks.has_role(1539471475885482065)
         async def force_signup(self, interaction: discord.Interaction, user: discord.Member):
             # Calls the existing sign_up method using the target user's ID
-            self.chess_system.sign_up(user.id)
+            await self.chess_system.aio.sign_up(user.id)
 
             embed = EmbedFactory.create_embed(
                 title="Iscrizione Forzata Completata",
@@ -250,7 +324,7 @@ class ChessEvent(commands.Cog):
             winner_id = winner.id if winner else None
 
             # Esegue l'azione nel database
-            success, message = self.chess_system.force_resolve_match(match_id, winner_id, is_draw)
+            success, message = await self.chess_system.aio.force_resolve_match(match_id, winner_id, is_draw)
 
             if success:
                 esito = "🤝 Pareggio" if is_draw else f"🏆 Vittoria per {winner.mention}"
@@ -2,9 +2,11 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from config import GUILD_ID
-from utils.level_system import LevelSystem
+from utils.level_system import MAX_LEVEL, MAX_XP, LevelSystem
+from utils.xp_accumulator import XPAccumulator
 from utils.embed_factory import EmbedFactory
 from utils.debug import Logger
+from views.leaderboard_view import LeaderboardView
 import os
 
 # Initialize logger
@@ -19,18 +21,20 @@ class LevelCog(commands.Cog):
     use the commands for setting or modifying levels and XP.
     """
 
-    def __init__(self, bot, level_system: LevelSystem):
+    def __init__(self, bot, level_system: LevelSystem, xp_accumulator: XPAccumulator):
         """
         Initializes the LevelCog.
 
         Args:
             bot (discord.Bot): The bot object.
             level_system (LevelSystem): Instance of the level system to manage user levels and XP.
+            xp_accumulator (XPAccumulator): Buffer of the XP earned by chatting, not written to the database yet.
         """
         self.bot = bot
         self.level_system = level_system
-        self.bot.tree.add_command(self.LevelSet(level_system))
-        self.bot.tree.add_command(self.LevelAdd(level_system))
+        self.xp_accumulator = xp_accumulator
+        self.bot.tree.add_command(self.LevelSet(level_system, xp_accumulator))
+        self.bot.tree.add_command(self.LevelAdd(level_system, xp_accumulator))
 
     @app_commands.command(name="level", description="Check your level or someone else's.")
     @app_commands.describe(member="Member to check.")
@@ -48,7 +52,7 @@ class LevelCog(commands.Cog):
         """
         # Either take the member given as a parameter or the message author
         member = member or interaction.user
-        data = self.level_system.get_user(member.id, interaction.guild_id)
+        data = await self.xp_accumulator.get_user(member.id, interaction.guild_id)
         
         if data:
             xp, level = data
@@ -60,6 +64,11 @@ class LevelCog(commands.Cog):
                 interaction=interaction,
                 colour=discord.Color.green()
             )
+
+            ranking = await self.xp_accumulator.ranking(interaction.guild_id)
+            rank = ranking.rank(member.id)
+            if rank:
+                embed.add_field(name="Rank", value=f"#{rank} of {len(ranking)}")
             logger.info(f"Level check for {member}: {level} (XP: {xp})")
             await interaction.response.send_message(embed=embed)
         else:
@@ -74,6 +83,29 @@ class LevelCog(commands.Cog):
             logger.warning(f"No level data for {member}.")
             await interaction.response.send_message(embed=embed)
 
+    @app_commands.command(name="leaderboard", description="Show the members with the highest levels.")
+    @app_commands.describe(page="Page to show (defaults to the one you are on).")
+    @app_commands.guilds(*GUILD_ID)
+    async def leaderboard(self, interaction: discord.Interaction, page: int = None):
+        """
+        Command to show the leaderboard of the guild, with buttons to browse it.
+
+        Args:
+            interaction (discord.Interaction): Discord interaction with the user.
+            page (int, optional): The page to show. Defaults to None, which shows the page of the invoking user.
+        """
+        ranking = await self.xp_accumulator.ranking(interaction.guild_id)
+
+        if page is None:
+            rank = ranking.rank(interaction.user.id)
+            page = (rank - 1) // LeaderboardView.PAGE_SIZE if rank else 0
+        else:
+            page -= 1
+
+        view = LeaderboardView(ranking, interaction.guild, interaction.user.id, page)
+        logger.info(f"Leaderboard of guild {interaction.guild_id} shown to {interaction.user} (page {view.page + 1})")
+        await interaction.response.send_message(embed=view.create_embed(interaction), view=view)
+
     @app_commands.command(name="reset", description="Reset a user's level.")
     @app_commands.describe(member="Member to reset.")
     @app_commands.checks.has_permissions(administrator=True)
@@ -86,7 +118,7 @@ class LevelCog(commands.Cog):
             interaction (discord.Interaction): Discord interaction with the user.
             member (discord.Member): The member whose level to reset.
         """
-        result = self.level_system.reset_level(member.id, interaction.guild.id)
+        result = await self.xp_accumulator.reset(member.id, interaction.guild.id)
 
         if result:
             embed = EmbedFactory.create_embed(
@@ -119,17 +151,19 @@ class LevelCog(commands.Cog):
 
         Attributes:
             level_system (LevelSystem): Instance of the level system to modify user levels and XP.
+            xp_accumulator (XPAccumulator): Buffer of the XP earned by chatting, kept in sync with the changes.
         """
-        def __init__(self, level_system: LevelSystem):
+        def __init__(self, level_system: LevelSystem, xp_accumulator: XPAccumulator):
             super().__init__(name="set", description="Set user level or XP.")
             self.level_system = level_system
+            self.xp_accumulator = xp_accumulator
             logger.info("Loaded command group: LevelSet")
 
         @app_commands.command(name="xp", description="Set a user's XP.")
         @app_commands.describe(member="Member to change.", value="New XP value.")
         @app_commands.checks.has_permissions(administrator=True)
         @app_commands.guilds(*GUILD_ID)
-        async def xp(self, interaction: discord.Interaction, member: discord.Member, value: int):
+        async def xp(self, interaction: discord.Interaction, member: discord.Member, value: app_commands.Range[int, 0, MAX_XP]):
             """
             Command to set a user's XP. Requires admin permissions.
 
@@ -138,7 +172,10 @@ class LevelCog(commands.Cog):
                 member (discord.Member): The member whose XP to set.
                 value (int): The new XP value to set.
             """
-            xp, user_level = self.level_system.set_xp(member.id, interaction.guild.id, value)
+            xp, user_level = await self.xp_accumulator.update(
+                member.id, interaction.guild.id,
+                lambda: self.level_system.aio.set_xp(member.id, interaction.guild.id, value)
+            )
     
             embed = EmbedFactory.create_embed(
                 title="XP Changed",
@@ -158,7 +195,7 @@ class LevelCog(commands.Cog):
         @app_commands.describe(member="Member to change.", value="New level value.")
         @app_commands.checks.has_permissions(administrator=True)
         @app_commands.guilds(*GUILD_ID)
-        async def level(self, interaction: discord.Interaction, member: discord.Member, value: int):
+        async def level(self, interaction: discord.Interaction, member: discord.Member, value: app_commands.Range[int, 0, MAX_LEVEL]):
             """
             Command to set a user's level. Requires admin permissions.
 
@@ -167,7 +204,10 @@ class LevelCog(commands.Cog):
                 member (discord.Member): The member whose level to set.
                 value (int): The new level value to set.
             """
-            xp, user_level = self.level_system.set_level(member.id, interaction.guild.id, value)
+            xp, user_level = await self.xp_accumulator.update(
+                member.id, interaction.guild.id,
+                lambda: self.level_system.aio.set_level(member.id, interaction.guild.id, value)
+            )
 
             embed = EmbedFactory.create_embed(
                 title="Level Changed",
@@ -191,17 +231,19 @@ class LevelCog(commands.Cog):
 
         Attributes:
             level_system (LevelSystem): Instance of the level system to modify user levels and XP.
+            xp_accumulator (XPAccumulator): Buffer of the XP earned by chatting, kept in sync with the changes.
         """
-        def __init__(self, level_system: LevelSystem):
+        def __init__(self, level_system: LevelSystem, xp_accumulator: XPAccumulator):
             super().__init__(name="add", description="Add XP or levels to users.")
             self.level_system = level_system
+            self.xp_accumulator = xp_accumulator
             logger.info("Loaded command group: LevelAdd")
 
         @app_commands.command(name="xp", description="Add XP to a user.")
         @app_commands.describe(member="Member to change.", value="Amount of XP to add.")
         @app_commands.checks.has_permissions(administrator=True)
         @app_commands.guilds(*GUILD_ID)
-        async def xp(self, interaction: discord.Interaction, member: discord.Member, value: int):
+        async def xp(self, interaction: discord.Interaction, member: discord.Member, value: app_commands.Range[int, -MAX_XP, MAX_XP]):
             """
             Command to add XP to a user. Requires admin permissions.
 
@@ -210,7 +252,10 @@ class LevelCog(commands.Cog):
                 member (discord.Member): The member to add XP to.
                 value (int): The amount of XP to add.
             """
-            xp, user_level = self.level_system.add_xp(member.id, interaction.guild.id, value)
+            xp, user_level = await self.xp_accumulator.update(
+                member.id, interaction.guild.id,
+                lambda: self.level_system.aio.add_xp(member.id, interaction.guild.id, value)
+            )
 
             embed = EmbedFactory.create_embed(
                 title="XP Added",
@@ -230,7 +275,7 @@ class LevelCog(commands.Cog):
         @app_commands.describe(member="Member to change.", value="Amount of levels to add.")
         @app_commands.checks.has_permissions(administrator=True)
         @app_commands.guilds(*GUILD_ID)
-        async def level(self, interaction: discord.Interaction, member: discord.Member, value: int):
+        async def level(self, interaction: discord.Interaction, member: discord.Member, value: app_commands.Range[int, -MAX_LEVEL, MAX_LEVEL]):
             """
             Command to add levels to a user. Requires admin permissions.
 
@@ -239,7 +284,10 @@ class LevelCog(commands.Cog):
                 member (discord.Member): The member to add levels to.
                 value (int): The amount of levels to add.
             """
-            xp, user_level = self.level_system.add_levels(member.id, interaction.guild.id, value)
+            xp, user_level = await self.xp_accumulator.update(
+                member.id, interaction.guild.id,
+                lambda: self.level_system.aio.add_levels(member.id, interaction.guild.id, value)
+            )
 
             embed = EmbedFactory.create_embed(
                 title="Levels Added",
@@ -2,11 +2,12 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from datetime import datetime, timedelta
-import asyncio
+from utils.ban_scheduler import BanScheduler
 from utils.embed_factory import EmbedFactory
-from utils.board_system import BoardSystem
 from utils.debug import Logger
+from utils.guild_config import GuildConfigCache
 from utils.moderation_system import ModerationSystem
+from utils.purge import Purger
 import os
 from config import GUILD_ID
 
@@ -44,28 +45,25 @@ class Moderation(commands.Cog):
     Cog to handle moderation commands such as temp banning, unbanning, and kicking users.
     """
 
-    def __init__(self, bot):
+    def __init__(self, bot, moderation_system: ModerationSystem, guild_config: GuildConfigCache):
         """
         Initializes the Moderation cog.
 
         Args:
             bot (discord.Bot): The bot instance.
+            moderation_system (ModerationSystem): Instance of the moderation system storing the temporary bans.
+            guild_config (GuildConfigCache): Cache of the guilds' settings, used to update the board settings.
         """
         self.bot = bot
-        self.db = ModerationSystem(
-            host="localhost",
-            user="root",
-            password="luca",
-            database="discordbot"
-        )
-        self.board_db = BoardSystem(
-            host="localhost",
-            user="root",
-            password="luca",
-            database="discordbot"
-        )
-        self.next_unban_time = None
-        self.unban_task = self.bot.loop.create_task(self._update_next_unban_time())
+        self.db = moderation_system
+        self.guild_config = guild_config
+        self.scheduler = BanScheduler(moderation_system, self._unban_user)
+
+    async def cog_load(self):
+        self.scheduler.start(wait_until=self.bot.wait_until_ready)
+
+    async def cog_unload(self):
+        self.scheduler.close()
 
     @app_commands.command(name="setminreactions", description="Imposta il numero minimo di reazioni per la board.")
     @app_commands.describe(amount="Numero minimo di reazioni richieste (es. 3).")
@@ -90,8 +88,8 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        # Aggiorna il database (usando asyncio.to_thread perché la chiamata DB è sincrona)
-        await asyncio.to_thread(self.board_db.set_min_reactions, interaction.guild_id, amount)
+        # Aggiorna il database
+        await self.guild_config.set_min_reactions(interaction.guild_id, amount)
 
         # Invia messaggio di conferma
         embed = EmbedFactory.create_embed(
@@ -144,12 +142,13 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed)
             return
 
-        unban_time = datetime.utcnow() + delta
+        # DATETIME columns round the microseconds: store exactly what is scheduled
+        unban_time = (datetime.utcnow() + delta).replace(microsecond=0)
         await member.ban(reason=reason)
         logger.info(f"Banned user {member.id} ({member.name}) for {duration}. Unban scheduled at {unban_time}")
         
-        await asyncio.to_thread(self.db.tempban, member.id, interaction.guild_id, reason, unban_time)
-        await self._update_next_unban_time()
+        await self.db.aio.tempban(member.id, interaction.guild_id, reason, unban_time)
+        self.scheduler.schedule(member.id, interaction.guild_id, unban_time)
 
         embed = EmbedFactory.create_embed(
             interaction=interaction,
@@ -163,59 +162,41 @@ class Moderation(commands.Cog):
 
         await interaction.response.send_message(embed=embed)
 
-    async def _update_next_unban_time(self):
-        """
-        Updates the next unban time from the database and schedules the unban task.
-        """
-        next_ban = await asyncio.to_thread(self.db.fetch_next_unban)
-
-        if next_ban:
-            user_id, guild_id, unban_time = next_ban
-            delay = (unban_time - datetime.utcnow()).total_seconds()
-
-            logger.info(f"Next unban scheduled for user {user_id} in guild {guild_id} at {unban_time}. Delay: {delay}s")
-            
-            if delay > 0 and (self.next_unban_time is None or unban_time < self.next_unban_time):
-                self.next_unban_time = unban_time
-
-                if self.unban_task:
-                    self.unban_task.cancel()
-
-                self.unban_task = self.bot.loop.create_task(self._unban_after_delay(delay))
-                logger.info(f"Unban task scheduled to run after {delay}s")
-
-    async def _unban_after_delay(self, delay: float):
+    async def _unban_user(self, user_id: int, guild_id: int) -> bool:
         """
-        Unbans a user after a specified delay.
+        Lifts a temporary ban that has expired, called by the ban scheduler.
 
         Args:
-            delay (float): The delay in seconds before the unban.
-        """
-        logger.info(f"Sleeping for {delay} seconds before unbanning the user.")
-        await asyncio.sleep(delay)
-        await self._unban_user()
+            user_id (int): The ID of the banned user.
+            guild_id (int): The ID of the guild the user is banned from.
 
-    async def _unban_user(self):
-        """
-        Unbans the user whose temporary ban has expired.
+        Returns:
+            bool: `True` if the ban is gone (or can't ever be lifted), `False` to retry later.
         """
-        next_ban = await asyncio.to_thread(self.db.fetch_next_unban)
-
-        if next_ban:
-            user_id, guild_id, unban_time = next_ban
-            guild = self.bot.get_guild(guild_id)
+        guild = self.bot.get_guild(guild_id)
+
+        if guild is None:
+            # Missing from the cache during an outage too: only Discord can tell that the bot has left
+            try:
+                guild = await self.bot.fetch_guild(guild_id)
+            except (discord.NotFound, discord.Forbidden):
+                logger.warning(f"The bot is no longer in guild {guild_id}, dropping the tempban of user {user_id}.")
+                return True
+            except discord.HTTPException as e:
+                logger.warning(f"Guild {guild_id} not available, retrying the unban of user {user_id} later: {e}")
+                return False
 
-            if guild:
-                try:
-                    user = await self.bot.fetch_user(user_id)
-                    await guild.unban(user, reason="Temporary ban expired.")
-                    logger.info(f"User {user_id} has been unbanned in guild {guild_id}")
-                except discord.NotFound:
-                    logger.warning(f"User with ID {user_id} not found for unban in guild {guild_id}.")
-                    pass
+        try:
+            # No need to fetch the user: the ID is enough to lift the ban
+            await guild.unban(discord.Object(id=user_id), reason="Temporary ban expired.")
+            logger.info(f"User {user_id} has been unbanned in guild {guild_id}")
+        except discord.NotFound:
+            logger.warning(f"User with ID {user_id} not found for unban in guild {guild_id}.")
+        except discord.Forbidden:
+            logger.error(f"Missing permissions to unban user {user_id} in guild {guild_id}.")
+            return False
 
-        await asyncio.to_thread(self.db.delete_expired_bans)
-        await self._update_next_unban_time()
+        return True
 
     @app_commands.command(name="pardon", description="Pardon a temporarily banned user.")
     @app_commands.describe(user="User to pardon.", reason="Reason for the pardon.")
@@ -232,7 +213,8 @@ class Moderation(commands.Cog):
         """
         logger.info(f"Pardoning user {user.id} ({user.name}) in guild {interaction.guild.id} for reason: {reason}")
         
-        removed = await asyncio.to_thread(self.db.pardon, user.id, interaction.guild.id)
+        removed = await self.db.aio.pardon(user.id, interaction.guild.id)
+        self.scheduler.cancel(user.id, interaction.guild.id)
 
         if not removed:
             logger.warning(f"No active tempban found for user {user.id} ({user.name}) in guild {interaction.guild.id}")
@@ -255,8 +237,6 @@ class Moderation(commands.Cog):
             logger.warning(f"User {user.id} not found for unban in guild {guild.id}.")
             pass
 
-        await self._update_next_unban_time()
-
         embed = EmbedFactory.create_embed(
             interaction=interaction,
             description=f"☑️ You've pardoned {user.name}",
@@ -309,28 +289,41 @@ class Moderation(commands.Cog):
         When user isn't specified, remove every message no matter who the user is
         """
         logger.info(f"Delete {number} messages")
-        
-        messages = [message async for message in interaction.channel.history(limit = number)]
-        
-        n = 0
 
-        for message in messages:
-            if message.author == member or member == None:
-                await message.delete()
-                n += 1
+        # Purging can take a while: answer now, then keep the response updated
+        await interaction.response.defer(thinking=True)
+
+        async def report(purger: Purger):
+            embed = EmbedFactory.create_embed(
+                interaction=interaction,
+                description=f"🧹 Deleting... {purger.deleted} message(s) deleted, {purger.scanned} checked",
+                title="Deleting messages",
+                colour=discord.Colour.orange(),
+                author="Moderation"
+            )
+            await interaction.edit_original_response(embed=embed)
+
+        purger = Purger(
+            interaction.channel,
+            check=None if member is None else lambda message: message.author == member,
+            on_progress=report
+        )
+        # Messages sent before the command, so the response itself is left alone
+        n = await purger.run(limit=number, before=discord.Object(id=interaction.id))
+        logger.info(f"Deleted {n} of {purger.scanned} messages in channel {interaction.channel_id} ({purger.failed} failed)")
 
         embed = EmbedFactory.create_embed(
             interaction=interaction,
-            description=f"You've deleted {n} message(s) {f"from {member.mention}" if member != None else ""}",
+            description=f"You've deleted {n} message(s) {f'from {member.mention}' if member != None else ''}",
             title="Deleted messages!",
             thumbnail= member.avatar.url if member != None else interaction.user.avatar.url,
             colour=discord.Colour.red(),
             author="Moderation"
         )
         
-        await interaction.response.send_message(embed=embed)
+        await interaction.edit_original_response(embed=embed)
 
 
 
 async def setup(bot):
-    await bot.add_cog(Moderation(bot))
+    pass
@@ -51,7 +51,7 @@ class Roles(commands.Cog):
             )
             interaction_callback = await interaction.response.send_message(embed=embed)
     
-            self.role_system.create_message(interaction_callback.message_id)
+            await self.role_system.aio.create_message(interaction_callback.message_id)
         
         @app_commands.checks.has_permissions(administrator=True)
         @app_commands.guilds(*GUILD_ID)
@@ -90,7 +90,7 @@ class Roles(commands.Cog):
                     emoji_id = emoji
 
                 try:
-                    self.role_system.add_role(
+                    await self.role_system.aio.add_role(
                         message,
                         role.id,
                         emoji_id
@@ -124,7 +124,7 @@ class Roles(commands.Cog):
             @app_commands.guilds(*GUILD_ID)
             async def reset(self, interaction: discord.Interaction):
 
-                self.role_system.reset()
+                await self.role_system.aio.reset()
 
                 embed = EmbedFactory.create_embed(
                     title="Reset roles!",
@@ -155,11 +155,11 @@ class Roles(commands.Cog):
 
                 logger.info(f"Message: {msg}")
 
-                emoji = self.role_system.get_emoji(message, role.id)
+                emoji = await self.role_system.aio.get_emoji(message, role.id)
 
                 await msg.clear_reaction(emoji)
                 
-                self.role_system.remove_role(message, role.id)
+                await self.role_system.aio.remove_role(message, role.id)
 
                 embed = EmbedFactory.create_embed(
                     title="Removed role",
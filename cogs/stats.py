@@ -0,0 +1,124 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+from config import GUILD_ID
+from utils.embed_factory import EmbedFactory
+from utils.debug import Logger
+from utils.metrics import Metrics
+from utils.resolver import Resolver
+import os
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Minutes between two summaries in the log
+LOG_INTERVAL = 15
+
+
+def format_row(name, row):
+    failed = f" ({row['errors']} failed)" if row["errors"] else ""
+    return (
+        f"`{name}` · {row['calls']} calls{failed}\n"
+        f"p50 {row['p50_ms']:.1f}ms · p99 {row['p99_ms']:.1f}ms · "
+        f"db {row['db_ms']:.1f}ms/{row['queries']:.1f}q · rest {row['rest_ms']:.1f}ms/{row['rest']:.1f}"
+    )
+
+
+class Stats(commands.Cog):
+    """
+    Cog exposing the per-handler metrics: latency, database time and queries, Discord REST calls.
+    """
+
+    def __init__(self, bot, metrics: Metrics, resolver: Resolver = None):
+        """
+        Initializes the Stats cog.
+
+        Args:
+            bot (discord.Bot): The bot instance.
+            metrics (Metrics): The registry the event handlers and slash commands are measured into.
+            resolver (Resolver, optional): The resolver whose cache counters are logged with the metrics.
+        """
+        self.bot = bot
+        self.metrics = metrics
+        self.resolver = resolver
+
+    async def cog_load(self):
+        self.log_summary.start()
+
+    async def cog_unload(self):
+        self.log_summary.cancel()
+
+    @tasks.loop(minutes=LOG_INTERVAL)
+    async def log_summary(self):
+        """
+        Logs the handlers that took the most time since the bot started (or since the last reset).
+        """
+        rows = self.metrics.summary(limit=10)
+        if not rows:
+            return
+
+        logger.info(f"Handler metrics, top {len(rows)} by total time:")
+        for name, row in rows:
+            logger.info(
+                f"{name}: {row['calls']} calls, {row['errors']} errors, p50 {row['p50_ms']:.1f}ms, "
+                f"p99 {row['p99_ms']:.1f}ms, db {row['db_ms']:.1f}ms / {row['queries']:.1f} queries, "
+                f"rest {row['rest_ms']:.1f}ms / {row['rest']:.1f} calls"
+            )
+
+        if self.resolver is not None:
+            for kind, row in self.resolver.stats().items():
+                if row["hits"] or row["fetches"]:
+                    logger.info(
+                        f"resolver {kind}: {row['hits']} cache hits, {row['cached']} remembered, "
+                        f"{row['shared']} shared, {row['fetches']} fetches ({row['missing']} missing)"
+                    )
+
+    @app_commands.command(name="stats", description="Show latency, database and REST metrics of the bot's handlers.")
+    @app_commands.describe(handler="Only show this handler (e.g. on_message or /chess matches).", reset="Clear the metrics afterwards.")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guilds(*GUILD_ID)
+    async def stats(self, interaction: discord.Interaction, handler: str = None, reset: bool = False):
+        """
+        Shows the metrics of the handlers that took the most total time, or of a single handler.
+
+        Args:
+            interaction (discord.Interaction): The interaction that triggered the command.
+            handler (str, optional): Name of the handler to show.
+            reset (bool, optional): Whether to clear the metrics after showing them.
+        """
+        rows = self.metrics.summary()
+        if handler:
+            rows = [(name, row) for name, row in rows if name == handler]
+
+        if rows:
+            description = "\n\n".join(format_row(name, row) for name, row in rows[:15])
+        elif handler:
+            description = f"No metrics for `{handler}` yet."
+        else:
+            description = "No metrics recorded yet."
+
+        embed = EmbedFactory.create_embed(
+            interaction=interaction,
+            title="Handler metrics",
+            description=description,
+            colour=discord.Color.blurple(),
+            author="Stats"
+        )
+        embed.add_field(name="Since", value=f"<t:{int(self.metrics.started)}:R>")
+
+        if reset:
+            self.metrics.reset()
+            logger.info(f"Metrics reset by {interaction.user.name}")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @stats.autocomplete("handler")
+    async def handler_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in sorted(self.metrics.handlers) if current.lower() in name.lower()
+        ][:25]
+
+
+async def setup(bot):
+    pass
@@ -0,0 +1,121 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from utils import ban_scheduler
+from utils.ban_scheduler import BanScheduler
+
+
+class FakeModeration:
+    """The part of ModerationSystem the scheduler uses, with the same `aio` access."""
+    def __init__(self, bans=()):
+        self.bans = list(bans)
+        self.deleted = []
+        self.aio = self
+
+    async def fetch_all_bans(self):
+        return self.bans
+
+    async def delete_bans(self, bans):
+        self.deleted += bans
+
+
+def test_next_unban_skips_cancelled_and_rescheduled_bans():
+    scheduler = BanScheduler(FakeModeration(), unban=None)
+    start = datetime(2025, 1, 1)
+    scheduler.schedule(1, 10, start + timedelta(hours=3))
+    scheduler.schedule(2, 10, start + timedelta(hours=1))
+    scheduler.schedule(3, 20, start + timedelta(hours=2))
+
+    assert scheduler.next_unban() == (2, 10, start + timedelta(hours=1))
+    assert scheduler.cancel(2, 10)
+    assert not scheduler.cancel(2, 10)
+    assert scheduler.next_unban() == (3, 20, start + timedelta(hours=2))
+
+    # Rescheduled later: the old, earlier entry is stale
+    scheduler.schedule(3, 20, start + timedelta(hours=5))
+    assert scheduler.next_unban() == (1, 10, start + timedelta(hours=3))
+    assert len(scheduler) == 2
+
+
+def test_heap_order_matches_a_sorted_list():
+    rng = random.Random(2)
+    scheduler = BanScheduler(FakeModeration(), unban=None)
+    start = datetime(2025, 1, 1)
+    expected = {}
+    for _ in range(3000):
+        key = (rng.randrange(200), rng.randrange(3))
+        if rng.random() < 0.3:
+            assert scheduler.cancel(*key) == (expected.pop(key, None) is not None)
+        else:
+            expected[key] = start + timedelta(minutes=rng.randrange(10_000))
+            scheduler.schedule(*key, expected[key])
+
+    assert len(scheduler) == len(expected)
+    # Compaction keeps the stale entries bounded
+    assert len(scheduler._heap) <= max(64, 2 * len(expected)) + 1
+
+    order = []
+    while scheduler.next_unban() is not None:
+        user_id, guild_id, unban_time = scheduler.next_unban()
+        order.append((unban_time, user_id, guild_id))
+        scheduler.cancel(user_id, guild_id)
+    assert order == sorted((unban_time, *key) for key, unban_time in expected.items())
+
+
+async def settle():
+    """Lets the scheduler run until it waits again: nothing it awaits in these tests does real I/O."""
+    for _ in range(100):
+        await asyncio.sleep(0)
+
+
+def test_due_bans_are_lifted_and_failures_retried():
+    start = datetime(2025, 1, 1)
+    now = [start]
+    moderation = FakeModeration([(1, 10, start - timedelta(days=1)), (2, 10, start - timedelta(seconds=1))])
+    attempts = {}
+
+    async def unban(user_id, guild_id):
+        attempts[user_id] = attempts.get(user_id, 0) + 1
+        if user_id == 2 and attempts[user_id] == 1:
+            raise RuntimeError("Discord is down")
+        if user_id == 4:
+            return False
+        return True
+
+    def lifted():
+        return sorted(ban[0] for ban in moderation.deleted)
+
+    async def main():
+        scheduler = BanScheduler(moderation, unban, clock=lambda: now[0])
+        scheduler.start()
+        await settle()
+        # Loaded and lifted straight away, 2 is waiting for its retry
+        assert lifted() == [1]
+
+        for user_id in (3, 4, 5):
+            scheduler.schedule(user_id, 10, start + timedelta(seconds=20))
+        scheduler.cancel(5, 10)
+        await settle()
+        assert lifted() == [1] and attempts == {1: 1, 2: 1}
+
+        # Time only moves when the test says so: the scheduler rechecks it when woken up
+        now[0] = start + timedelta(seconds=30)
+        scheduler._wakeup.set()
+        await settle()
+        assert lifted() == [1, 3] and attempts[4] == 1
+
+        now[0] = start + 3 * ban_scheduler.RETRY_DELAY
+        scheduler._wakeup.set()
+        await settle()
+        scheduler.close()
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert lifted() == [1, 2, 3]
+    # Deleted with the retry time, not earlier than the stored one, so the row still goes
+    retried = next(ban for ban in moderation.deleted if ban[0] == 2)
+    assert retried[2] == start + ban_scheduler.RETRY_DELAY
+    assert 5 not in attempts
+    # Refused: still pending, retried later
+    assert attempts[4] == 2 and len(scheduler) == 1
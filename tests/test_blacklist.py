@@ -0,0 +1,74 @@
+import json
+import random
+
+from utils.blacklist import BlacklistMatcher, compile_words, normalize
+
+
+def test_pattern_finds_exactly_the_words():
+    rng = random.Random(4)
+    words = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(30)}
+    pattern = compile_words(sorted(words))
+
+    for _ in range(2000):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 12)))
+        match = pattern.search(text)
+        assert (match is not None) == any(word in text for word in words)
+        if match:
+            assert match.group(0) in words
+
+
+def test_shorter_words_absorb_their_extensions():
+    pattern = compile_words(["bad", "badword", "bag", "bat"])
+    assert pattern.search("such a badword").group(0) == "bad"
+    assert [pattern.search(text).group(0) for text in ("bag", "a bat", "bagel")] == ["bag", "bat", "bag"]
+    assert not pattern.search("ba") and not pattern.search("bed") and not pattern.search("b a d")
+
+
+def test_special_characters_are_literal():
+    pattern = compile_words(["a.b", "c+", "(x)"])
+    assert pattern.search("a.b") and pattern.search("c+") and pattern.search("(x)")
+    assert not pattern.search("axb") and not pattern.search("ccc") and not pattern.search("x")
+
+
+def test_no_words():
+    assert compile_words([]) is None
+    assert compile_words([""]) is None
+
+
+def test_normalize():
+    assert normalize("Èlite CAFÉ", casefold=True, accents=True) == "elite cafe"
+    assert normalize("Èlite CAFÉ", casefold=True) == "èlite café"
+    assert normalize("n00b", leetspeak=True) == "noob"
+    # Nothing is normalized unless asked for
+    assert normalize("Èlite n00b") == "Èlite n00b"
+
+
+def test_matcher_is_exact_by_default(tmp_path):
+    path = tmp_path / "blacklist.json"
+    path.write_text(json.dumps({"words": ["Spam", "scàm"]}), encoding="utf-8")
+    matcher = BlacklistMatcher(str(path), reload_interval=0)
+
+    assert matcher.search("Buy Spam now") == "Spam"
+    assert "a scàm" in matcher
+    assert "spam" not in matcher and "a scam" not in matcher
+
+
+def test_matcher_reloads_and_keeps_the_list_on_errors(tmp_path):
+    path = tmp_path / "blacklist.json"
+    path.write_text(json.dumps({"words": ["Spam", "scàm"]}), encoding="utf-8")
+    matcher = BlacklistMatcher(str(path), casefold=True, accents=True, reload_interval=0)
+
+    assert matcher.search("Buy SPAM now") == "spam"
+    assert "a SCAM" in matcher
+    assert "hello" not in matcher
+    assert matcher.search("") is None
+
+    path.write_text(json.dumps({"words": ["n00b"], "options": {"leetspeak": True}}), encoding="utf-8")
+    assert matcher.reload()
+    assert matcher.search("what a NOOB") == "noob"
+    assert "spam" not in matcher
+
+    # A half-written file doesn't drop the current list
+    path.write_text("{\"words\": [", encoding="utf-8")
+    assert not matcher.reload()
+    assert "n00b" in matcher
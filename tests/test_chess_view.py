@@ -0,0 +1,38 @@
+import asyncio
+
+from views.chess_view import MatchAcceptView, MatchResultView, match_view
+
+
+def build(*args):
+    # Views need a running event loop
+    async def main():
+        return match_view(None, *args)
+    return asyncio.run(main())
+
+
+def custom_ids(view):
+    return sorted(item.custom_id for item in view.children)
+
+
+def test_pending_matches_get_the_accept_view():
+    view = build(7, "PENDING", 1, 2)
+    assert isinstance(view, MatchAcceptView)
+    assert view.is_persistent()
+    assert custom_ids(view) == ["chess:accept:7"]
+    assert (view.match_id, view.p1_id, view.p2_id) == (7, 1, 2)
+
+
+def test_started_matches_get_the_result_view():
+    view = build(8, "STARTED", 3, 4)
+    assert isinstance(view, MatchResultView)
+    assert view.is_persistent()
+    assert custom_ids(view) == ["chess:draw:8", "chess:loss:8", "chess:win:8"]
+
+
+def test_every_match_has_its_own_ids():
+    # Registered side by side after a restart: the IDs must not collide
+    first, second = build(1, "STARTED", 1, 2), build(2, "STARTED", 1, 2)
+    assert not set(custom_ids(first)) & set(custom_ids(second))
+    # Building a view doesn't change the IDs of the next one
+    assert custom_ids(build(3, "PENDING", 1, 2)) == ["chess:accept:3"]
+    assert custom_ids(build(4, "PENDING", 1, 2)) == ["chess:accept:4"]
@@ -0,0 +1,196 @@
+import time
+from collections import deque
+from itertools import count
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode, errors
+
+from utils.database import BaseDatabase, ConnectionPool, is_disconnect
+
+_databases = count()
+
+
+class StubServer:
+    """Hands out stub connections and drops the next `drops` statements as a lost connection would."""
+    def __init__(self):
+        self.connections = []
+        self.executed = []
+        self.drops = 0
+
+    def connect(self, **kwargs):
+        conn = StubConnection(self)
+        self.connections.append(conn)
+        return conn
+
+
+class StubConnection:
+    def __init__(self, server):
+        self.server = server
+        self.in_transaction = False
+        self.closed = False
+        self.reconnects = 0
+        self.pings = 0
+        self.ping_error = None
+
+    def cursor(self, buffered=True):
+        return StubCursor(self)
+
+    def reconnect(self, attempts=1, delay=0):
+        self.reconnects += 1
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.pings += 1
+        if self.ping_error is not None:
+            raise self.ping_error
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class StubCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+
+    def execute(self, query, params=()):
+        server = self.conn.server
+        if server.drops:
+            server.drops -= 1
+            raise errors.OperationalError(msg="Lost connection to MySQL server during query", errno=errorcode.CR_SERVER_LOST)
+        server.executed.append(query)
+        self.rowcount = 1
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchall(self):
+        return [(1,), (2,)]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = StubServer()
+    monkeypatch.setattr(mysql.connector, "connect", server.connect)
+    return server
+
+
+def make_database():
+    # Every database name gets a pool of its own
+    return BaseDatabase("localhost", "user", "password", f"test{next(_databases)}", pool_size=2)
+
+
+def test_is_disconnect():
+    assert is_disconnect(errors.OperationalError(errno=errorcode.CR_SERVER_GONE_ERROR))
+    # Raised as is by the connector, without an errno
+    assert is_disconnect(errors.OperationalError("MySQL Connection not available"))
+    assert not is_disconnect(errors.ProgrammingError(errno=errorcode.ER_PARSE_ERROR))
+    assert not is_disconnect(errors.OperationalError(errno=errorcode.ER_LOCK_DEADLOCK))
+
+
+def test_reads_are_retried_once_on_a_new_connection(server):
+    db = make_database()
+    server.drops = 1
+
+    assert db.fetchone("SELECT 1") == (1,)
+    assert server.executed == ["SELECT 1"]
+    # The dead connection was discarded, not given back to the pool
+    first, second = server.connections
+    assert first.closed and not second.closed
+    assert db.pool._opened == 1
+
+    # Only once: two drops in a row reach the caller
+    server.drops = 2
+    with pytest.raises(errors.OperationalError):
+        db.fetchall("SELECT 2")
+    assert db.pool._opened == 0
+
+
+def test_writes_are_only_retried_when_idempotent(server):
+    db = make_database()
+
+    server.drops = 1
+    with pytest.raises(errors.OperationalError):
+        db.execute("INSERT INTO t VALUES (1)")
+    # It may have run before the connection dropped: never sent again
+    assert server.executed == []
+
+    server.drops = 1
+    assert db.execute("INSERT IGNORE INTO t VALUES (1)", idempotent=True) == 1
+    assert server.executed == ["INSERT IGNORE INTO t VALUES (1)"]
+
+
+def test_statement_errors_are_not_retried(server, monkeypatch):
+    db = make_database()
+
+    def fail(self, query, params=()):
+        raise errors.ProgrammingError(msg="syntax error", errno=errorcode.ER_PARSE_ERROR)
+
+    monkeypatch.setattr(StubCursor, "execute", fail)
+    with pytest.raises(errors.ProgrammingError):
+        db.fetchone("SELEC 1")
+    # Still healthy: back in the pool
+    assert len(server.connections) == 1 and not server.connections[0].closed
+    assert db.pool._opened == 1 and len(db.pool._idle) == 1
+
+
+def test_pool_is_bounded_and_reuses_the_latest_connection(server):
+    pool = ConnectionPool(size=2, timeout=0)
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(errors.PoolError):
+        pool.acquire()
+
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is second
+    # Reconnected before being handed out after a disconnect
+    assert pool.acquire(fresh=True) is first and first.reconnects == 1
+
+    # A broken connection frees its slot for a new one
+    pool.release(first, broken=True)
+    assert first.closed
+    third = pool.acquire()
+    assert third not in (first, second) and len(server.connections) == 3
+
+    pool.release(second)
+    pool.close()
+    assert second.closed and not third.closed
+    # Checked out while the pool was closed: closed when given back
+    pool.release(third)
+    assert third.closed and pool._opened == 0
+
+
+class Ticks:
+    """Stand-in for the keepalive's stop event: lets the loop run `n` times without waiting."""
+    def __init__(self, n):
+        self.n = n
+
+    def wait(self, timeout):
+        self.n -= 1
+        return self.n < 0
+
+    def is_set(self):
+        return False
+
+
+def test_keepalive_pings_the_idle_connections(server):
+    pool = ConnectionPool(size=3, keepalive_after=60)
+    recent, idle, dead = (server.connect() for _ in range(3))
+    dead.ping_error = errors.OperationalError(errno=errorcode.CR_SERVER_GONE_ERROR)
+    now = time.monotonic()
+    pool._idle = deque([(idle, now - 120), (dead, now - 120), (recent, now)])
+    pool._opened = 3
+
+    pool._stop = Ticks(1)
+    pool._keepalive_loop()
+
+    assert (recent.pings, idle.pings, dead.pings) == (0, 1, 1)
+    # The live one goes behind the connection in use, the dead one is dropped
+    assert [conn for conn, _ in pool._idle] == [idle, recent]
+    assert dead.closed and pool._opened == 2
@@ -0,0 +1,144 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+from discord.app_commands import AppCommandError
+from discord.ext import commands
+
+from utils.database import run_in_executor
+from utils.metrics import (
+    TIME_BUCKETS, Histogram, InstrumentedCommandTree, Metrics, metrics, record_query, rest_trace, spawn
+)
+
+
+def test_percentiles_are_within_a_bucket():
+    histogram = Histogram(TIME_BUCKETS)
+    assert histogram.percentile(0.5) == 0.0 and histogram.mean == 0.0
+
+    for value in range(1, 1001):
+        histogram.record(value)
+
+    # Buckets grow by 25%: the upper bound of the bucket is at most that far off
+    assert 500 <= histogram.percentile(0.5) <= 500 * 1.25
+    assert 990 <= histogram.percentile(0.99) <= 1000
+    # Never above the largest value
+    assert histogram.percentile(1.0) == histogram.max == 1000
+    assert histogram.count == 1000 and histogram.mean == pytest.approx(500.5)
+
+
+def test_measure_counts_queries_and_failures():
+    registry = Metrics()
+
+    async def main():
+        with registry.measure("handler"):
+            record_query(0.002)
+            # From a database thread: the context goes with the call
+            await run_in_executor(record_query, 0.003, statements=4)
+        with pytest.raises(ValueError):
+            with registry.measure("handler"):
+                raise ValueError
+        # Nothing running: ignored
+        record_query(1)
+
+    asyncio.run(main())
+    [(name, row)] = registry.summary()
+    assert name == "handler"
+    assert (row["calls"], row["errors"]) == (2, 1)
+    assert row["queries"] == pytest.approx(2.5)
+    assert row["db_ms"] == pytest.approx(2.5)
+
+    registry.reset()
+    assert registry.summary() == []
+
+
+def test_instrument_records_every_call():
+    registry = Metrics()
+
+    @registry.instrument()
+    async def on_event(value):
+        return value * 2
+
+    @registry.instrument("renamed")
+    async def failing():
+        raise RuntimeError
+
+    async def main():
+        assert await on_event(2) == 4
+        assert await on_event(3) == 6
+        with pytest.raises(RuntimeError):
+            await failing()
+
+    asyncio.run(main())
+    assert on_event.__name__ == "on_event"
+    rows = dict(registry.summary())
+    assert (rows["on_event"]["calls"], rows["on_event"]["errors"]) == (2, 0)
+    assert (rows["renamed"]["calls"], rows["renamed"]["errors"]) == (1, 1)
+
+
+def test_spawned_tasks_are_not_charged():
+    registry = Metrics()
+
+    async def query():
+        record_query(0.001)
+
+    async def main():
+        with registry.measure("handler"):
+            await asyncio.ensure_future(query())
+            await spawn(query())
+
+    asyncio.run(main())
+    assert registry.summary()[0][1]["queries"] == 1
+
+
+def test_rest_requests_are_charged():
+    trace = rest_trace()
+    registry = Metrics()
+
+    async def request():
+        # What aiohttp does around every request
+        context = trace.trace_config_ctx()
+        for callback in trace.on_request_start:
+            await callback(None, context, None)
+        for callback in trace.on_request_end:
+            await callback(None, context, None)
+
+    async def main():
+        with registry.measure("handler"):
+            await request()
+            await request()
+        await request()
+
+    asyncio.run(main())
+    [(_, row)] = registry.summary()
+    assert row["rest"] == 2
+
+
+def test_command_tree_records_each_interaction():
+    metrics.reset()
+
+    def interaction(name, type=discord.InteractionType.application_command):
+        return SimpleNamespace(data={"name": name}, command=None, type=type, command_failed=False, user=None)
+
+    async def main():
+        tree = commands.Bot(command_prefix="!", intents=discord.Intents.none(), tree_cls=InstrumentedCommandTree).tree
+
+        async def invoke(interaction, error=None):
+            # As the tree runs it: checked, then the command, in a task of its own
+            assert await tree.interaction_check(interaction)
+            record_query(0.001)
+            if error is not None:
+                interaction.command_failed = True
+                await tree.on_error(interaction, error)
+
+        await asyncio.ensure_future(invoke(interaction("ping")))
+        await asyncio.ensure_future(invoke(interaction("ping"), AppCommandError("failed")))
+        await asyncio.ensure_future(invoke(interaction("rank", discord.InteractionType.autocomplete)))
+        # Done callbacks run on the next iteration
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    rows = dict(metrics.summary())
+    metrics.reset()
+    assert set(rows) == {"/ping", "/rank (autocomplete)"}
+    assert (rows["/ping"]["calls"], rows["/ping"]["errors"], rows["/ping"]["queries"]) == (2, 1, 1)
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from utils.level_system import MAX_LEVEL
+from utils.rank_index import GuildRanking, _Fenwick
+
+
+def brute_force(users):
+    """Ranks as the leaderboard defines them: level, then XP, ties share the rank."""
+    return {
+        user_id: 1 + sum(1 for other in users.values() if other > state)
+        for user_id, state in users.items()
+    }
+
+
+def test_fenwick_prefix_and_find():
+    tree = _Fenwick(size=4)
+    for level in (0, 1, 1, 3, 9):
+        tree.add(level, 1)
+
+    assert tree.size >= 10
+    assert [tree.prefix(level) for level in range(5)] == [1, 3, 3, 4, 4]
+    assert tree.prefix(9) == 5
+    assert [tree.find(k) for k in range(1, 6)] == [0, 1, 1, 3, 9]
+
+
+def test_fenwick_rejects_negative_levels():
+    with pytest.raises(ValueError):
+        _Fenwick().add(-1, 1)
+
+
+def test_rank_and_page_match_brute_force():
+    rng = random.Random(7)
+    ranking = GuildRanking()
+    users = {}
+    for _ in range(2000):
+        user_id = rng.randrange(300)
+        if rng.random() < 0.1:
+            ranking.remove(user_id)
+            users.pop(user_id, None)
+        else:
+            state = (rng.randrange(40), rng.randrange(50))
+            ranking.set(user_id, *state)
+            users[user_id] = state
+
+    expected = brute_force(users)
+    assert len(ranking) == len(users)
+    assert {user_id: ranking.rank(user_id) for user_id in users} == expected
+
+    rows = ranking.page(0, len(users))
+    assert [user_id for _, user_id, _, _ in rows] == sorted(users, key=lambda u: (-users[u][0], -users[u][1], u))
+    assert all(rank == expected[user_id] for rank, user_id, _, _ in rows)
+    assert ranking.page(10, 5) == rows[10:15]
+    assert ranking.page(len(users), 5) == []
+
+
+def test_out_of_range_levels_are_clamped():
+    ranking = GuildRanking()
+    ranking.set(1, -1, 0)
+    ranking.set(2, 0, 10)
+    ranking.set(3, MAX_LEVEL * 10, 0)
+
+    assert ranking.rank(3) == 1
+    assert ranking.rank(2) == 2
+    assert ranking.rank(1) == 3
+    # The real level is still reported
+    assert ranking.page(0, 3)[2] == (3, 1, -1, 0)
+
+    ranking.set(1, 5, 0)
+    assert ranking.rank(1) == 2
+    ranking.remove(3)
+    assert ranking.page(0, 5) == [(1, 1, 5, 0), (2, 2, 0, 10)]
+
+
+def test_levels_sharing_a_bound_keep_their_order():
+    users = {1: (MAX_LEVEL + 5, 0), 2: (MAX_LEVEL * 10, 0), 3: (MAX_LEVEL, 900), 4: (-3, 50), 5: (-1, 0), 6: (0, 0)}
+    ranking = GuildRanking()
+    for user_id, (level, xp) in users.items():
+        ranking.set(user_id, level, xp)
+
+    assert {user_id: ranking.rank(user_id) for user_id in users} == brute_force(users)
+    assert [row[1] for row in ranking.page(0, 10)] == [2, 1, 3, 6, 5, 4]
+    assert [row[1] for row in ranking.page(1, 2)] == [1, 3]
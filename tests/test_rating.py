@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from utils import rating
+from utils.rating import DEFAULT, rate, rate_game, replay
+
+
+def random_games(count, players, seed):
+    rng = random.Random(seed)
+    return [
+        (match_id, *rng.sample(range(players), 2), rng.choice((0, 0.5, 1)))
+        for match_id in range(count)
+    ]
+
+
+def test_volatility_matches_the_glicko2_paper():
+    # Step 5 of the worked example in glicko2.pdf
+    sigma = rating._volatility(phi=1.1513, sigma=0.06, delta=-0.4834, v=1.7785)
+    assert sigma == pytest.approx(0.05999, abs=1e-5)
+
+
+def test_single_game():
+    won, lost = rate_game(DEFAULT, DEFAULT, 1)
+
+    assert won[0] > rating.DEFAULT_RATING > lost[0]
+    # Symmetric around the starting rating
+    assert won[0] - rating.DEFAULT_RATING == pytest.approx(rating.DEFAULT_RATING - lost[0])
+    # Playing makes the rating more certain
+    assert won[1] < rating.DEFAULT_RD and lost[1] < rating.DEFAULT_RD
+
+
+def test_draw_between_equals_keeps_the_rating():
+    new_rating, rd, _ = rate(DEFAULT, DEFAULT, 0.5)
+    assert new_rating == pytest.approx(rating.DEFAULT_RATING)
+    assert rd < rating.DEFAULT_RD
+
+
+def test_upsets_move_ratings_more():
+    strong, weak = (1800.0, 80.0, 0.06), (1400.0, 80.0, 0.06)
+    gain_expected = rate(strong, weak, 1)[0] - strong[0]
+    gain_upset = rate(weak, strong, 1)[0] - weak[0]
+    assert 0 < gain_expected < gain_upset
+
+
+def test_replay_matches_game_by_game():
+    games = random_games(2000, 40, seed=11)
+    start = {0: (1700.0, 120.0, 0.05)}
+
+    expected, history = dict(start), []
+    for match_id, first_id, second_id, first_score in games:
+        first, second = rate_game(expected.get(first_id, DEFAULT), expected.get(second_id, DEFAULT), first_score)
+        expected[first_id], expected[second_id] = first, second
+        history += [(match_id, first_id, *first), (match_id, second_id, *second)]
+
+    assert replay(games, start) == (expected, history)
+    assert replay([]) == ({}, [])
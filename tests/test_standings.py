@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from utils.standings import Standings
+
+
+def brute_force(scores, games):
+    """Tiebreaks recomputed from the whole history, as the tournament rules define them."""
+    buchholz = dict.fromkeys(scores, 0.0)
+    sonneborn = dict.fromkeys(scores, 0.0)
+    for first_id, second_id, first_score in games:
+        for user_id, opponent_id, points in ((first_id, second_id, first_score), (second_id, first_id, 1 - first_score)):
+            if user_id in scores:
+                buchholz[user_id] += scores.get(opponent_id, 0.0)
+                sonneborn[user_id] += points * scores.get(opponent_id, 0.0)
+    return buchholz, sonneborn
+
+
+def assert_table(standings, scores, games):
+    buchholz, sonneborn = brute_force(scores, games)
+    table = standings.table()
+    assert [row[0] for row in table] == sorted(scores, key=lambda u: (-scores[u], -buchholz[u], -sonneborn[u], u))
+    for user_id, score, bh, sb in table:
+        assert score == pytest.approx(scores[user_id])
+        assert bh == pytest.approx(buchholz[user_id])
+        assert sb == pytest.approx(sonneborn[user_id])
+    assert [standings.rank(row[0]) for row in table] == list(range(1, len(table) + 1))
+
+
+def test_tiebreaks_of_a_small_tournament():
+    standings = Standings()
+    standings.load([(1, 0.0), (2, 0.0), (3, 0.0), (4, 0.0)], [])
+    standings.record_game(1, 2, 1, 1, 0)
+    standings.record_game(3, 4, 0.5, 0.5, 0.5)
+    standings.record_game(1, 3, 1, 1, 0)
+
+    assert standings.table() == [
+        (1, 2.0, 0.5, 0.5),    # beat 2 (0) and 3 (0.5)
+        (3, 0.5, 2.5, 0.25),   # drew with 4 (0.5), lost to 1 (2)
+        (4, 0.5, 0.5, 0.25),   # drew with 3 (0.5)
+        (2, 0.0, 2.0, 0.0),    # lost to 1 (2)
+    ]
+    assert standings.rank(2) == 4
+    assert standings.rank(99) is None
+
+
+def test_incremental_updates_match_a_full_recompute():
+    rng = random.Random(5)
+    scores = {user_id: 0.0 for user_id in range(25)}
+    games = []
+    standings = Standings()
+    standings.load(list(scores.items()), [])
+
+    for step in range(600):
+        if step % 50 == 0:
+            user_id = len(scores)
+            scores[user_id] = 0.0
+            standings.add_player(user_id)
+        elif step % 37 == 0:
+            losers = rng.sample(sorted(scores), 3)
+            for user_id in losers:
+                scores[user_id] -= 1
+            standings.penalize(losers, 1)
+        else:
+            # Now and then against somebody who signed out
+            first_id, second_id = rng.sample(sorted(scores) + [1000], 2)
+            first_score = rng.choice((0, 0.5, 1))
+            first_points, second_points = first_score, 1 - first_score
+            for user_id, points in ((first_id, first_points), (second_id, second_points)):
+                if user_id in scores:
+                    scores[user_id] += points
+            games.append((first_id, second_id, first_score))
+            standings.record_game(first_id, second_id, first_score, first_points, second_points)
+
+    assert len(standings) == len(scores)
+    assert_table(standings, scores, games)
+
+    # Loading the same state from scratch gives the same table
+    reloaded = Standings()
+    reloaded.load(list(scores.items()), [(match_id, *game) for match_id, game in enumerate(games)])
+    assert reloaded.table() == pytest.approx(standings.table())
+
+
+def test_clear():
+    standings = Standings()
+    standings.load([(1, 1.0)], [])
+    standings.clear()
+    assert standings.table() == [] and len(standings) == 0
@@ -0,0 +1,70 @@
+import asyncio
+import sys
+import types
+from types import SimpleNamespace
+
+# The cogs read the guild IDs from the local config, which isn't part of the repository
+try:
+    import config  # noqa: F401
+except ImportError:
+    sys.modules["config"] = types.ModuleType("config")
+    sys.modules["config"].GUILD_ID = [1000]
+
+from cogs.stats import Stats, format_row
+from utils.metrics import Metrics
+
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+def interaction():
+    user = SimpleNamespace(name="admin", avatar=SimpleNamespace(url="https://example.com/a.png"))
+    return SimpleNamespace(user=user, response=FakeResponse())
+
+
+def registry():
+    metrics = Metrics()
+    for name, calls, failures in (("on_message", 3, 0), ("/rank", 1, 1)):
+        for call in range(calls):
+            try:
+                with metrics.measure(name):
+                    if call < failures:
+                        raise RuntimeError
+            except RuntimeError:
+                pass
+    return metrics
+
+
+def test_format_row_shows_the_failures():
+    metrics = registry()
+    rows = dict(metrics.summary())
+    assert "(1 failed)" in format_row("/rank", rows["/rank"])
+    assert format_row("on_message", rows["on_message"]).startswith("`on_message` · 3 calls\n")
+
+
+def test_stats_command_shows_and_resets():
+    metrics = registry()
+    cog = Stats(None, metrics)
+
+    first = interaction()
+    asyncio.run(cog.stats.callback(cog, first, handler="/rank"))
+    [message] = first.response.sent
+    assert message["ephemeral"]
+    assert message["embed"].description.startswith("`/rank` · 1 calls (1 failed)")
+    assert "on_message" not in message["embed"].description
+
+    second = interaction()
+    asyncio.run(cog.stats.callback(cog, second, handler="missing", reset=True))
+    assert second.response.sent[0]["embed"].description == "No metrics for `missing` yet."
+    assert metrics.summary() == []
+
+
+def test_handler_autocomplete():
+    cog = Stats(None, registry())
+    choices = asyncio.run(cog.handler_autocomplete(interaction(), "MESS"))
+    assert [choice.value for choice in choices] == ["on_message"]
@@ -0,0 +1,140 @@
+import itertools
+import random
+
+import pytest
+
+from utils import swiss
+from utils.swiss import _Search, pair_round
+
+
+def met(*pairs):
+    """Builds the `opponents` argument of pair_round from the games already played."""
+    opponents = {}
+    for a, b in pairs:
+        opponents.setdefault(a, set()).add(b)
+        opponents.setdefault(b, set()).add(a)
+    return opponents
+
+
+def paired_players(pairing):
+    return [player for pair in pairing.pairs for player in pair]
+
+
+def test_score_groups_top_half_against_bottom_half():
+    scores = {1: 2.0, 2: 2.0, 3: 2.0, 4: 2.0, 5: 0.0, 6: 0.0}
+    pairing = pair_round(scores, {}, {}, seed=1)
+
+    assert sorted(paired_players(pairing)) == sorted(scores)
+    assert pairing.bye is None
+    assert pairing.rematches == 0
+    # Nobody floats: both groups have an even number of players
+    assert all(scores[a] == scores[b] for a, b in pairing.pairs)
+    assert scores[pairing.pairs[0][0]] == 2.0
+
+
+def test_never_pairs_a_rematch_when_avoidable():
+    scores = dict.fromkeys(range(1, 7), 1.0)
+    opponents = met((1, 2), (3, 4), (5, 6), (1, 3), (2, 5))
+    pairing = pair_round(scores, opponents, {}, seed=3)
+
+    assert pairing.rematches == 0
+    assert all(b not in opponents.get(a, ()) for a, b in pairing.pairs)
+
+
+def test_bye_goes_to_the_lowest_ranked_player_without_one():
+    scores = {1: 3.0, 2: 2.0, 3: 1.0, 4: 0.5, 5: 0.0}
+    pairing = pair_round(scores, {}, {5: 1}, seed=0)
+
+    assert pairing.bye == 4
+    assert sorted(paired_players(pairing)) == [1, 2, 3, 5]
+
+
+def test_rematches_only_when_there_is_no_other_way():
+    scores = dict.fromkeys(range(1, 5), 1.0)
+    # Everybody already played everybody
+    pairing = pair_round(scores, met(*itertools.combinations(scores, 2)), {}, seed=0)
+
+    assert sorted(paired_players(pairing)) == [1, 2, 3, 4]
+    assert pairing.rematches == 2
+
+
+def test_same_state_same_pairings():
+    scores = {player: float(player % 3) for player in range(20)}
+    assert pair_round(scores, {}, {}, seed=42).pairs == pair_round(scores, {}, {}, seed=42).pairs
+
+
+def odd_groups():
+    """12 players in a group of 3 and a group of 9 that already met across: no rematch-free pairing."""
+    small, large = [0, 1, 2], list(range(3, 12))
+    return small, large, met(*itertools.product(small, large))
+
+
+def test_search_gives_up_after_the_budget(monkeypatch):
+    small, large, opponents = odd_groups()
+    players = large + small
+    scores = dict.fromkeys(players, 0.0)
+
+    # Exhausting the tree proves there's no pairing, but visits hundreds of nodes
+    exhaustive = _Search(scores, opponents)
+    assert exhaustive.run(players) is None
+    assert exhaustive.visited > 100
+
+    monkeypatch.setattr(swiss, "SEARCH_BUDGET", 50)
+    search = _Search(scores, opponents)
+    assert search.run(players) is None
+    # Past the budget every open branch returns at once
+    assert search.visited == swiss.SEARCH_BUDGET + 1
+
+
+@pytest.mark.parametrize("budget", [0, 50, swiss.SEARCH_BUDGET])
+def test_budget_falls_back_to_the_matching(monkeypatch, budget):
+    monkeypatch.setattr(swiss, "SEARCH_BUDGET", budget)
+    small, large, opponents = odd_groups()
+    pairing = pair_round(dict.fromkeys(small + large, 0.0), opponents, {}, seed=5)
+
+    assert sorted(paired_players(pairing)) == list(range(12))
+    assert pairing.bye is None
+    # One player of the small group has to play a rematch
+    assert pairing.rematches == 1
+
+
+def fewest_rematches(players, opponents):
+    """Tries every perfect matching: only for a handful of players."""
+    if not players:
+        return 0
+    first, rest = players[0], players[1:]
+    return min(
+        (other in opponents.get(first, ())) + fewest_rematches(rest[:i] + rest[i + 1:], opponents)
+        for i, other in enumerate(rest)
+    )
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_rematches_are_the_fewest_possible(seed):
+    rng = random.Random(seed)
+    players = list(range(rng.choice((6, 7, 8, 9, 10))))
+    opponents = met(*(pair for pair in itertools.combinations(players, 2) if rng.random() < 0.6))
+    scores = {player: rng.randrange(3) / 2 for player in players}
+    byes = {player: rng.randrange(2) for player in players}
+    pairing = pair_round(scores, opponents, byes, seed=seed)
+
+    assert sorted(paired_players(pairing) + [pairing.bye] * (pairing.bye is not None)) == players
+    assert pairing.rematches == sum(1 for a, b in pairing.pairs if b in opponents.get(a, ()))
+    if len(players) % 2 == 0:
+        assert pairing.rematches == fewest_rematches(players, opponents)
+    else:
+        # The first bye candidate among the ones allowing the fewest rematches
+        candidates = sorted(reversed(sorted(players, key=lambda p: -scores[p])), key=lambda p: byes[p])
+        rematches = {c: fewest_rematches([p for p in players if p != c], opponents) for c in candidates}
+        assert pairing.rematches == min(rematches.values())
+        assert byes[pairing.bye] == min(byes[c] for c in candidates if rematches[c] == pairing.rematches)
+
+
+def test_a_large_clique_costs_one_rematch():
+    players = list(range(200))
+    # 101 players already met each other: two of them have to meet again, nobody else
+    opponents = met(*itertools.combinations(players[:101], 2))
+    pairing = pair_round({player: float(player % 4) for player in players}, opponents, {}, seed=1)
+
+    assert sorted(paired_players(pairing)) == players
+    assert pairing.rematches == 1
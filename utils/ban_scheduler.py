@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import os
+from datetime import datetime, timedelta
+
+from utils.debug import Logger
+from utils.metrics import spawn
+from utils.moderation_system import ModerationSystem
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Unbans that failed for a transient reason (e.g. Discord errors) are retried after this delay
+RETRY_DELAY = timedelta(minutes=1)
+
+
+class BanScheduler:
+    """
+    Timer scheduler for the temporary bans.
+
+    Every pending unban is kept in a min-heap ordered by unban time, loaded once from the `banned` table.
+    Inserting, cancelling and rescheduling a ban are O(log n): a cancelled or rescheduled ban leaves its
+    old heap entry behind, which is skipped when it comes up (lazy deletion). A single task sleeps until
+    the earliest unban and is woken up whenever an earlier one is inserted; all the bans that are due
+    are then processed concurrently, in batches, and only the ones actually lifted are deleted.
+
+    Attributes:
+        moderation_system (ModerationSystem): The moderation system storing the temporary bans.
+        unban (Callable): Coroutine function `unban(user_id, guild_id)`, returns `True` once the user is
+            no longer banned (or the ban can be dropped), `False` to retry later. May raise to retry later.
+        batch_size (int): Maximum number of due bans processed at once.
+        concurrency (int): Maximum number of unbans running at the same time.
+        clock (Callable): Returns the current time in UTC, the one the unban times are compared with.
+    """
+    def __init__(self, moderation_system: ModerationSystem, unban, batch_size=100, concurrency=10,
+                 clock=datetime.utcnow):
+        self.moderation_system = moderation_system
+        self.unban = unban
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.clock = clock
+
+        self._heap = []  # (unban_time, user_id, guild_id), including stale entries
+        self._pending = {}  # (user_id, guild_id) -> unban_time of the live entry
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self, wait_until=None):
+        """
+        Loads the pending bans and starts the scheduler, to be called once the event loop is running.
+
+        Args:
+            wait_until (Callable, optional): Coroutine function awaited before the bans are loaded,
+                e.g. `bot.wait_until_ready`, so the guilds are available when the overdue bans are lifted.
+        """
+        if self._task is None:
+            self._task = spawn(self._run(wait_until))
+
+    def close(self):
+        """Stops the scheduler; the bans stay in the database and are picked up again at the next start."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, user_id, guild_id, unban_time):
+        """
+        Schedules (or reschedules) the unban of a user.
+
+        Args:
+            user_id (int): The ID of the banned user.
+            guild_id (int): The ID of the guild the user is banned from.
+            unban_time (datetime): When to lift the ban, in UTC.
+        """
+        key = (user_id, guild_id)
+        self._pending[key] = unban_time
+        heapq.heappush(self._heap, (unban_time, user_id, guild_id))
+
+        # Only an unban earlier than the one being waited for needs to wake the scheduler up
+        if self._heap[0][0] == unban_time:
+            self._wakeup.set()
+
+        self._compact()
+
+    def cancel(self, user_id, guild_id):
+        """
+        Cancels the scheduled unban of a user, e.g. after a pardon.
+
+        Returns:
+            bool: `True` if an unban was scheduled.
+        """
+        return self._pending.pop((user_id, guild_id), None) is not None
+
+    def next_unban(self):
+        """
+        Returns:
+            tuple: `(user_id, guild_id, unban_time)` of the next unban, or `None` if nothing is scheduled.
+        """
+        self._drop_stale()
+        if not self._heap:
+            return None
+        unban_time, user_id, guild_id = self._heap[0]
+        return user_id, guild_id, unban_time
+
+    def _is_live(self, entry):
+        unban_time, user_id, guild_id = entry
+        return self._pending.get((user_id, guild_id)) == unban_time
+
+    def _drop_stale(self):
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _compact(self):
+        # Rebuild the heap when cancelled and rescheduled entries outnumber the live ones
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._pending):
+            self._heap = [(unban_time, *key) for key, unban_time in self._pending.items()]
+            heapq.heapify(self._heap)
+
+    async def _load(self):
+        bans = await self.moderation_system.aio.fetch_all_bans()
+        for user_id, guild_id, unban_time in bans:
+            # A ban scheduled while the table was being read is newer than the row
+            if (user_id, guild_id) not in self._pending:
+                self._pending[(user_id, guild_id)] = unban_time
+                self._heap.append((unban_time, user_id, guild_id))
+        heapq.heapify(self._heap)
+        logger.info(f"Loaded {len(bans)} temporary bans, next unban: {self.next_unban()}")
+
+    async def _run(self, wait_until):
+        if wait_until is not None:
+            await wait_until()
+        await self._load()
+
+        while True:
+            self._wakeup.clear()
+            self._drop_stale()
+
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = (self._heap[0][0] - self.clock()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(self._pop_due())
+            except Exception as e:
+                logger.error("Failed to process the expired bans", exc_info=e)
+
+    def _pop_due(self):
+        now = self.clock()
+        due = []
+        while self._heap and len(due) < self.batch_size and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_live(entry):
+                due.append(entry)
+        return due
+
+    async def _process(self, due):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def lift(user_id, guild_id):
+            async with semaphore:
+                return await self.unban(user_id, guild_id)
+
+        results = await asyncio.gather(*(lift(user_id, guild_id) for _, user_id, guild_id in due),
+                                       return_exceptions=True)
+
+        lifted = []
+        retry_at = self.clock() + RETRY_DELAY
+        for (unban_time, user_id, guild_id), result in zip(due, results):
+            if self._pending.get((user_id, guild_id)) != unban_time:
+                # Pardoned or banned again while the unban was running: the new state wins
+                continue
+
+            if result is True:
+                del self._pending[(user_id, guild_id)]
+                lifted.append((user_id, guild_id, unban_time))
+            else:
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to unban user {user_id} in guild {guild_id}, retrying", exc_info=result)
+                # Keep the original unban time in the table, only the retry is delayed
+                self._pending[(user_id, guild_id)] = retry_at
+                heapq.heappush(self._heap, (retry_at, user_id, guild_id))
+
+        if lifted:
+            await self.moderation_system.aio.delete_bans(lifted)
+            logger.info(f"Lifted {len(lifted)} of {len(due)} expired bans")
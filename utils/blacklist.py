@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Characters commonly used to dodge filters, mapped back to the letter they stand for
+LEETSPEAK = str.maketrans({
+    "0": "o",
+    "1": "i",
+    "3": "e",
+    "4": "a",
+    "5": "s",
+    "7": "t",
+    "8": "b",
+    "@": "a",
+    "$": "s",
+    "!": "i",
+    "|": "l",
+})
+
+
+def normalize(text: str, casefold=False, accents=False, leetspeak=False) -> str:
+    """
+    Normalizes a text the same way both the blacklisted words and the messages are normalized.
+    Every normalization is off by default, which leaves the text as it is.
+
+    Args:
+        text (str): The text to normalize.
+        casefold (bool): Ignore upper/lower case.
+        accents (bool): Strip accents and other combining marks ("è" -> "e").
+        leetspeak (bool): Map leetspeak characters back to letters ("n00b" -> "noob").
+
+    Returns:
+        str: The normalized text.
+    """
+    if accents:
+        text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    if casefold:
+        text = text.casefold()
+    if leetspeak:
+        text = text.translate(LEETSPEAK)
+    return text
+
+
+def _build_trie(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            # A shorter blacklisted word already matches everything below this node
+            if "" in node:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            node.clear()
+            node[""] = True
+    return trie
+
+
+def _trie_pattern(node) -> str:
+    if "" in node:
+        return ""
+
+    branches = [(re.escape(ch), _trie_pattern(child)) for ch, child in sorted(node.items())]
+    # Branches ending right after their character collapse into a single character class
+    chars = [ch for ch, rest in branches if rest == ""]
+    alternatives = [ch + rest for ch, rest in branches if rest != ""]
+    if len(chars) == 1:
+        alternatives.append(chars[0])
+    elif chars:
+        alternatives.append("[" + "".join(chars) + "]")
+
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+def compile_words(words) -> Optional[re.Pattern]:
+    """
+    Compiles a list of words into a single regex that finds any of them in one pass over the text.
+
+    The words are merged into a trie first, so the regex never backtracks over a common prefix
+    and its size grows with the number of distinct prefixes rather than with the number of words.
+
+    Returns:
+        re.Pattern: The compiled pattern, or `None` if there are no words.
+    """
+    words = [word for word in words if word]
+    if not words:
+        return None
+    return re.compile(_trie_pattern(_build_trie(words)))
+
+
+class BlacklistMatcher:
+    """
+    Finds blacklisted words in messages, reloading the list whenever its JSON file changes.
+
+    The file has the form `{"words": [...], "options": {"casefold": true, "accents": true, "leetspeak": false}}`,
+    where `options` is optional and overrides the normalization chosen in the constructor.
+    Words are matched anywhere in the message, after both have been normalized; with no normalization
+    chosen they're matched exactly as written.
+
+    Attributes:
+        path (str): Path of the JSON file with the blacklisted words.
+        reload_interval (float): Minimum seconds between two checks of the file's modification time.
+    """
+    def __init__(self, path, casefold=False, accents=False, leetspeak=False, reload_interval=5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.defaults = {"casefold": casefold, "accents": accents, "leetspeak": leetspeak}
+
+        self.options = dict(self.defaults)
+        self.words = []
+        self._pattern = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+        self.reload()
+
+    def reload(self):
+        """
+        Reloads and recompiles the blacklist from disk.
+        If the file can't be read (e.g. it's being written), the current blacklist is kept.
+
+        Returns:
+            bool: True if the blacklist was reloaded.
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                options = {**self.defaults, **data.get("options", {})}
+                words = sorted({normalize(str(word), **options) for word in data.get("words", [])})
+                pattern = compile_words(words)
+            except (OSError, ValueError, TypeError, re.error) as e:
+                logger.error(f"Could not load blacklist from {self.path}, keeping the current one: {e}")
+                return False
+
+            self.options = options
+            self.words = words
+            self._pattern = pattern
+            self._mtime = mtime
+            logger.info(f"Loaded {len(words)} blacklisted word(s) from {self.path}")
+            return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def search(self, text: str) -> Optional[str]:
+        """
+        Looks for a blacklisted word in a text.
+
+        Args:
+            text (str): The text to check, usually a message's content.
+
+        Returns:
+            str: The (normalized) blacklisted word found, or `None` if the text is clean.
+        """
+        self._maybe_reload()
+
+        pattern = self._pattern
+        if pattern is None or not text:
+            return None
+
+        match = pattern.search(normalize(text, **self.options))
+        return match.group(0) if match else None
+
+    def __contains__(self, text: str) -> bool:
+        return self.search(text) is not None
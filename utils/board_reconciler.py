@@ -0,0 +1,130 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import discord
+
+from utils.board_system import BoardSystem
+from utils.debug import Logger
+from utils.resolver import Resolver
+from utils.starboard import Starboard
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+STAR = '⭐'
+# Rows read from the board table per query
+BATCH_SIZE = 100
+# Messages fetched from Discord at the same time
+FETCH_CONCURRENCY = 5
+# How far back the first run after a restart looks, to catch up with what happened while offline
+STARTUP_LOOKBACK = timedelta(days=1)
+
+
+def star_count(message):
+    """
+    Returns the ⭐ reactions on a message, not counting the bot's own: the same ones the live reaction
+    events count, so a reconciliation never moves a counter the events keep right.
+    """
+    for reaction in message.reactions:
+        if str(reaction.emoji) == STAR:
+            return reaction.count - (1 if reaction.me else 0)
+    return 0
+
+
+class BoardReconciler:
+    """
+    Corrects the ⭐ counters of the `board` table with the real counts read from Discord.
+
+    The counters only follow gateway events, so they drift while the bot is offline or when an event
+    is missed. Each run re-reads the messages that had ⭐ events since the previous run (the
+    watermark), in batches, and hands every count that differs to the `Starboard`, which updates the
+    table and adds or removes the board post in the same per-message order as the live events. When
+    the count is right, the board post is still checked: a post missing or left up is repaired.
+
+    Attributes:
+        board_system (BoardSystem): The board counters.
+        starboard (Starboard): Applies the corrected counts.
+        resolver (Resolver): Cache-first lookup of the source channels.
+        watermark (datetime): Messages seen before this time (UTC) are not checked by the next run.
+    """
+    def __init__(self, board_system: BoardSystem, starboard: Starboard, resolver: Resolver,
+                 batch_size=BATCH_SIZE, concurrency=FETCH_CONCURRENCY):
+        self.board_system = board_system
+        self.starboard = starboard
+        self.resolver = resolver
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.watermark = datetime.utcnow() - STARTUP_LOOKBACK
+        self._lock = asyncio.Lock()
+
+    async def run(self, since=None):
+        """
+        Checks every message seen since the watermark (or `since`), then moves the watermark to the
+        start of this run. Runs never overlap: a second call waits for the first one.
+
+        Args:
+            since (datetime, optional): Check from this time (UTC) instead of the watermark.
+
+        Returns:
+            dict: Messages `checked`, `corrected`, `repaired` (right count, wrong board post), `deleted`
+                  (gone from Discord) and `failed`.
+        """
+        async with self._lock:
+            started = datetime.utcnow()
+            since = since or self.watermark
+            stats = dict.fromkeys(("checked", "corrected", "repaired", "deleted", "failed"), 0)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            after = None
+            while True:
+                rows = await self.board_system.aio.get_tracked(since, after, self.batch_size)
+                if not rows:
+                    break
+                await asyncio.gather(*(self._check(row, semaphore, stats) for row in rows))
+                after = rows[-1][4], rows[-1][0]
+                if len(rows) < self.batch_size:
+                    break
+
+            # Events during the run moved last_seen past `started`: they're checked next time
+            self.watermark = max(self.watermark, started)
+            logger.info(
+                f"Reconciled the board since {since:%Y-%m-%d %H:%M:%S}: {stats['checked']} checked, "
+                f"{stats['corrected']} corrected, {stats['repaired']} repaired, {stats['deleted']} deleted, "
+                f"{stats['failed']} failed"
+            )
+            return stats
+
+    async def _check(self, row, semaphore, stats):
+        message_id, guild_id, channel_id, reactions, _ = row
+        try:
+            async with semaphore:
+                try:
+                    channel = await self.resolver.channel(channel_id)
+                    if channel is None:
+                        stats["failed"] += 1
+                        return
+                    # Events arriving from here on may not be in the count: the starboard adds them on top
+                    self.starboard.watch(message_id)
+                    try:
+                        # Not through the resolver's message cache: the count must be fresh
+                        real = star_count(await channel.fetch_message(message_id))
+                    except discord.NotFound:
+                        real = 0
+                        stats["deleted"] += 1
+                except discord.HTTPException as e:
+                    logger.warning(f"Could not re-read the reactions of message {message_id}: {e}")
+                    stats["failed"] += 1
+                    return
+
+            stats["checked"] += 1
+            if real != reactions:
+                logger.info(f"Message {message_id}: counted {reactions} ⭐, Discord has {real}")
+                stats["corrected"] += 1
+                self.resolver.forget_message(channel_id, message_id)
+                await self.starboard.reset(guild_id, channel_id, message_id, real)
+            elif await self.starboard.verify(guild_id, channel_id, message_id, real):
+                logger.info(f"Message {message_id}: repaired its board post")
+                stats["repaired"] += 1
+        finally:
+            self.starboard.unwatch(message_id)
@@ -1,7 +1,17 @@
+from datetime import datetime
+
 import mysql.connector
+from mysql.connector import errorcode
 
 from utils.database import BaseDatabase
 
+# Columns added after the first release, with their definition
+BOARD_COLUMNS = [
+    ("guild_id", "BIGINT"),
+    ("channel_id", "BIGINT"),
+    ("last_seen", "DATETIME")
+]
+
 
 class BoardSystem(BaseDatabase):
     def __init__(self, host, user, password, database):
@@ -9,71 +19,67 @@ class BoardSystem(BaseDatabase):
         self.create_table()
 
     def create_table(self):
-        cursor = self.get_cursor()
-
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS board
-                       (
-                           message_id
-                           BIGINT,
-                           reactions
-                           INT,
-                           boarded
-                           BIGINT,
-                           PRIMARY
-                           KEY
-                       (
-                           message_id
-                       )
+        with self.cursor() as cursor:
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS board
+                           (
+                               message_id
+                               BIGINT,
+                               reactions
+                               INT,
+                               boarded
+                               BIGINT,
+                               PRIMARY
+                               KEY
+                           (
+                               message_id
                            )
-                       """)
-
-        # Modificata per salvare le impostazioni per ogni singolo server (guild_id)
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS board_config
-                       (
-                           guild_id
-                           BIGINT,
-                           channel_id
-                           BIGINT,
-                           min_reactions
-                           INT
-                           DEFAULT
-                           1,
-                           PRIMARY
-                           KEY
-                       (
-                           guild_id
-                       )
+                               )
+                           """)
+
+            # Where the message lives and when a ⭐ event last touched it, for the reconciliation
+            for column, definition in BOARD_COLUMNS:
+                try:
+                    cursor.execute(f"ALTER TABLE board ADD COLUMN {column} {definition}")
+                except mysql.connector.Error as e:
+                    if e.errno != errorcode.ER_DUP_FIELDNAME:
+                        raise
+            try:
+                cursor.execute("CREATE INDEX board_last_seen ON board (last_seen, message_id)")
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_DUP_KEYNAME:
+                    raise
+
+            # Modificata per salvare le impostazioni per ogni singolo server (guild_id)
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS board_config
+                           (
+                               guild_id
+                               BIGINT,
+                               channel_id
+                               BIGINT,
+                               min_reactions
+                               INT
+                               DEFAULT
+                               1,
+                               PRIMARY
+                               KEY
+                           (
+                               guild_id
                            )
-                       """)
-        cursor.close()
+                               )
+                           """)
 
     # --- NUOVI METODI PER IL CANALE DELLA BOARD ---
     def set_board_channel(self, guild_id, channel_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT guild_id FROM board_config WHERE guild_id = %s", (guild_id,))
-
-        if cursor.fetchone():
-            cursor.execute("""
-                           UPDATE board_config
-                           SET channel_id = %s
-                           WHERE guild_id = %s
-                           """, (channel_id, guild_id))
-        else:
-            cursor.execute("""
-                           INSERT INTO board_config (guild_id, channel_id, min_reactions)
-                           VALUES (%s, %s, 1)
-                           """, (guild_id, channel_id))
-
-        self.conn.commit()
-        cursor.close()
+        self.execute("""
+                     INSERT INTO board_config (guild_id, channel_id, min_reactions)
+                     VALUES (%s, %s, 1)
+                     ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
+                     """, (guild_id, channel_id), idempotent=True)
 
     def get_board_channel(self, guild_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT channel_id FROM board_config WHERE guild_id = %s", (guild_id,))
-        result = cursor.fetchone()
-        cursor.close()
+        result = self.fetchone("SELECT channel_id FROM board_config WHERE guild_id = %s", (guild_id,))
 
         if result:
             return result[0]
@@ -81,22 +87,14 @@ class BoardSystem(BaseDatabase):
 
     # --- METODI AGGIORNATI PER LE REAZIONI (Ora basati sul guild_id) ---
     def set_min_reactions(self, guild_id, num):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT guild_id FROM board_config WHERE guild_id = %s", (guild_id,))
-
-        if cursor.fetchone():
-            cursor.execute("UPDATE board_config SET min_reactions = %s WHERE guild_id = %s", (num, guild_id))
-        else:
-            cursor.execute("INSERT INTO board_config (guild_id, min_reactions) VALUES (%s, %s)", (guild_id, num))
-
-        self.conn.commit()
-        cursor.close()
+        self.execute("""
+                     INSERT INTO board_config (guild_id, min_reactions)
+                     VALUES (%s, %s)
+                     ON DUPLICATE KEY UPDATE min_reactions = VALUES(min_reactions)
+                     """, (guild_id, num), idempotent=True)
 
     def get_min_reactions(self, guild_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT min_reactions FROM board_config WHERE guild_id = %s", (guild_id,))
-        result = cursor.fetchone()
-        cursor.close()
+        result = self.fetchone("SELECT min_reactions FROM board_config WHERE guild_id = %s", (guild_id,))
 
         if result:
             return result[0]
@@ -105,54 +103,111 @@ class BoardSystem(BaseDatabase):
         return 1
 
     # --- METODI DEI MESSAGGI (Invariati) ---
-    def add_reaction(self, message_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT * FROM board WHERE message_id = %s", (message_id,))
-        if cursor.fetchone():
-            cursor.execute("UPDATE board SET reactions = reactions + 1 WHERE message_id = %s", (message_id,))
-        else:
-            cursor.execute("INSERT INTO board (message_id, reactions) VALUES (%s, %s)", (message_id, 1))
-        self.conn.commit()
-        cursor.close()
-
-    def remove_reaction(self, message_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT reactions FROM board WHERE message_id = %s", (message_id,))
-        result = cursor.fetchone()
-        if not result:
-            cursor.close()
-            return
-
-        current_reactions = result[0]
-        if current_reactions > 1:
-            cursor.execute("UPDATE board SET reactions = reactions - 1 WHERE message_id = %s", (message_id,))
-        else:
-            cursor.execute("DELETE FROM board WHERE message_id = %s", (message_id,))
-        self.conn.commit()
-        cursor.close()
+    def change_reactions(self, message_id, delta, guild_id=None, channel_id=None):
+        """
+        Adds `delta` ⭐ to a message (removes them when negative), in a single statement. A message
+        left with no reactions is forgotten, unless it's still on the board.
+
+        Args:
+            message_id (int): The starred message.
+            delta (int): Reactions added, negative when removed.
+            guild_id (int, optional): The guild of the message, recorded for the reconciliation.
+            channel_id (int, optional): The channel of the message, recorded for the reconciliation.
+
+        Returns:
+            int: The number of reactions after the update.
+        """
+        now = datetime.utcnow()
+        with self.cursor() as cursor:
+            # LAST_INSERT_ID(expr) hands the new count back in the OK packet, no SELECT needed
+            if delta > 0:
+                cursor.execute("""
+                               INSERT INTO board (message_id, reactions, guild_id, channel_id, last_seen)
+                               VALUES (%s, LAST_INSERT_ID(%s), %s, %s, %s)
+                               ON DUPLICATE KEY UPDATE reactions = LAST_INSERT_ID(reactions + %s),
+                                                       guild_id = VALUES(guild_id),
+                                                       channel_id = VALUES(channel_id),
+                                                       last_seen = VALUES(last_seen)
+                               """, (message_id, delta, guild_id, channel_id, now, delta))
+                return cursor.lastrowid
+
+            cursor.execute("""
+                           UPDATE board SET reactions = LAST_INSERT_ID(GREATEST(reactions + %s, 0)), last_seen = %s
+                           WHERE message_id = %s
+                           """, (delta, now, message_id))
+            reactions = cursor.lastrowid if cursor.rowcount else 0
+            if not reactions:
+                cursor.execute("""
+                               DELETE FROM board
+                               WHERE message_id = %s AND reactions = 0 AND (boarded IS NULL OR boarded = 0)
+                               """, (message_id,))
+            return reactions or 0
+
+    def set_reactions(self, message_id, reactions, guild_id=None, channel_id=None):
+        """
+        Overwrites the ⭐ count of a message with the real one. Doesn't move `last_seen`: only
+        reaction events do.
+
+        Returns:
+            int: The number of reactions stored before.
+        """
+        with self.transaction() as cursor:
+            cursor.execute("SELECT reactions FROM board WHERE message_id = %s FOR UPDATE", (message_id,))
+            row = cursor.fetchone()
+            if row is None:
+                if reactions:
+                    cursor.execute("""
+                                   INSERT INTO board (message_id, reactions, guild_id, channel_id, last_seen)
+                                   VALUES (%s, %s, %s, %s, %s)
+                                   """, (message_id, reactions, guild_id, channel_id, datetime.utcnow()))
+                return 0
+
+            cursor.execute("UPDATE board SET reactions = %s WHERE message_id = %s", (reactions, message_id))
+            if not reactions:
+                cursor.execute("""
+                               DELETE FROM board
+                               WHERE message_id = %s AND (boarded IS NULL OR boarded = 0)
+                               """, (message_id,))
+            return row[0]
+
+    def get_tracked(self, since, after=None, limit=100):
+        """
+        Pages through the messages that had ⭐ events since a point in time, oldest event first.
+
+        Args:
+            since (datetime): Only messages seen at or after this time (UTC).
+            after (tuple, optional): `(last_seen, message_id)` of the last row of the previous page.
+            limit (int, optional): Maximum number of rows.
+
+        Returns:
+            list: `(message_id, guild_id, channel_id, reactions, last_seen)` tuples. Messages tracked
+                  before the guild and channel were recorded are left out.
+        """
+        if after is None:
+            return self.fetchall("""
+                                 SELECT message_id, guild_id, channel_id, reactions, last_seen FROM board
+                                 WHERE last_seen >= %s AND channel_id IS NOT NULL
+                                 ORDER BY last_seen, message_id LIMIT %s
+                                 """, (since, limit))
+        last_seen, message_id = after
+        return self.fetchall("""
+                             SELECT message_id, guild_id, channel_id, reactions, last_seen FROM board
+                             WHERE (last_seen > %s OR (last_seen = %s AND message_id > %s)) AND channel_id IS NOT NULL
+                             ORDER BY last_seen, message_id LIMIT %s
+                             """, (last_seen, last_seen, message_id, limit))
 
     def add_boarded(self, message_id, board_index):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("UPDATE board SET boarded = %s WHERE message_id = %s", (board_index, message_id))
-        self.conn.commit()
-        cursor.close()
+        self.execute("UPDATE board SET boarded = %s WHERE message_id = %s", (board_index, message_id), idempotent=True)
 
     def get_boarded(self, message_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT boarded FROM board WHERE message_id = %s", (message_id,))
-        result = cursor.fetchone()
-        cursor.close()
+        result = self.fetchone("SELECT boarded FROM board WHERE message_id = %s", (message_id,))
         return result if result else 0
 
     def remove_boarded(self, message_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("UPDATE board SET boarded = 0 WHERE message_id = %s", (message_id,))
-        self.conn.commit()
-        cursor.close()
+        with self.cursor() as cursor:
+            cursor.execute("UPDATE board SET boarded = 0 WHERE message_id = %s", (message_id,))
+            # Kept only while it was on the board
+            cursor.execute("DELETE FROM board WHERE message_id = %s AND reactions = 0", (message_id,))
 
     def get_reactions(self, message_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute("SELECT reactions FROM board WHERE message_id = %s", (message_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        return result
\ No newline at end of file
+        return self.fetchone("SELECT reactions FROM board WHERE message_id = %s", (message_id,))
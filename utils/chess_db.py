@@ -1,180 +1,357 @@
+from datetime import datetime
+
+from utils import rating
 from utils.database import BaseDatabase
+from utils.standings import Standings
+
+# Points taken from a player who doesn't confirm a match by the end of the day
+MISSED_MATCH_PENALTY = 1
+# Rows written by a single multi-row insert when the ratings are recomputed
+INSERT_BATCH_SIZE = 500
 
 
 class ChessSystem(BaseDatabase):
     def __init__(self, host, user, password, database):
         super().__init__(host, user, password, database)
+        # Standings kept in memory and updated as matches finish, see `load_standings`
+        self.standings = Standings()
+
         self.create_table()
+        self.load_standings()
 
     def create_table(self):
-        cursor = self.get_cursor()
-
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS players
-                       (
-                           user_id
-                           BIGINT,
-                           score
-                           DOUBLE
-                           DEFAULT
-                           0,
-                           PRIMARY
-                           KEY
-                       (
-                           user_id
-                       )
+        with self.cursor() as cursor:
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS players
+                           (
+                               user_id
+                               BIGINT,
+                               score
+                               DOUBLE
+                               DEFAULT
+                               0,
+                               PRIMARY
+                               KEY
+                           (
+                               user_id
                            )
-                       """)
-
-        # Added status (PENDING, STARTED, FINISHED, CANCELLED)
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS matches
-                       (
-                           match_id
-                           BIGINT
-                           PRIMARY
-                           KEY
-                           AUTO_INCREMENT,
-                           winner
-                           BIGINT
-                           DEFAULT
-                           NULL,
-                           status
-                           VARCHAR
-                       (
-                           20
-                       ) DEFAULT 'PENDING',
-                           FOREIGN KEY
-                       (
-                           winner
-                       ) REFERENCES players
-                       (
-                           user_id
-                       )
+                               )
+                           """)
+
+            # Added status (PENDING, STARTED, FINISHED, CANCELLED)
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS matches
+                           (
+                               match_id
+                               BIGINT
+                               PRIMARY
+                               KEY
+                               AUTO_INCREMENT,
+                               winner
+                               BIGINT
+                               DEFAULT
+                               NULL,
+                               status
+                               VARCHAR
+                           (
+                               20
+                           ) DEFAULT 'PENDING',
+                               FOREIGN KEY
+                           (
+                               winner
+                           ) REFERENCES players
+                           (
+                               user_id
                            )
-                       """)
-
-        # Changed reported_winner to reported_result (WIN, LOSS, DRAW)
-        cursor.execute("""
-                       CREATE TABLE IF NOT EXISTS players_matches
-                       (
-                           match_id
-                           BIGINT,
-                           player
-                           BIGINT,
-                           confirmed
-                           BOOLEAN
-                           DEFAULT
-                           FALSE,
-                           reported_result
-                           VARCHAR
-                       (
-                           10
-                       ) DEFAULT NULL,
-                           PRIMARY KEY
-                       (
-                           match_id,
-                           player
-                       ),
-                           FOREIGN KEY
-                       (
-                           match_id
-                       ) REFERENCES matches
-                       (
-                           match_id
-                       ) ON DELETE CASCADE,
-                           FOREIGN KEY
-                       (
-                           player
-                       ) REFERENCES players
-                       (
-                           user_id
-                       )
-                         ON DELETE CASCADE
+                               )
+                           """)
+
+            # Changed reported_winner to reported_result (WIN, LOSS, DRAW)
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS players_matches
+                           (
+                               match_id
+                               BIGINT,
+                               player
+                               BIGINT,
+                               confirmed
+                               BOOLEAN
+                               DEFAULT
+                               FALSE,
+                               reported_result
+                               VARCHAR
+                           (
+                               10
+                           ) DEFAULT NULL,
+                               PRIMARY KEY
+                           (
+                               match_id,
+                               player
+                           ),
+                               FOREIGN KEY
+                           (
+                               match_id
+                           ) REFERENCES matches
+                           (
+                               match_id
+                           ) ON DELETE CASCADE,
+                               FOREIGN KEY
+                           (
+                               player
+                           ) REFERENCES players
+                           (
+                               user_id
                            )
-                       """)
-        self.conn.commit()
-        cursor.close()
+                             ON DELETE CASCADE
+                               )
+                           """)
+
+            # Every end-of-day penalty, with the match that was missed and the day it was applied
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS penalties
+                           (
+                               penalty_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+                               match_id BIGINT,
+                               player BIGINT,
+                               day DATE,
+                               points DOUBLE,
+                               INDEX (player),
+                               INDEX (day),
+                               FOREIGN KEY (match_id) REFERENCES matches (match_id) ON DELETE CASCADE
+                           )
+                           """)
+
+            # Glicko-2 rating of every player who finished at least one match
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS ratings
+                           (
+                               user_id BIGINT PRIMARY KEY,
+                               rating DOUBLE,
+                               rd DOUBLE,
+                               volatility DOUBLE,
+                               games INT DEFAULT 0
+                           )
+                           """)
+
+            # Rating of both players after each finished match
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS rating_history
+                           (
+                               match_id BIGINT,
+                               user_id BIGINT,
+                               rating DOUBLE,
+                               rd DOUBLE,
+                               volatility DOUBLE,
+                               PRIMARY KEY (match_id, user_id),
+                               INDEX (user_id, match_id)
+                           )
+                           """)
+
+            # Byes handed out by the Swiss pairing, so nobody rests twice
+            cursor.execute("""
+                           CREATE TABLE IF NOT EXISTS byes
+                           (
+                               user_id BIGINT PRIMARY KEY,
+                               count INT DEFAULT 1,
+                               FOREIGN KEY (user_id) REFERENCES players (user_id) ON DELETE CASCADE
+                           )
+                           """)
 
     def drop_tables(self):
-        cursor = self.get_cursor()
-
-        cursor.execute("DROP TABLE IF EXISTS players_matches")
-        cursor.execute("DROP TABLE IF EXISTS players")
-        cursor.execute("DROP TABLE IF EXISTS matches")
-
-        self.conn.commit()
-        cursor.close()
+        with self.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS players_matches")
+            cursor.execute("DROP TABLE IF EXISTS penalties")
+            cursor.execute("DROP TABLE IF EXISTS rating_history")
+            cursor.execute("DROP TABLE IF EXISTS ratings")
+            cursor.execute("DROP TABLE IF EXISTS byes")
+            cursor.execute("DROP TABLE IF EXISTS players")
+            cursor.execute("DROP TABLE IF EXISTS matches")
+        self.standings.clear()
 
     def get_all_players(self):
-        cursor = self.get_cursor()
-        cursor.execute("SELECT user_id FROM players")
-        results = cursor.fetchall()
-        cursor.close()
+        results = self.fetchall("SELECT user_id FROM players")
         return [row[0] for row in results]
 
     def sign_up(self, user_id):
-        cursor = self.get_cursor()
-        cursor.execute("INSERT IGNORE INTO players (user_id, score) VALUES (%s, 0)", (user_id,))
-        self.conn.commit()
-        cursor.close()
+        self.execute("INSERT IGNORE INTO players (user_id, score) VALUES (%s, 0)", (user_id,), idempotent=True)
+        self.standings.add_player(user_id)
 
     def sign_out(self, user_id):
-        cursor = self.get_cursor()
-        cursor.execute("DELETE FROM players WHERE user_id = %s", (user_id,))
-        self.conn.commit()
-        cursor.close()
+        self.execute("DELETE FROM players WHERE user_id = %s", (user_id,), idempotent=True)
+        # The player's matches are gone too: the opponents' tiebreaks change
+        self.load_standings()
+
+    def load_standings(self):
+        """Loads the scores and the finished matches into the in-memory standings, with two queries."""
+        with self.cursor() as cursor:
+            cursor.execute("SELECT user_id, score FROM players")
+            scores = cursor.fetchall()
+            games = self._finished_games(cursor)
+        self.standings.load(scores, games)
+
+    def _finished_games(self, cursor, lock=False):
+        """Returns `(match_id, player1_id, player2_id, player1_score)` of every finished match, oldest first."""
+        cursor.execute(f"""
+                       SELECT m.match_id, m.winner, pm.player
+                       FROM matches m
+                                JOIN players_matches pm ON m.match_id = pm.match_id
+                       WHERE m.status = 'FINISHED'
+                       ORDER BY m.match_id, pm.player
+                       {'FOR UPDATE' if lock else ''}
+                       """)
+        players = {}
+        winners = {}
+        for match_id, winner_id, player_id in cursor.fetchall():
+            players.setdefault(match_id, []).append(player_id)
+            winners[match_id] = winner_id
+
+        games = []
+        for match_id, pair in players.items():
+            if len(pair) != 2:
+                continue
+            p1_id, p2_id = pair
+            winner_id = winners[match_id]
+            games.append((match_id, p1_id, p2_id, 0.5 if winner_id is None else (1 if winner_id == p1_id else 0)))
+        return games
 
     def get_score(self, user_id):
-        cursor = self.get_cursor()
-        cursor.execute("SELECT score FROM players WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
+        result = self.fetchone("SELECT score FROM players WHERE user_id = %s", (user_id,))
         return result[0] if result else None
 
+    def get_standings(self):
+        """Returns `(user_id, score)` of every player, highest score first."""
+        return self.fetchall("SELECT user_id, score FROM players ORDER BY score DESC")
+
+    def get_pairing_history(self):
+        """Returns a `(player, opponent)` tuple for every match that wasn't cancelled, once per match."""
+        return self.fetchall("""
+                       SELECT pm1.player, pm2.player
+                       FROM players_matches pm1
+                                JOIN players_matches pm2 ON pm1.match_id = pm2.match_id AND pm1.player < pm2.player
+                                JOIN matches m ON pm1.match_id = m.match_id
+                       WHERE m.status != 'CANCELLED'
+                       """)
+
+    def get_byes(self):
+        """Returns `(user_id, count)` of every player who already had a bye."""
+        return self.fetchall("SELECT user_id, count FROM byes")
+
     def new_match(self, player1_id, player2_id):
-        cursor = self.get_cursor()
-        cursor.execute("INSERT INTO matches (status) VALUES ('PENDING')")
-        match_id = cursor.lastrowid
-        cursor.execute("""
-                       INSERT INTO players_matches (match_id, player)
-                       VALUES (%s, %s),
-                              (%s, %s)
-                       """, (match_id, player1_id, match_id, player2_id))
-        self.conn.commit()
-        cursor.close()
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO matches (status) VALUES ('PENDING')")
+            match_id = cursor.lastrowid
+            cursor.execute("""
+                           INSERT INTO players_matches (match_id, player)
+                           VALUES (%s, %s),
+                                  (%s, %s)
+                           """, (match_id, player1_id, match_id, player2_id))
         return match_id
 
-    def confirm_availability(self, match_id, player_id):
-        """Marks a player as ready. Returns True if BOTH are now ready."""
-        cursor = self.get_cursor()
-        cursor.execute("""
-                       UPDATE players_matches
-                       SET confirmed = TRUE
-                       WHERE match_id = %s
-                         AND player = %s
-                       """, (match_id, player_id))
-        self.conn.commit()
+    def create_round(self, pairs, bye=None):
+        """
+        Creates the matches of a whole round in one transaction, with two multi-row inserts.
 
-        # Check if both are ready
-        cursor.execute("SELECT confirmed FROM players_matches WHERE match_id = %s", (match_id,))
-        reports = cursor.fetchall()
+        Args:
+            pairs (list): `(player1_id, player2_id)` tuples.
+            bye (int, optional): The player resting this round, whose byes are counted.
 
-        both_ready = len(reports) == 2 and all(r[0] for r in reports)
+        Returns:
+            list: The match ID of each pair, in the same order.
+        """
+        if not pairs:
+            return []
 
-        if both_ready:
-            cursor.execute("UPDATE matches SET status = 'STARTED' WHERE match_id = %s", (match_id,))
-            self.conn.commit()
+        with self.transaction() as cursor:
+            if bye is not None:
+                cursor.execute("""
+                               INSERT INTO byes (user_id, count)
+                               VALUES (%s, 1)
+                               ON DUPLICATE KEY UPDATE count = count + 1
+                               """, (bye,))
+
+            cursor.execute(f"INSERT INTO matches (status) VALUES {', '.join(['(%s)'] * len(pairs))}",
+                           ('PENDING',) * len(pairs))
+            # Read back instead of assuming consecutive IDs from the first one, which interleaved
+            # auto-increment locking or an auto_increment_increment above 1 would break. From the first
+            # ID on, the only matches without players are this transaction's: every other writer adds
+            # the players in the same transaction, so their rows are either invisible or complete.
+            cursor.execute("""
+                           SELECT match_id
+                           FROM matches m
+                           WHERE m.match_id >= %s
+                             AND NOT EXISTS (SELECT 1 FROM players_matches pm WHERE pm.match_id = m.match_id)
+                           ORDER BY m.match_id
+                           """, (cursor.lastrowid,))
+            match_ids = [row[0] for row in cursor.fetchall()]
+            if len(match_ids) != len(pairs):
+                raise RuntimeError(f"Created {len(pairs)} matches but read back {len(match_ids)}")
+
+            cursor.execute(f"INSERT INTO players_matches (match_id, player) VALUES {', '.join(['(%s, %s)'] * 2 * len(pairs))}",
+                           tuple(value for match_id, (p1, p2) in zip(match_ids, pairs)
+                                 for value in (match_id, p1, match_id, p2)))
+        return match_ids
+
+    def confirm_availability(self, match_id, player_id):
+        """
+        Marks a player as ready.
+
+        Returns:
+            str: "READY" if BOTH are now ready (the match is STARTED), "WAITING" if the opponent still has to
+                 confirm, "ALREADY" if the player had already confirmed, "CLOSED" if the match isn't PENDING.
+        """
+        with self.transaction() as cursor:
+            # Lock the match, so two confirmations at the same time can't both miss that the other is ready
+            cursor.execute("SELECT status FROM matches WHERE match_id = %s FOR UPDATE", (match_id,))
+            match = cursor.fetchone()
+            if match is None or match[0] != 'PENDING':
+                return "CLOSED"
+
+            cursor.execute("""
+                           UPDATE players_matches
+                           SET confirmed = TRUE
+                           WHERE match_id = %s
+                             AND player = %s
+                             AND confirmed = FALSE
+                           """, (match_id, player_id))
+            if cursor.rowcount == 0:
+                return "ALREADY"
+
+            # Check if both are ready
+            cursor.execute("SELECT confirmed FROM players_matches WHERE match_id = %s", (match_id,))
+            reports = cursor.fetchall()
+
+            both_ready = len(reports) == 2 and all(r[0] for r in reports)
+
+            if both_ready:
+                cursor.execute("UPDATE matches SET status = 'STARTED' WHERE match_id = %s", (match_id,))
+
+        return "READY" if both_ready else "WAITING"
+
+    def get_active_matches(self):
+        """
+        Returns the PENDING and STARTED matches with their players, with one query, to restore their views.
+
+        Returns:
+            list: `(match_id, status, player1_id, player2_id)` tuples.
+        """
+        results = self.fetchall("""
+                       SELECT m.match_id, m.status, pm.player
+                       FROM matches m
+                                JOIN players_matches pm ON m.match_id = pm.match_id
+                       WHERE m.status IN ('PENDING', 'STARTED')
+                       ORDER BY m.match_id, pm.player
+                       """)
 
-        cursor.close()
-        return both_ready
+        matches = {}
+        for match_id, status, player_id in results:
+            matches.setdefault((match_id, status), []).append(player_id)
+
+        return [(match_id, status, *players) for (match_id, status), players in matches.items() if len(players) == 2]
 
     def get_player_matches(self, user_id):
         """Recupera tutte le partite di un giocatore (sia passate che future)."""
-        cursor = self.get_cursor()
-
         # Uniamo pm1 (il giocatore) con pm2 (l'avversario) e matches
-        cursor.execute("""
+        results = self.fetchall("""
                        SELECT m.match_id, m.status, pm2.player AS opponent_id, m.winner
                        FROM players_matches pm1
                                 JOIN matches m ON pm1.match_id = m.match_id
@@ -183,9 +360,6 @@ class ChessSystem(BaseDatabase):
                        ORDER BY m.match_id DESC
                        """, (user_id,))
 
-        results = cursor.fetchall()
-        cursor.close()
-
         matches = {"active": [], "past": []}
 
         for row in results:
@@ -208,18 +382,16 @@ class ChessSystem(BaseDatabase):
 
     def report_result(self, match_id, player_id, result):
         """Player reports 'WIN', 'LOSS', or 'DRAW'."""
-        cursor = self.get_cursor()
-        cursor.execute("""
-                       UPDATE players_matches
-                       SET reported_result = %s
-                       WHERE match_id = %s
-                         AND player = %s
-                       """, (result, match_id, player_id))
-        self.conn.commit()
+        with self.cursor() as cursor:
+            cursor.execute("""
+                           UPDATE players_matches
+                           SET reported_result = %s
+                           WHERE match_id = %s
+                             AND player = %s
+                           """, (result, match_id, player_id))
 
-        cursor.execute("SELECT player, reported_result FROM players_matches WHERE match_id = %s", (match_id,))
-        reports = cursor.fetchall()
-        cursor.close()
+            cursor.execute("SELECT player, reported_result FROM players_matches WHERE match_id = %s", (match_id,))
+            reports = cursor.fetchall()
 
         # If both players haven't reported yet
         if any(r[1] is None for r in reports):
@@ -242,78 +414,189 @@ class ChessSystem(BaseDatabase):
             return "DISPUTE", None
 
     def _finalize_match(self, match_id, winner_id=None, is_draw=False):
-        cursor = self.get_cursor()
-        cursor.execute("SELECT status FROM matches WHERE match_id = %s", (match_id,))
-        status = cursor.fetchone()[0]
+        game = None
+        with self.transaction() as cursor:
+            cursor.execute("SELECT status FROM matches WHERE match_id = %s FOR UPDATE", (match_id,))
+            status = cursor.fetchone()[0]
+
+            if status != 'FINISHED':
+                cursor.execute("UPDATE matches SET status = 'FINISHED', winner = %s WHERE match_id = %s",
+                               (winner_id, match_id))
+
+                # Standard Points: +1 for win. (You can add +1 to both for a draw if you prefer)
+                if winner_id and not is_draw:
+                    # Add 1 point to the winner
+                    cursor.execute("UPDATE players SET score = score + 1 WHERE user_id = %s", (winner_id,))
+
+                elif is_draw:
+                    # Add 0.5 points to BOTH players linked to this match
+                    cursor.execute("""
+                                   UPDATE players
+                                       JOIN players_matches
+                                   ON players.user_id = players_matches.player
+                                       SET players.score = players.score + 0.5
+                                   WHERE players_matches.match_id = %s
+                                   """, (match_id,))
+
+                game = self._update_ratings(cursor, match_id, winner_id, is_draw)
+
+        # Once committed, the standings follow: +1 to the winner, +0.5 each for a draw
+        if game is not None:
+            p1_id, p2_id, p1_score = game
+            if is_draw:
+                self.standings.record_game(p1_id, p2_id, p1_score, 0.5, 0.5)
+            else:
+                self.standings.record_game(p1_id, p2_id, p1_score, p1_score, 1 - p1_score)
 
-        if status != 'FINISHED':
-            cursor.execute("UPDATE matches SET status = 'FINISHED', winner = %s WHERE match_id = %s",
-                           (winner_id, match_id))
+    def _update_ratings(self, cursor, match_id, winner_id, is_draw):
+        """
+        Rates the two players of a finished match, inside the transaction that finishes it.
 
-            # Standard Points: +1 for win. (You can add +1 to both for a draw if you prefer)
-            if winner_id and not is_draw:
-                # Add 1 point to the winner
-                cursor.execute("UPDATE players SET score = score + 1 WHERE user_id = %s", (winner_id,))
+        Returns:
+            tuple: `(player1_id, player2_id, player1_score)`, or `None` if the match doesn't have two players.
+        """
+        cursor.execute("SELECT player FROM players_matches WHERE match_id = %s ORDER BY player", (match_id,))
+        players = [row[0] for row in cursor.fetchall()]
+        if len(players) != 2:
+            return None
+        p1_id, p2_id = players
 
-            elif is_draw:
-                # Add 0.5 points to BOTH players linked to this match
-                cursor.execute("""
-                               UPDATE players
-                                   JOIN players_matches
-                               ON players.user_id = players_matches.player
-                                   SET players.score = players.score + 0.5
-                               WHERE players_matches.match_id = %s
-                               """, (match_id,))
-            self.conn.commit()
-        cursor.close()
+        cursor.execute("SELECT user_id, rating, rd, volatility FROM ratings WHERE user_id IN (%s, %s) FOR UPDATE",
+                       (p1_id, p2_id))
+        current = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+        p1_score = 0.5 if is_draw else (1 if winner_id == p1_id else 0)
+        p1, p2 = rating.rate_game(current.get(p1_id, rating.DEFAULT), current.get(p2_id, rating.DEFAULT), p1_score)
+
+        cursor.execute("""
+                       INSERT INTO ratings (user_id, rating, rd, volatility, games)
+                       VALUES (%s, %s, %s, %s, 1),
+                              (%s, %s, %s, %s, 1)
+                       ON DUPLICATE KEY UPDATE rating = VALUES(rating), rd = VALUES(rd),
+                                               volatility = VALUES(volatility), games = games + 1
+                       """, (p1_id, *p1, p2_id, *p2))
+        cursor.execute("""
+                       REPLACE INTO rating_history (match_id, user_id, rating, rd, volatility)
+                       VALUES (%s, %s, %s, %s, %s),
+                              (%s, %s, %s, %s, %s)
+                       """, (match_id, p1_id, *p1, match_id, p2_id, *p2))
+        return p1_id, p2_id, p1_score
+
+    def recompute_ratings(self):
+        """
+        Rebuilds every rating and the whole rating history from the finished matches, e.g. after the
+        rating formula changed. The matches are read with one query and replayed in memory, in order;
+        the results are written back with multi-row inserts, all in one transaction.
+
+        Returns:
+            int: The number of matches replayed.
+        """
+        with self.transaction() as cursor:
+            games = self._finished_games(cursor, lock=True)
+            ratings, history = rating.replay(games)
+
+            games_played = {}
+            for _, user_id, *_ in history:
+                games_played[user_id] = games_played.get(user_id, 0) + 1
+
+            cursor.execute("DELETE FROM rating_history")
+            cursor.execute("DELETE FROM ratings")
+
+            rows = [(user_id, *values, games_played[user_id]) for user_id, values in ratings.items()]
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                batch = rows[start:start + INSERT_BATCH_SIZE]
+                cursor.execute(f"INSERT INTO ratings (user_id, rating, rd, volatility, games) VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))}",
+                               tuple(value for row in batch for value in row))
+
+            for start in range(0, len(history), INSERT_BATCH_SIZE):
+                batch = history[start:start + INSERT_BATCH_SIZE]
+                cursor.execute(f"INSERT INTO rating_history (match_id, user_id, rating, rd, volatility) VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))}",
+                               tuple(value for row in batch for value in row))
+
+        return len(games)
+
+    def get_rating(self, user_id):
+        """Returns `(rating, rd, games)` of a player, the defaults if they haven't finished a match yet."""
+        result = self.fetchone("SELECT rating, rd, games FROM ratings WHERE user_id = %s", (user_id,))
+        return tuple(result) if result else (rating.DEFAULT_RATING, rating.DEFAULT_RD, 0)
+
+    def get_rating_history(self, user_id, limit=10):
+        """Returns `(match_id, rating, rd)` of a player's last matches, most recent first."""
+        return self.fetchall("""
+                       SELECT match_id, rating, rd
+                       FROM rating_history
+                       WHERE user_id = %s
+                       ORDER BY match_id DESC
+                       LIMIT %s
+                       """, (user_id, limit))
 
     def force_resolve_match(self, match_id, winner_id=None, is_draw=False):
         """Staff method to forcefully resolve a match in case of a dispute."""
-        cursor = self.get_cursor()
-
         # Check if the match exists and its current status
-        cursor.execute("SELECT status FROM matches WHERE match_id = %s", (match_id,))
-        result = cursor.fetchone()
+        result = self.fetchone("SELECT status FROM matches WHERE match_id = %s", (match_id,))
 
         if not result:
-            cursor.close()
             return False, "Match non trovato."
 
         status = result[0]
         if status in ['FINISHED', 'CANCELLED']:
-            cursor.close()
             return False, f"Impossibile risolvere. Il match è già {status}."
 
-        cursor.close()
-
         # Call the internal method to finalize the points and update the status
         self._finalize_match(match_id, winner_id, is_draw)
 
         return True, "Match risolto con successo."
 
     def process_end_of_day_penalties(self):
-        """Applies -1 penalty to players who didn't confirm PENDING matches."""
-        cursor = self.get_cursor()
-
-        # Find all matches still stuck in PENDING
-        cursor.execute("SELECT match_id FROM matches WHERE status = 'PENDING'")
-        pending_matches = cursor.fetchall()
-
-        penalized_players = []
-
-        for (match_id,) in pending_matches:
-            # Find players who didn't confirm in this match
-            cursor.execute("SELECT player FROM players_matches WHERE match_id = %s AND confirmed = FALSE", (match_id,))
-            unconfirmed = cursor.fetchall()
-
-            for (player_id,) in unconfirmed:
-                cursor.execute("UPDATE players SET score = score - 1 WHERE user_id = %s", (player_id,))
-                penalized_players.append(player_id)
-
-            # Mark the match as cancelled so it doesn't trigger again tomorrow
-            cursor.execute("UPDATE matches SET status = 'CANCELLED' WHERE match_id = %s", (match_id,))
-
-        self.conn.commit()
-        cursor.close()
-
-        return penalized_players
\ No newline at end of file
+        """
+        Applies -1 penalty to players who didn't confirm PENDING matches and cancels those matches.
+
+        Runs a fixed number of set-based statements in one transaction, whatever the number of matches,
+        and records every penalty in the `penalties` table.
+
+        Returns:
+            list: The ID of every penalized player, once per missed match.
+        """
+        day = datetime.utcnow().date()
+
+        with self.transaction() as cursor:
+            # Lock the unconfirmed players of the pending matches, so nobody confirms halfway through
+            cursor.execute("""
+                           SELECT pm.match_id, pm.player
+                           FROM players_matches pm
+                                    JOIN matches m ON pm.match_id = m.match_id
+                           WHERE m.status = 'PENDING'
+                             AND pm.confirmed = FALSE
+                           ORDER BY pm.match_id
+                               FOR UPDATE
+                           """)
+            penalized_players = [player_id for _, player_id in cursor.fetchall()]
+
+            if penalized_players:
+                cursor.execute("""
+                               INSERT INTO penalties (match_id, player, day, points)
+                               SELECT pm.match_id, pm.player, %s, %s
+                               FROM players_matches pm
+                                        JOIN matches m ON pm.match_id = m.match_id
+                               WHERE m.status = 'PENDING'
+                                 AND pm.confirmed = FALSE
+                               """, (day, -MISSED_MATCH_PENALTY))
+
+                # One point per missed match, all players at once
+                cursor.execute("""
+                               UPDATE players
+                                   JOIN (SELECT pm.player, COUNT(*) AS missed
+                                         FROM players_matches pm
+                                                  JOIN matches m ON pm.match_id = m.match_id
+                                         WHERE m.status = 'PENDING'
+                                           AND pm.confirmed = FALSE
+                                         GROUP BY pm.player) AS absent
+                               ON players.user_id = absent.player
+                                   SET players.score = players.score - absent.missed * %s
+                               """, (MISSED_MATCH_PENALTY,))
+
+            # Mark the matches as cancelled so they don't trigger again tomorrow
+            cursor.execute("UPDATE matches SET status = 'CANCELLED' WHERE status = 'PENDING'")
+
+        self.standings.penalize(penalized_players, MISSED_MATCH_PENALTY)
+        return penalized_players
@@ -1,8 +1,304 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector import errorcode, errors
+
+from utils.debug import Logger
+from utils.metrics import MeteredCursor, record_query
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Default pool settings, shared by every BaseDatabase subclass
+POOL_SIZE = 8
+POOL_TIMEOUT = 10
+# Idle seconds after which the background keepalive pings a connection (well below MySQL's wait_timeout)
+KEEPALIVE_AFTER = 300
+
+# Client errors meaning the socket is gone, not that the statement itself is wrong
+DISCONNECT_ERRNOS = {
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_SERVER_LOST_EXTENDED,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_disconnect(error):
+    """Tells whether a MySQL error was caused by a dropped connection."""
+    if not isinstance(error, (errors.OperationalError, errors.InterfaceError)):
+        return False
+    # "MySQL Connection not available" has no errno (-1, or None in older versions): the connection was already closed
+    return error.errno in DISCONNECT_ERRNOS or error.errno in (None, -1)
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of MySQL connections.
+
+    Connections are opened lazily (never more than `size` at once), handed out with `acquire()`
+    and given back with `release()`. Checking a connection out costs no round-trip: a dead socket
+    is detected by the query that uses it (see `BaseDatabase`), while a background keepalive pings
+    only the connections that sat idle for more than `keepalive_after` seconds.
+
+    Attributes:
+        size (int): Maximum number of connections opened at the same time.
+        timeout (float): Seconds `acquire()` waits for a free connection before giving up.
+        keepalive_after (float): Idle seconds after which a connection is pinged in the background.
+    """
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT, keepalive_after=KEEPALIVE_AFTER, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.keepalive_after = keepalive_after
+        self.connect_args = connect_args
+
+        self._idle = deque()  # (connection, last time it was used)
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._keepalive = None
+        self._stop = threading.Event()
+
+    def _connect(self):
+        # Single statements commit on their own, multi-statement work uses explicit transactions.
+        # Passed to connect() so that it also survives a reconnect.
+        return mysql.connector.connect(autocommit=True, **self.connect_args)
+
+    def _forget(self):
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def _start_keepalive(self):
+        if self._keepalive is None:
+            self._keepalive = threading.Thread(target=self._keepalive_loop, name="database-keepalive", daemon=True)
+            self._keepalive.start()
+
+    def acquire(self, fresh=False):
+        """
+        Checks out a connection, opening a new one if the pool isn't full yet.
+
+        Args:
+            fresh (bool): Reconnect an idle connection before handing it out, used after a disconnect.
+
+        Returns:
+            MySQLConnection: A connection, owned by the caller until `release()`.
+
+        Raises:
+            PoolError: If no connection becomes available within `timeout` seconds.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._start_keepalive()
+            while True:
+                if self._idle:
+                    # LIFO: the most recently used connection is the least likely to be stale
+                    conn, _ = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise errors.PoolError(f"No database connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                return self._connect()
+            if fresh:
+                conn.reconnect(attempts=1, delay=0)
+            return conn
+        except BaseException:
+            if conn is not None:
+                self._close(conn)
+            self._forget()
+            raise
+
+    def release(self, conn, broken=False):
+        """
+        Gives a connection back to the pool.
+
+        Args:
+            conn (MySQLConnection): The connection obtained from `acquire()`.
+            broken (bool): Discard the connection instead of reusing it (e.g. after a network error).
+        """
+        if not broken and conn.in_transaction:
+            try:
+                conn.rollback()
+            except errors.Error:
+                broken = True
+
+        if broken or self._stop.is_set():
+            # Also closed when the pool was closed while the connection was checked out
+            self._close(conn)
+            self._forget()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _keepalive_loop(self):
+        """Pings the connections idle for longer than `keepalive_after`, so MySQL doesn't drop them."""
+        while not self._stop.wait(self.keepalive_after / 2):
+            now = time.monotonic()
+            with self._cond:
+                stale = [entry for entry in self._idle if now - entry[1] > self.keepalive_after]
+                for entry in stale:
+                    self._idle.remove(entry)
+
+            for conn, _ in stale:
+                if self._stop.is_set():
+                    self._close(conn)
+                    self._forget()
+                    continue
+                try:
+                    conn.ping(reconnect=True, attempts=1, delay=0)
+                except errors.Error as e:
+                    logger.warning(f"Dropping idle database connection: {e}")
+                    self._close(conn)
+                    self._forget()
+                    continue
+
+                with self._cond:
+                    # Back at the bottom of the LIFO, behind the connections in active use
+                    self._idle.appendleft((conn, time.monotonic()))
+                    self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except errors.Error:
+            pass
+
+    def close(self):
+        """Stops the keepalive and closes every idle connection. Connections still checked out are closed on release."""
+        self._stop.set()
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+
+def get_pool(size=POOL_SIZE, timeout=POOL_TIMEOUT, keepalive_after=KEEPALIVE_AFTER, **connect_args):
+    """
+    Returns the process-wide pool for the given connection arguments, creating it on first use.
+
+    The pool settings only apply when the pool is created; later callers share the existing one.
+    """
+    key = tuple(sorted(connect_args.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(size, timeout, keepalive_after, **connect_args)
+            _pools[key] = pool
+        return pool
+
+
+def get_executor():
+    """
+    Returns the thread pool dedicated to database calls.
+
+    It has as many workers as a pool has connections, so queries never queue up inside a worker
+    while holding it, and slow queries never eat into the default executor used by discord.py.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="database")
+        return _executor
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """
+    Runs a blocking database call on the database executor and waits for it without blocking the event loop.
+
+    The caller's context variables are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def close_pools():
+    """Stops the database executor and closes the idle connections of every pool, to be called on shutdown."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+class AsyncDatabase:
+    """
+    Awaitable view of a database system: every public method of the wrapped system is exposed
+    as a coroutine that runs on the database executor.
+
+    Example:
+        n_reactions = await board_system.aio.get_reactions(message_id)
+    """
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        method = getattr(self._database, name)
+        if not callable(method):
+            raise AttributeError(f"'{type(self._database).__name__}.{name}' is not a method")
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await run_in_executor(method, *args, **kwargs)
+
+        # Cache the wrapper so the lookup only happens once per method
+        setattr(self, name, call)
+        return call
+
 
 class BaseDatabase:
-    def __init__(self, host, user, password, database, charset="utf8mb4", use_unicode=True):
-        self.conn = mysql.connector.connect(
+    """
+    Base class for every `*System`: gives access to the shared connection pool.
+
+    Single statements should go through `fetchone`, `fetchall` and `execute`: they reconnect lazily,
+    and when the connection turns out to be dead they retry once on a fresh one if the statement is
+    safe to run twice (reads always are, writes are flagged with `idempotent=True`).
+    Work that needs several statements on the same connection uses `cursor()`, or `transaction()`
+    when it must be atomic; those blocks are never retried.
+    From the event loop, every method must be awaited through `aio` so the query runs on the database executor.
+    The time and number of statements are charged to the handler being measured (see `utils.metrics`).
+
+    Attributes:
+        pool (ConnectionPool): The pool shared by all the systems connected to the same database.
+        aio (AsyncDatabase): Awaitable version of every public method of the system.
+    """
+    def __init__(self, host, user, password, database, charset="utf8mb4", use_unicode=True, pool_size=POOL_SIZE):
+        self.pool = get_pool(
+            size=pool_size,
             host=host,
             user=user,
             password=password,
@@ -10,11 +306,91 @@ class BaseDatabase:
             charset=charset,
             use_unicode=use_unicode
         )
+        self.aio = AsyncDatabase(self)
 
-    def get_cursor(self, buffered=False):
+    @contextmanager
+    def connection(self, fresh=False):
+        """
+        Checks out a connection from the pool and returns it when the block ends.
+        Connections that hit a network error are discarded instead of being reused.
         """
-        Controlla se la connessione è viva prima di restituire il cursore.
-        Se il DB ha chiuso la connessione, si riconnette in automatico.
+        conn = self.pool.acquire(fresh=fresh)
+        broken = False
+        try:
+            yield conn
+        except (errors.OperationalError, errors.InterfaceError) as e:
+            broken = is_disconnect(e)
+            raise
+        finally:
+            self.pool.release(conn, broken=broken)
+
+    @contextmanager
+    def cursor(self, buffered=True, fresh=False):
+        """Yields a cursor on a pooled connection, in autocommit mode."""
+        with self.connection(fresh=fresh) as conn:
+            cursor = MeteredCursor(conn.cursor(buffered=buffered))
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self, buffered=True):
+        """Yields a cursor inside a transaction, committed when the block ends or rolled back on error."""
+        with self.connection() as conn:
+            start = time.perf_counter()
+            conn.start_transaction()
+            record_query(time.perf_counter() - start, statements=0)
+
+            cursor = MeteredCursor(conn.cursor(buffered=buffered))
+            try:
+                yield cursor
+                start = time.perf_counter()
+                conn.commit()
+                record_query(time.perf_counter() - start, statements=0)
+            except BaseException:
+                try:
+                    conn.rollback()
+                except errors.Error:
+                    pass
+                raise
+            finally:
+                cursor.close()
+
+    def _run(self, query, params, result, idempotent):
+        """
+        Runs a single statement and returns `result(cursor)`.
+        If the connection was dead, the statement is retried once on a reconnected connection when `idempotent`.
+        """
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(query, params)
+                return result(cursor)
+        except (errors.OperationalError, errors.InterfaceError) as e:
+            if not idempotent or not is_disconnect(e):
+                raise
+            logger.warning(f"Database connection lost ({e}), retrying on a new connection")
+
+        with self.cursor(fresh=True) as cursor:
+            cursor.execute(query, params)
+            return result(cursor)
+
+    def fetchone(self, query, params=()):
+        """Runs a single query and returns its first row, or `None`."""
+        return self._run(query, params, lambda cursor: cursor.fetchone(), idempotent=True)
+
+    def fetchall(self, query, params=()):
+        """Runs a single query and returns all of its rows."""
+        return self._run(query, params, lambda cursor: cursor.fetchall(), idempotent=True)
+
+    def execute(self, query, params=(), idempotent=False):
+        """
+        Runs a single statement and returns the number of affected rows.
+
+        Args:
+            query (str): The statement to run.
+            params (tuple): The statement's parameters.
+            idempotent (bool): Whether running the statement twice has the same effect as running it once,
+                               which allows retrying it if the connection dropped mid-way.
         """
-        self.conn.ping(reconnect=True, attempts=3, delay=2)
-        return self.conn.cursor(buffered=buffered)
\ No newline at end of file
+        return self._run(query, params, lambda cursor: cursor.rowcount, idempotent=idempotent)
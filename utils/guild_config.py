@@ -0,0 +1,165 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional
+
+from utils.board_system import BoardSystem
+from utils.server_system import ServerSystem
+
+
+@dataclass
+class GuildConfig:
+    """
+    Settings of a single guild, as stored across the `board_config`, `descriptions`, `onjoin` and `channels` tables.
+
+    Attributes:
+        board_channel (int): ID of the board channel, or `None` if not set.
+        min_reactions (int): Number of ⭐ needed for a message to be boarded.
+        description (str): Welcome message, `%u` is replaced with the new member's mention.
+        join_role (int): ID of the role given on join, or `None` if not set.
+        channels (dict): Channel IDs keyed by their description (e.g. "announce", "level").
+    """
+    board_channel: Optional[int] = None
+    min_reactions: int = 1
+    description: str = ""
+    join_role: Optional[int] = None
+    channels: dict = field(default_factory=dict)
+
+    @property
+    def announce_channel(self):
+        return self.channels.get("announce")
+
+    @property
+    def level_channel(self):
+        return self.channels.get("level")
+
+
+class GuildConfigCache:
+    """
+    In-memory cache of every guild's configuration.
+
+    Each guild is loaded from the database once, the first time it's needed; concurrent requests for
+    a guild that is still loading share the same load. The setters write to the database first and then
+    update the cached entry (write-through), so the cache never needs to be expired.
+
+    Attributes:
+        hits (int): Number of lookups answered from memory.
+        misses (int): Number of lookups that had to load the guild from the database.
+    """
+    def __init__(self, server_system: ServerSystem, board_system: BoardSystem):
+        self.server_system = server_system
+        self.board_system = board_system
+        self.hits = 0
+        self.misses = 0
+
+        self._configs = {}
+        self._loading = {}
+        # Bumped by every write, so a load that raced with a setter doesn't cache stale data
+        self._versions = {}
+
+    async def get(self, guild_id) -> GuildConfig:
+        """
+        Returns the configuration of a guild, loading it from the database on the first call.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            GuildConfig: The cached configuration. Don't modify it directly, use the setters.
+        """
+        config = self._configs.get(guild_id)
+        if config is not None:
+            self.hits += 1
+            return config
+
+        self.misses += 1
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+
+        # Shielded so a cancelled caller doesn't cancel the load shared with the others
+        return await asyncio.shield(task)
+
+    async def _load(self, guild_id) -> GuildConfig:
+        version = self._versions.get(guild_id, 0)
+
+        board_channel, min_reactions, description, join_role, channels = await asyncio.gather(
+            self.board_system.aio.get_board_channel(guild_id),
+            self.board_system.aio.get_min_reactions(guild_id),
+            self.server_system.aio.get_description(guild_id),
+            self.server_system.aio.get_role(guild_id),
+            self.server_system.aio.get_channels(guild_id)
+        )
+
+        config = GuildConfig(
+            board_channel=board_channel,
+            min_reactions=min_reactions,
+            description=description,
+            join_role=join_role[0] if join_role else None,
+            channels={desc: channel_id for channel_id, desc in channels}
+        )
+
+        if self._versions.get(guild_id, 0) == version:
+            self._configs[guild_id] = config
+        return config
+
+    def _written(self, guild_id):
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+        return self._configs.get(guild_id)
+
+    def invalidate(self, guild_id=None):
+        """
+        Drops a guild (or every guild when `guild_id` is `None`) from the cache, forcing a reload.
+        Only needed if the tables are changed outside of the setters below.
+        """
+        if guild_id is None:
+            for cached in list(self._configs):
+                self._written(cached)
+            self._configs.clear()
+        else:
+            self._written(guild_id)
+            self._configs.pop(guild_id, None)
+
+    async def set_board_channel(self, guild_id, channel_id):
+        await self.board_system.aio.set_board_channel(guild_id, channel_id)
+        config = self._written(guild_id)
+        if config is not None:
+            config.board_channel = channel_id
+
+    async def set_min_reactions(self, guild_id, num):
+        await self.board_system.aio.set_min_reactions(guild_id, num)
+        config = self._written(guild_id)
+        if config is not None:
+            config.min_reactions = num
+
+    async def set_description(self, guild_id, description):
+        await self.server_system.aio.set_description(guild_id, description)
+        config = self._written(guild_id)
+        if config is not None:
+            config.description = description
+
+    async def set_join_role(self, guild_id, role_id):
+        await self.server_system.aio.set_role(guild_id, role_id)
+        config = self._written(guild_id)
+        if config is not None:
+            config.join_role = role_id
+
+    async def set_channel(self, guild_id, channel_id, description=""):
+        await self.server_system.aio.add_channel(guild_id, channel_id, description)
+        config = self._written(guild_id)
+        if config is not None:
+            config.channels[description] = channel_id
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit and miss counters, hit ratio and number of cached guilds.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "guilds": len(self._configs)
+        }
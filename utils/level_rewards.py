@@ -0,0 +1,129 @@
+import asyncio
+import bisect
+import os
+
+import discord
+
+from utils.debug import Logger
+from utils.server_system import ServerSystem
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+
+class _GuildRewards:
+    """The level roles of a guild, sorted by level so the roles earned at a level are a prefix."""
+    def __init__(self, rows=()):
+        self._entries = sorted(rows)  # (level, role_id)
+        self._levels = [level for level, _ in self._entries]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def earned(self, level):
+        """Returns the IDs of the roles given at `level` or below."""
+        return [role_id for _, role_id in self._entries[:bisect.bisect_right(self._levels, level)]]
+
+    def set(self, role_id, level):
+        self.remove(role_id)
+        index = bisect.bisect_right(self._entries, (level, role_id))
+        self._entries.insert(index, (level, role_id))
+        self._levels.insert(index, level)
+
+    def remove(self, role_id):
+        for index, (_, current) in enumerate(self._entries):
+            if current == role_id:
+                del self._entries[index]
+                del self._levels[index]
+                return
+
+
+class LevelRewards:
+    """
+    Gives members the roles tied to the levels they reached.
+
+    The `level_roles` of a guild are loaded once, the first time a member of the guild levels up, and
+    kept sorted by level, so the roles earned at a level are found with a bisect. Roles are resolved
+    from the guild cache and compared with the member's cached roles: only the missing ones are added,
+    all in a single request. `set_role` writes through, so the index never needs to be reloaded.
+
+    Attributes:
+        server_system (ServerSystem): The server system storing the level roles.
+    """
+    def __init__(self, server_system: ServerSystem):
+        self.server_system = server_system
+        self._guilds = {}
+        self._loading = {}
+        # Bumped by every write, so a load that raced with set_role doesn't cache stale rows
+        self._versions = {}
+
+    async def load(self, guild_id) -> _GuildRewards:
+        """Returns the level roles of a guild, loading them first if needed. Concurrent calls share one query."""
+        rewards = self._guilds.get(guild_id)
+        if rewards is not None:
+            return rewards
+
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, guild_id):
+        version = self._versions.get(guild_id, 0)
+        rewards = _GuildRewards(await self.server_system.aio.get_level_roles(guild_id))
+        if self._versions.get(guild_id, 0) == version:
+            self._guilds[guild_id] = rewards
+            logger.info(f"Loaded {len(rewards)} level roles of guild {guild_id}")
+        return rewards
+
+    async def set_role(self, guild_id, role_id, level):
+        """Gives `role_id` at `level` (moving it if it was already tied to another level)."""
+        await self.server_system.aio.add_role(guild_id, role_id, level)
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+        rewards = self._guilds.get(guild_id)
+        if rewards is not None:
+            rewards.set(role_id, level)
+
+    async def missing_roles(self, member: discord.Member, level):
+        """
+        Returns:
+            list: The roles `member` earned at `level` or below and doesn't have yet. Roles that were
+                  deleted, or that the bot can't give, are left out.
+        """
+        rewards = await self.load(member.guild.id)
+        owned = {role.id for role in member.roles}
+
+        missing = []
+        for role_id in rewards.earned(level):
+            if role_id in owned:
+                continue
+            role = member.guild.get_role(role_id)
+            if role is None:
+                logger.warning(f"Level role {role_id} of guild {member.guild.id} doesn't exist anymore")
+            elif not role.is_assignable():
+                logger.warning(f"Level role {role_id} of guild {member.guild.id} is above the bot's roles")
+            else:
+                missing.append(role)
+        return missing
+
+    async def grant(self, member: discord.Member, level):
+        """
+        Adds every level role `member` is missing up to `level`, with a single request.
+
+        Returns:
+            list: The roles that were added.
+        """
+        missing = await self.missing_roles(member, level)
+        if not missing:
+            return []
+
+        try:
+            await member.add_roles(*missing, reason=f"Reached level {level}")
+        except discord.HTTPException as e:
+            logger.error(f"Failed to give the level roles to {member.id} in guild {member.guild.id}: {e}")
+            return []
+
+        logger.info(f"Gave {len(missing)} level roles to {member.id} in guild {member.guild.id}")
+        return missing
@@ -1,7 +1,41 @@
 import mysql.connector
+from mysql.connector import errorcode
 
 from utils.database import BaseDatabase
 
+# Rows written by a single multi-row upsert in `save_users`
+SAVE_BATCH_SIZE = 500
+# Highest level an admin can set: rankings keep a counter per level up to this one
+MAX_LEVEL = 10_000
+# Largest XP value (or change) an admin can set, well inside the INT column
+MAX_XP = 1_000_000_000
+# LAST_INSERT_ID(expr) hands one integer back with the statement: the new level goes in the high
+# 32 bits and the new XP, shifted to be positive, in the low ones
+_LEVEL_SHIFT = 1 << 32
+_XP_OFFSET = 1 << 31
+
+
+def apply_xp(xp, level, amount):
+    """
+    Applies the level-up rule to a user's XP and level.
+
+    Args:
+        xp (int): The current XP of the user.
+        level (int): The current level of the user.
+        amount (int): The amount of XP gained.
+
+    Returns:
+        tuple: The new XP and level of the user.
+    """
+    xp += amount
+
+    # Check if the XP exceeds the threshold for leveling up.
+    if xp >= level * 100:
+        xp = 0  # Reset XP after leveling up.
+        level += 1
+
+    return xp, level
+
 
 class LevelSystem(BaseDatabase):
     """
@@ -11,11 +45,11 @@ class LevelSystem(BaseDatabase):
     It supports functionality such as adding XP, setting levels, and resetting user data.
 
     Attributes:
-        conn (mysql.connector.connection.MySQLConnection): The MySQL database connection object.
+        pool (ConnectionPool): The shared pool of MySQL connections.
     """
     def __init__(self, host, user, password, database):
         """
-        Initializes the LevelSystem instance and establishes a connection to the MySQL database.
+        Initializes the LevelSystem instance on top of the shared MySQL connection pool.
 
         Args:
             host (str): The hostname or IP address of the MySQL server.
@@ -38,11 +72,12 @@ class LevelSystem(BaseDatabase):
         - xp: The experience points (XP) of the user.
         - level: The level of the user.
 
+        The `guild_rank` index on `(guild_id, level, xp)` is created along with it.
+
         Returns:
             None
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
+        self.execute("""
                     CREATE TABLE IF NOT EXISTS levels(
                         user_id BIGINT,
                         guild_id BIGINT,
@@ -50,8 +85,14 @@ class LevelSystem(BaseDatabase):
                         level INT DEFAULT 0,
                         PRIMARY KEY(user_id, guild_id)
                     )
-                       """)
-        cursor.close()
+                       """, idempotent=True)
+
+        # Serves leaderboards and rankings: a guild's users ordered by level and XP, without touching the rows
+        try:
+            self.execute("CREATE INDEX guild_rank ON levels (guild_id, level, xp)", idempotent=True)
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_DUP_KEYNAME:
+                raise
 
     def get_user(self, user_id, guild_id):
         """
@@ -64,11 +105,55 @@ class LevelSystem(BaseDatabase):
         Returns:
             tuple: A tuple containing the user's XP and level, or `None` if the user doesn't exist in the database.
         """
-        cursor = self.get_cursor()
-        cursor.execute("SELECT xp, level FROM levels WHERE user_id = %s AND guild_id = %s", (user_id, guild_id))
-        result = cursor.fetchone()
-        cursor.close()
-        return result
+        return self.fetchone("SELECT xp, level FROM levels WHERE user_id = %s AND guild_id = %s", (user_id, guild_id))
+
+    def get_guild_users(self, guild_id):
+        """
+        Retrieves the level and XP of every user of a guild, highest first, through the `guild_rank` index.
+
+        Args:
+            guild_id (int): The ID of the guild (Discord server).
+
+        Returns:
+            list: Tuples of `(user_id, level, xp)`.
+        """
+        return self.fetchall("""
+                    SELECT user_id, level, xp FROM levels
+                    WHERE guild_id = %s
+                    ORDER BY level DESC, xp DESC
+                       """, (guild_id,))
+
+    def _upsert(self, user_id, guild_id, xp, level, params=(), idempotent=False):
+        """
+        Writes a user's row in a single statement and returns the values written.
+
+        `xp` and `level` are SQL expressions of the current row, `cur` (`(0, 0)` for a new user), so
+        both new values come from the old row only, whatever order the assignments run in. The new
+        values are handed back through `LAST_INSERT_ID(expr)`, with no read afterwards.
+
+        Args:
+            user_id (int): The unique ID of the user.
+            guild_id (int): The ID of the guild (Discord server) where the user is active.
+            xp (str): The new XP.
+            level (str): The new level.
+            params (tuple): The parameters of `xp` followed by the ones of `level`.
+            idempotent (bool): Whether the write can be retried (absolute values only).
+
+        Returns:
+            tuple: The user's XP and level after the write.
+        """
+        packed = self._run(f"""
+                INSERT INTO levels (user_id, guild_id, xp, level)
+                SELECT %s, %s, changed.xp, changed.level
+                FROM (SELECT {xp} AS xp, {level} AS level
+                      FROM (SELECT COALESCE(MAX(xp), 0) AS xp, COALESCE(MAX(level), 0) AS level
+                            FROM levels WHERE user_id = %s AND guild_id = %s) AS cur) AS changed
+                WHERE LAST_INSERT_ID(changed.level * {_LEVEL_SHIFT} + changed.xp + {_XP_OFFSET}) > 0
+                ON DUPLICATE KEY UPDATE xp = VALUES(xp), level = VALUES(level)
+                       """, (user_id, guild_id, *params, user_id, guild_id),
+                           lambda cursor: cursor.lastrowid, idempotent=idempotent)
+        level, xp = divmod(packed, _LEVEL_SHIFT)
+        return xp - _XP_OFFSET, level
 
     def add_xp(self, user_id, guild_id, amount):
         """
@@ -80,36 +165,39 @@ class LevelSystem(BaseDatabase):
             amount (int): The amount of XP to add to the user's total.
 
         Returns:
-            int: The new level of the user after the XP is added.
-        """
-        user = self.get_user(user_id, guild_id)
-        
-        # If the user doesn't exist in the database, create a new entry with the given XP.
-        if user is None:
-            cursor = self.get_cursor()
-            cursor.execute("INSERT INTO levels (user_id, guild_id, xp) VALUES (%s, %s, %s)", (user_id, guild_id, amount))
-            self.conn.commit()
-            cursor.close()
-            return 1  # The user starts at level 1
-        
-        xp, level = user
-        xp += amount
-        new_level = level
-
-        # Check if the XP exceeds the threshold for leveling up.
-        if xp >= level * 100:
-            xp = 0  # Reset XP after leveling up.
-            new_level += 1
-
-        cursor = self.get_cursor()
-        cursor.execute("""
-                REPLACE INTO levels (user_id, guild_id, xp, level)
-                VALUES (%s, %s, %s, %s)
-                       """, (user_id, guild_id, xp, new_level))
-        self.conn.commit()
-        cursor.close()
-
-        return xp, new_level
+            tuple: The user's XP and level after the update.
+        """
+        # The same rule as `apply_xp`, evaluated by the database
+        return self._upsert(
+            user_id, guild_id,
+            "CASE WHEN cur.xp + %s >= cur.level * 100 THEN 0 ELSE cur.xp + %s END",
+            "CASE WHEN cur.xp + %s >= cur.level * 100 THEN cur.level + 1 ELSE cur.level END",
+            (amount, amount, amount)
+        )
+
+    def save_users(self, rows):
+        """
+        Writes the XP and level of many users at once, with one multi-row upsert per batch.
+
+        Args:
+            rows (list): Tuples of `(user_id, guild_id, xp, level)`.
+
+        Returns:
+            int: The number of rows affected.
+        """
+        affected = 0
+        for start in range(0, len(rows), SAVE_BATCH_SIZE):
+            batch = rows[start:start + SAVE_BATCH_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+            params = tuple(value for row in batch for value in row)
+
+            # Absolute values, so the batch can safely be retried
+            affected += self.execute(f"""
+                    INSERT INTO levels (user_id, guild_id, xp, level)
+                    VALUES {placeholders}
+                    ON DUPLICATE KEY UPDATE xp = VALUES(xp), level = VALUES(level)
+                           """, params, idempotent=True)
+        return affected
 
     def add_levels(self, user_id, guild_id, amount):
         """
@@ -118,33 +206,13 @@ class LevelSystem(BaseDatabase):
         Args:
             user_id (int): The unique ID of the user.
             guild_id (int): The ID of the guild (Discord server) where the user is active.
-            amount (int): The number of levels to add to the user's current level.
+            amount (int): The number of levels to add to the user's current level (negative to remove them).
 
         Returns:
-            int: The new level of the user after the levels are added.
-        """
-        user = self.get_user(user_id, guild_id)
-        
-        # If the user doesn't exist in the database, create a new entry with the specified level.
-        if user is None:
-            cursor = self.get_cursor()
-            cursor.execute("INSERT INTO levels (user_id, guild_id, level) VALUES (%s, %s, %s)", (user_id, guild_id, amount))
-            self.conn.commit()
-            cursor.close()
-            return amount  # The user starts at the specified level
-        
-        xp, level = user
-        level += amount
-
-        cursor = self.get_cursor()
-        cursor.execute("""
-                REPLACE INTO levels (user_id, guild_id, xp, level)
-                VALUES (%s, %s, %s, %s)
-                       """, (user_id, guild_id, xp, level))
-        self.conn.commit()
-        cursor.close()
-
-        return xp, level
+            tuple: The user's XP and level after the update.
+        """
+        # Kept within 0..MAX_LEVEL, the range the leaderboard index counts
+        return self._upsert(user_id, guild_id, "cur.xp", f"LEAST(GREATEST(cur.level + %s, 0), {MAX_LEVEL})", (amount,))
 
     def set_level(self, user_id, guild_id, value):
         """
@@ -156,28 +224,9 @@ class LevelSystem(BaseDatabase):
             value (int): The level to set for the user.
 
         Returns:
-            int: The new level of the user.
-        """
-        user = self.get_user(user_id, guild_id)
-        
-        if user is None:
-            cursor = self.get_cursor()
-            cursor.execute("INSERT INTO levels (user_id, guild_id, level) VALUES (%s, %s, %s)", (user_id, guild_id, value))
-            self.conn.commit()
-            cursor.close()
-            return value  # The user starts at the specified level
-        
-        xp, _ = user
-        
-        cursor = self.get_cursor()
-        cursor.execute("""
-                    REPLACE INTO levels (user_id, guild_id, xp, level)
-                    VALUES (%s, %s, %s, %s)
-                        """, (user_id, guild_id, xp, value))
-        self.conn.commit()
-        cursor.close()
-
-        return xp, value
+            tuple: The user's XP and level after the update.
+        """
+        return self._upsert(user_id, guild_id, "cur.xp", "%s", (value,), idempotent=True)
 
     def set_xp(self, user_id, guild_id, value):
         """
@@ -189,28 +238,9 @@ class LevelSystem(BaseDatabase):
             value (int): The amount of XP to set for the user.
 
         Returns:
-            int: The new XP value for the user.
-        """
-        user = self.get_user(user_id, guild_id)
-        
-        if user is None:
-            cursor = self.get_cursor()
-            cursor.execute("INSERT INTO levels (user_id, guild_id, xp) VALUES (%s, %s, %s)", (user_id, guild_id, value))
-            self.conn.commit()
-            cursor.close()
-            return value  # The user starts with the specified XP
-        
-        level, _ = user
-        
-        cursor = self.get_cursor()
-        cursor.execute("""
-                    REPLACE INTO levels (user_id, guild_id, xp, level)
-                    VALUES (%s, %s, %s, %s)
-                        """, (user_id, guild_id, value, level))
-        self.conn.commit()
-        cursor.close()
-
-        return value, level
+            tuple: The user's XP and level after the update.
+        """
+        return self._upsert(user_id, guild_id, "%s", "cur.level", (value,), idempotent=True)
 
     def reset_level(self, user_id, guild_id):
         """
@@ -223,17 +253,7 @@ class LevelSystem(BaseDatabase):
         Returns:
             bool: `True` if the user was successfully reset (removed from the database), `False` if the user doesn't exist.
         """
-        user = self.get_user(user_id, guild_id)
-
-        if user is None:
-            return False  # User does not exist
-        
-        cursor = self.get_cursor()
-        cursor.execute("""
+        # The DELETE itself tells whether the user existed
+        return self.execute("""
                 DELETE FROM levels WHERE user_id = %s AND guild_id = %s
-                       """, (user_id, guild_id))
-
-        self.conn.commit()
-        cursor.close()
-
-        return True
+                       """, (user_id, guild_id), idempotent=True) > 0
@@ -0,0 +1,280 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import aiohttp
+from discord import InteractionType, app_commands
+
+# Upper bounds of the histogram buckets: milliseconds grow geometrically, counts are small integers
+TIME_BUCKETS = [round(0.05 * 1.25 ** i, 3) for i in range(70)]  # 0.05ms ... ~300s
+COUNT_BUCKETS = [0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50, 75, 100, 250, 500, 1000]
+
+# The handler invocation currently running, shared with the database threads it uses
+_current = contextvars.ContextVar("metrics_invocation", default=None)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram: constant memory, cheap to update, good enough for percentiles.
+
+    Attributes:
+        count (int): Number of recorded values.
+        total (float): Sum of the recorded values.
+        max (float): Largest recorded value.
+    """
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given percentile (e.g. 0.99), capped at the max."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(bound, self.max)
+        return self.max
+
+
+class HandlerStats:
+    """Histograms of one event handler or slash command."""
+    def __init__(self):
+        self.wall_ms = Histogram(TIME_BUCKETS)
+        self.db_ms = Histogram(TIME_BUCKETS)
+        self.rest_ms = Histogram(TIME_BUCKETS)
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.rest = Histogram(COUNT_BUCKETS)
+        self.errors = 0
+
+    @property
+    def calls(self):
+        return self.wall_ms.count
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": self.wall_ms.percentile(0.5),
+            "p99_ms": self.wall_ms.percentile(0.99),
+            "max_ms": self.wall_ms.max,
+            "total_ms": self.wall_ms.total,
+            "db_ms": self.db_ms.mean,
+            "queries": self.queries.mean,
+            "rest_ms": self.rest_ms.mean,
+            "rest": self.rest.mean,
+        }
+
+
+class Invocation:
+    """What a single handler invocation spent, filled in from the event loop and the database threads."""
+    def __init__(self, name):
+        self.name = name
+        self.failed = False
+        self.db_time = 0.0
+        self.queries = 0
+        self.rest_time = 0.0
+        self.rest = 0
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds, statements=1):
+        with self._lock:
+            self.db_time += seconds
+            self.queries += statements
+
+    def add_rest(self, seconds):
+        self.rest_time += seconds
+        self.rest += 1
+
+
+class Metrics:
+    """
+    In-process registry of per-handler histograms: wall time, time spent in the database,
+    number of queries, and Discord REST calls (count and time) of every invocation.
+    """
+    def __init__(self):
+        self.handlers = {}
+        self.started = time.time()
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Measures the block as one invocation of `name`. Queries and REST calls made inside it, even from
+        other tasks or threads started in it, are charged to this invocation.
+
+        Yields:
+            Invocation: The running invocation; `name` and `failed` may be updated inside the block.
+        """
+        invocation = Invocation(name)
+        token = _current.set(invocation)
+        start = time.perf_counter()
+        try:
+            yield invocation
+        except BaseException:
+            invocation.failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            self._record(invocation, elapsed)
+
+    def _record(self, invocation, elapsed):
+        stats = self.handlers.get(invocation.name)
+        if stats is None:
+            stats = self.handlers[invocation.name] = HandlerStats()
+        stats.wall_ms.record(elapsed * 1000)
+        stats.db_ms.record(invocation.db_time * 1000)
+        stats.queries.record(invocation.queries)
+        stats.rest_ms.record(invocation.rest_time * 1000)
+        stats.rest.record(invocation.rest)
+        if invocation.failed:
+            stats.errors += 1
+
+    def instrument(self, name=None):
+        """
+        Decorator measuring every call of a coroutine function, e.g. an event handler.
+
+        Args:
+            name (str, optional): Name to record the calls under, defaults to the function's name.
+        """
+        def decorator(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.measure(label):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    def summary(self, limit=None):
+        """
+        Returns:
+            list: `(name, summary)` pairs, the handlers that took the most total time first.
+        """
+        rows = sorted(((name, stats.summary()) for name, stats in self.handlers.items()),
+                      key=lambda row: row[1]["total_ms"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self):
+        self.handlers = {}
+        self.started = time.time()
+
+
+metrics = Metrics()
+
+
+def record_query(seconds, statements=1):
+    """Charges database time (and statements) to the running invocation, if any. Thread-safe."""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.add_query(seconds, statements)
+
+
+def spawn(coro):
+    """
+    Starts a background task that isn't charged to the running invocation: its work isn't the handler's
+    (a worker shared by several handlers, a periodic flush...) and it may outlive the invocation.
+    """
+    context = contextvars.copy_context()
+    context.run(_current.set, None)
+    return context.run(asyncio.ensure_future, coro)
+
+
+def rest_trace():
+    """
+    Returns an aiohttp trace config, for the `http_trace` option of the client, that charges every
+    Discord REST request (each attempt, when one is retried) to the running invocation.
+    """
+    async def on_request_start(session, context, params):
+        context.invocation = _current.get()
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        if context.invocation is not None:
+            context.invocation.add_rest(time.perf_counter() - context.start)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_end)
+    return trace
+
+
+class MeteredCursor:
+    """Cursor proxy that charges the time of every statement to the running invocation."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        # One batch counts as one statement, like the single round-trip it usually is
+        return self._timed(self._cursor.executemany, *args, **kwargs)
+
+    @staticmethod
+    def _timed(method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record_query(time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """
+    Command tree that measures every slash command (and autocomplete) as an invocation of `/<command>`.
+
+    The tree runs each interaction in a task of its own and checks it with `interaction_check` first:
+    the invocation starts there, so everything the command does is charged to it, and it's recorded
+    when the task ends.
+    """
+    async def interaction_check(self, interaction, /):
+        data = interaction.data or {}
+        invocation = Invocation(f"/{data.get('name', '?')}")
+        start = time.perf_counter()
+        _current.set(invocation)
+
+        def finish(task):
+            command = interaction.command
+            if command is not None:
+                invocation.name = f"/{command.qualified_name}"
+            if interaction.type is InteractionType.autocomplete:
+                invocation.name += " (autocomplete)"
+            invocation.failed = invocation.failed or interaction.command_failed or task.cancelled()
+            metrics._record(invocation, time.perf_counter() - start)
+
+        asyncio.current_task().add_done_callback(finish)
+        return True
+
+    async def on_error(self, interaction, error, /):
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.failed = True
+        await super().on_error(interaction, error)
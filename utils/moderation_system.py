@@ -5,6 +5,9 @@ from datetime import datetime
 
 from utils.database import BaseDatabase
 
+# Maximum number of bans deleted by a single statement
+DELETE_BATCH_SIZE = 200
+
 
 class ModerationSystem(BaseDatabase):
     """
@@ -15,11 +18,11 @@ class ModerationSystem(BaseDatabase):
     the next unban, and deleting expired bans.
 
     Attributes:
-        conn (mysql.connector.connection.MySQLConnection): The MySQL database connection object.
+        pool (ConnectionPool): The shared pool of MySQL connections.
     """
     def __init__(self, host, user, password, database):
         """
-        Initializes the ModerationSystem instance and establishes a connection to the MySQL database.
+        Initializes the ModerationSystem instance on top of the shared MySQL connection pool.
 
         Args:
             host (str): The hostname or IP address of the MySQL server.
@@ -45,8 +48,7 @@ class ModerationSystem(BaseDatabase):
         Returns:
             None
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
+        self.execute("""
                     CREATE TABLE IF NOT EXISTS banned(
                         user_id BIGINT,
                         guild_id BIGINT,
@@ -54,8 +56,7 @@ class ModerationSystem(BaseDatabase):
                         unban_time DATETIME,
                         PRIMARY KEY(user_id, guild_id)
                     )
-                       """)
-        cursor.close()
+                       """, idempotent=True)
 
     def tempban(self, user_id, guild_id, reason, unban_time):
         """
@@ -70,13 +71,10 @@ class ModerationSystem(BaseDatabase):
         Returns:
             None
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
+        self.execute("""
                     REPLACE INTO banned (user_id, guild_id, reason, unban_time)
                     VALUES(%s, %s, %s, %s)
-                       """, (user_id, guild_id, reason, unban_time))
-        self.conn.commit()
-        cursor.close()
+                       """, (user_id, guild_id, reason, unban_time), idempotent=True)
 
     def fetch_next_unban(self):
         """
@@ -88,11 +86,7 @@ class ModerationSystem(BaseDatabase):
             tuple: A tuple containing the user ID, guild ID, and unban time of the next user to be unbanned,
                    or `None` if no user is found.
         """
-        cursor = self.get_cursor()
-        cursor.execute("SELECT user_id, guild_id, unban_time FROM banned ORDER BY unban_time ASC LIMIT 1")
-        row = cursor.fetchone()
-        cursor.close()
-        return row
+        return self.fetchone("SELECT user_id, guild_id, unban_time FROM banned ORDER BY unban_time ASC LIMIT 1")
 
     def fetch_expired_bans(self):
         """
@@ -103,26 +97,38 @@ class ModerationSystem(BaseDatabase):
         Returns:
             list: A list of tuples, each containing the user ID and guild ID of a user whose ban has expired.
         """
-        cursor = self.get_cursor()
-        cursor.execute("SELECT user_id, guild_id FROM banned WHERE unban_time <= %s", (datetime.utcnow(),))
-        rows = cursor.fetchall()
-        cursor.close()
+        return self.fetchall("SELECT user_id, guild_id FROM banned WHERE unban_time <= %s", (datetime.utcnow(),))
+
+    def fetch_all_bans(self):
+        """
+        Fetches every pending temporary ban, used to fill the unban scheduler at startup.
 
-        return rows
+        Returns:
+            list: A list of tuples, each containing the user ID, guild ID, and unban time of a temporary ban.
+        """
+        return self.fetchall("SELECT user_id, guild_id, unban_time FROM banned")
 
-    def delete_expired_bans(self):
+    def delete_bans(self, bans):
         """
-        Deletes all expired bans from the `banned` table.
+        Deletes the given temporary bans once the users have been unbanned, with one statement per batch.
 
-        This method removes entries from the table where the `unban_time` is less than or equal to the current time.
+        A row is only deleted if its `unban_time` is not later than the given one, so a user who was
+        banned again in the meantime keeps the new ban.
+
+        Args:
+            bans (list): Tuples of `(user_id, guild_id, unban_time)`.
 
         Returns:
-            None
+            int: The number of rows deleted.
         """
-        cursor = self.get_cursor()
-        cursor.execute("DELETE FROM banned WHERE unban_time <= %s", (datetime.utcnow(),))
-        self.conn.commit()
-        cursor.close()
+        deleted = 0
+        for start in range(0, len(bans), DELETE_BATCH_SIZE):
+            batch = bans[start:start + DELETE_BATCH_SIZE]
+            conditions = " OR ".join(["(user_id = %s AND guild_id = %s AND unban_time <= %s)"] * len(batch))
+            params = tuple(value for ban in batch for value in ban)
+
+            deleted += self.execute(f"DELETE FROM banned WHERE {conditions}", params, idempotent=True)
+        return deleted
 
     def pardon(self, user_id, guild_id):
         """
@@ -136,11 +142,6 @@ class ModerationSystem(BaseDatabase):
             bool: `True` if the user was successfully pardoned (removed from the `banned` table), 
                   `False` if no ban was found for the user in the specified guild.
         """
-        cursor = self.get_cursor()
-        cursor.execute("DELETE FROM banned WHERE user_id=%s AND guild_id=%s", (user_id, guild_id))
-        self.conn.commit()
-        
-        removed = cursor.rowcount > 0
+        removed = self.execute("DELETE FROM banned WHERE user_id=%s AND guild_id=%s", (user_id, guild_id)) > 0
 
-        cursor.close()
         return removed
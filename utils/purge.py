@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Discord only bulk-deletes messages younger than 14 days, at most 100 per request
+BULK_MAX_AGE = timedelta(days=14, minutes=-5)
+BULK_SIZE = 100
+
+
+class Purger:
+    """
+    Deletes messages from a channel with as few REST calls as possible.
+
+    The history is streamed (never loaded as a whole) and filtered on the fly. Messages younger than
+    14 days are deleted with bulk-delete requests of 100 messages, older ones, which Discord can't
+    bulk-delete, one by one by a few concurrent workers; discord.py waits out the rate limits for them.
+
+    Attributes:
+        channel (discord.TextChannel): The channel to delete the messages from.
+        check (Callable): Predicate selecting the messages to delete, all of them if `None`.
+        concurrency (int): Number of single deletes running at the same time.
+        on_progress (Callable): Coroutine function called with the purger at most every `progress_interval` seconds.
+        progress_interval (float): Minimum number of seconds between two progress reports.
+        scanned (int): Messages read from the history so far.
+        deleted (int): Messages deleted so far.
+        failed (int): Messages that couldn't be deleted.
+    """
+    def __init__(self, channel, check=None, concurrency=3, on_progress=None, progress_interval=2):
+        self.channel = channel
+        self.check = check
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+
+        self.scanned = 0
+        self.deleted = 0
+        self.failed = 0
+        self._last_progress = 0
+
+    async def run(self, limit=None, before=None):
+        """
+        Deletes the matching messages among the last `limit` messages of the channel.
+
+        Args:
+            limit (int, optional): Number of messages to scan, the whole history if `None`.
+            before (discord.abc.Snowflake, optional): Only scan the messages sent before this one,
+                e.g. the interaction, so its own response is never deleted.
+
+        Returns:
+            int: The number of messages deleted.
+        """
+        bulk_cutoff = datetime.now(timezone.utc) - BULK_MAX_AGE
+        self._last_progress = time.monotonic()
+        batch = []
+        old = asyncio.Queue(maxsize=BULK_SIZE)
+        workers = []
+
+        try:
+            async for message in self.channel.history(limit=limit, before=before):
+                self.scanned += 1
+                if self.check is not None and not self.check(message):
+                    continue
+
+                if message.created_at > bulk_cutoff:
+                    batch.append(message)
+                    if len(batch) == BULK_SIZE:
+                        await self._bulk_delete(batch)
+                        batch = []
+                else:
+                    # The history goes backwards: from here on every message is too old to bulk-delete
+                    if not workers:
+                        workers = [asyncio.ensure_future(self._delete_worker(old)) for _ in range(self.concurrency)]
+                    await old.put(message)
+
+                await self._report()
+
+            if batch:
+                await self._bulk_delete(batch)
+            if workers:
+                await old.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        return self.deleted
+
+    async def _bulk_delete(self, messages):
+        try:
+            # A single message is deleted with a normal request by discord.py
+            await self.channel.delete_messages(messages)
+            self.deleted += len(messages)
+        except discord.HTTPException as e:
+            logger.warning(f"Bulk delete of {len(messages)} messages failed, deleting them one by one: {e}")
+            for message in messages:
+                await self._delete(message)
+
+    async def _delete_worker(self, queue):
+        while True:
+            message = await queue.get()
+            try:
+                await self._delete(message)
+                await self._report()
+            finally:
+                queue.task_done()
+
+    async def _delete(self, message):
+        try:
+            await message.delete()
+            self.deleted += 1
+        except discord.NotFound:
+            # Already gone, nothing left to do
+            pass
+        except discord.HTTPException as e:
+            logger.error(f"Failed to delete message {message.id}: {e}")
+            self.failed += 1
+
+    async def _report(self):
+        now = time.monotonic()
+        if self.on_progress is None or now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        try:
+            await self.on_progress(self)
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to report the purge progress: {e}")
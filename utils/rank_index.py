@@ -0,0 +1,235 @@
+import asyncio
+import bisect
+import os
+
+from utils.debug import Logger
+from utils.level_system import MAX_LEVEL, LevelSystem
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+
+class _Fenwick:
+    """Binary indexed tree counting the users on each level: prefix counts and k-th lookups in O(log n)."""
+    def __init__(self, size=128):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, level, amount):
+        if level < 0:
+            # Index 0 would never move forward in the update loop below
+            raise ValueError(f"Negative level: {level}")
+        if level >= self.size:
+            self._grow(level)
+        i = level + 1
+        while i <= self.size:
+            self.tree[i] += amount
+            i += i & -i
+
+    def prefix(self, level):
+        """Number of users with a level <= `level`."""
+        i = min(level + 1, self.size)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k):
+        """Returns the level of the k-th user (1-based) in ascending order."""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] < k:
+                position = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return position
+
+    def _grow(self, level):
+        counts = [self.prefix(i) - self.prefix(i - 1) if i else self.prefix(0) for i in range(self.size)]
+        size = self.size
+        while size <= level:
+            size *= 2
+        self.size = size
+        self.tree = [0] * (size + 1)
+        for i, count in enumerate(counts):
+            if count:
+                self.add(i, count)
+
+
+def _bucket(level):
+    """The counter a level is kept in: levels are clamped to `0..MAX_LEVEL`."""
+    return min(max(level, 0), MAX_LEVEL)
+
+
+class GuildRanking:
+    """
+    Order-statistic index of a guild's members by level, then XP.
+
+    A Fenwick tree counts the users on each level, and every level keeps its users sorted by XP, so
+    the rank of a user and the users at any position are found in O(log n), and updated in O(log n)
+    plus a small shift within the user's level.
+
+    Users with the same level and XP share the same rank. Levels outside `0..MAX_LEVEL` (e.g. a
+    negative level left by an admin command) share the counter of the nearest bound, and are still
+    ordered by their real level within it.
+    """
+    def __init__(self):
+        self._users = {}  # user_id -> (level, xp)
+        self._levels = {}  # level -> sorted list of (-level, -xp, user_id)
+        self._level_keys = []  # levels with at least one user, ascending
+        self._counts = _Fenwick()
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, user_id):
+        return user_id in self._users
+
+    def set(self, user_id, level, xp):
+        """Adds or moves a user."""
+        current = self._users.get(user_id)
+        if current == (level, xp):
+            return
+        if current is not None:
+            self._discard(user_id, *current)
+
+        self._users[user_id] = (level, xp)
+        bucket = _bucket(level)
+        entries = self._levels.get(bucket)
+        if entries is None:
+            entries = self._levels[bucket] = []
+            bisect.insort(self._level_keys, bucket)
+        bisect.insort(entries, (-level, -xp, user_id))
+        self._counts.add(bucket, 1)
+
+    def remove(self, user_id):
+        current = self._users.pop(user_id, None)
+        if current is not None:
+            self._discard(user_id, *current)
+
+    def _discard(self, user_id, level, xp):
+        bucket = _bucket(level)
+        entries = self._levels[bucket]
+        del entries[bisect.bisect_left(entries, (-level, -xp, user_id))]
+        if not entries:
+            del self._levels[bucket]
+            del self._level_keys[bisect.bisect_left(self._level_keys, bucket)]
+        self._counts.add(bucket, -1)
+
+    def rank(self, user_id):
+        """
+        Returns:
+            int: The position of the user in the guild (1 is the top), or `None` if the user has no XP.
+        """
+        current = self._users.get(user_id)
+        if current is None:
+            return None
+        level, xp = current
+        bucket = _bucket(level)
+        higher_levels = len(self._users) - self._counts.prefix(bucket)
+        # Entries are (-level, -xp, user_id): everything before (-level, -xp) is ahead in the bucket
+        ahead = bisect.bisect_left(self._levels[bucket], (-level, -xp))
+        return higher_levels + ahead + 1
+
+    def page(self, offset, limit):
+        """
+        Returns the users from position `offset + 1` on, top first.
+
+        Returns:
+            list: Up to `limit` tuples of `(rank, user_id, level, xp)`.
+        """
+        if offset >= len(self._users) or limit <= 0:
+            return []
+
+        # The (offset + 1)-th from the top is the (n - offset)-th from the bottom
+        level = self._counts.find(len(self._users) - offset)
+        index = offset - (len(self._users) - self._counts.prefix(level))
+        level_index = bisect.bisect_left(self._level_keys, level)
+
+        rows = []
+        while len(rows) < limit and level_index >= 0:
+            entries = self._levels[self._level_keys[level_index]]
+            while index < len(entries) and len(rows) < limit:
+                user_id = entries[index][2]
+                user_level, xp = self._users[user_id]
+                rows.append((self.rank(user_id), user_id, user_level, xp))
+                index += 1
+            level_index -= 1
+            index = 0
+        return rows
+
+
+class RankIndex:
+    """
+    Per-guild `GuildRanking`s, each loaded from the database the first time the guild is asked for
+    (through the `(guild_id, level, xp)` index) and then kept in sync by the XP writes.
+
+    Attributes:
+        level_system (LevelSystem): The level system the rankings are loaded from.
+    """
+    def __init__(self, level_system: LevelSystem):
+        self.level_system = level_system
+        self._guilds = {}
+        self._loading = {}
+        # Changes that arrived while their guild was being loaded, replayed once the rows are in
+        self._pending = {}
+
+    def get(self, guild_id):
+        """Returns the ranking of a guild if it's loaded, `None` otherwise."""
+        return self._guilds.get(guild_id)
+
+    async def load(self, guild_id):
+        """
+        Returns the ranking of a guild, loading it first if needed. Concurrent calls share one query.
+
+        Returns:
+            GuildRanking: The ranking of the guild.
+        """
+        ranking = self._guilds.get(guild_id)
+        if ranking is not None:
+            return ranking
+
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, guild_id):
+        self._pending[guild_id] = []
+        try:
+            rows = await self.level_system.aio.get_guild_users(guild_id)
+            ranking = GuildRanking()
+            for user_id, level, xp in rows:
+                ranking.set(user_id, level, xp)
+            for user_id, state in self._pending[guild_id]:
+                if state is None:
+                    ranking.remove(user_id)
+                else:
+                    ranking.set(user_id, *state)
+        finally:
+            del self._pending[guild_id]
+
+        self._guilds[guild_id] = ranking
+        logger.info(f"Loaded the ranking of guild {guild_id}: {len(ranking)} users")
+        return ranking
+
+    def update(self, user_id, guild_id, xp, level):
+        """Moves a user after their XP or level changed; guilds not loaded yet are left alone."""
+        ranking = self._guilds.get(guild_id)
+        if ranking is not None:
+            ranking.set(user_id, level, xp)
+        elif guild_id in self._pending:
+            self._pending[guild_id].append((user_id, (level, xp)))
+
+    def remove(self, user_id, guild_id):
+        """Drops a user whose level data was deleted."""
+        ranking = self._guilds.get(guild_id)
+        if ranking is not None:
+            ranking.remove(user_id)
+        elif guild_id in self._pending:
+            self._pending[guild_id].append((user_id, None))
@@ -0,0 +1,115 @@
+import math
+
+# Glicko-2 parameters (http://www.glicko.net/glicko/glicko2.pdf)
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+DEFAULT_VOLATILITY = 0.06
+# Constrains the change of volatility: lower values keep ratings steadier
+TAU = 0.5
+SCALE = 173.7178
+EPSILON = 0.000001
+
+DEFAULT = (DEFAULT_RATING, DEFAULT_RD, DEFAULT_VOLATILITY)
+
+
+def _g(phi):
+    return 1 / math.sqrt(1 + 3 * phi * phi / (math.pi * math.pi))
+
+
+def _volatility(phi, sigma, delta, v):
+    # Step 5 of the paper: solve for the new volatility with the Illinois algorithm
+    a = math.log(sigma * sigma)
+    delta2 = delta * delta
+    phi2 = phi * phi
+
+    def f(x):
+        ex = math.exp(x)
+        return ex * (delta2 - phi2 - v - ex) / (2 * (phi2 + v + ex) ** 2) - (x - a) / (TAU * TAU)
+
+    A = a
+    if delta2 > phi2 + v:
+        B = math.log(delta2 - phi2 - v)
+    else:
+        k = 1
+        while f(a - k * TAU) < 0:
+            k += 1
+        B = a - k * TAU
+
+    fA, fB = f(A), f(B)
+    while abs(B - A) > EPSILON:
+        C = A + (A - B) * fA / (fB - fA)
+        fC = f(C)
+        if fC * fB <= 0:
+            A, fA = B, fB
+        else:
+            fA /= 2
+        B, fB = C, fC
+
+    return math.exp(A / 2)
+
+
+def rate(player, opponent, score):
+    """
+    Updates a player's rating after a single game, treated as its own rating period.
+
+    Args:
+        player (tuple): `(rating, rd, volatility)` of the player.
+        opponent (tuple): `(rating, rd, volatility)` of the opponent, before the game.
+        score (float): 1 for a win, 0.5 for a draw, 0 for a loss.
+
+    Returns:
+        tuple: The new `(rating, rd, volatility)` of the player.
+    """
+    rating, rd, sigma = player
+    mu, phi = (rating - DEFAULT_RATING) / SCALE, rd / SCALE
+    mu_j, phi_j = (opponent[0] - DEFAULT_RATING) / SCALE, opponent[1] / SCALE
+
+    g = _g(phi_j)
+    expected = 1 / (1 + math.exp(-g * (mu - mu_j)))
+    v = 1 / (g * g * expected * (1 - expected))
+    delta = v * g * (score - expected)
+
+    sigma = _volatility(phi, sigma, delta, v)
+    phi_star = math.sqrt(phi * phi + sigma * sigma)
+    phi = 1 / math.sqrt(1 / (phi_star * phi_star) + 1 / v)
+    mu = mu + phi * phi * g * (score - expected)
+
+    return DEFAULT_RATING + SCALE * mu, min(SCALE * phi, DEFAULT_RD), sigma
+
+
+def rate_game(first, second, first_score):
+    """
+    Rates both players of a game at once, each against the other's rating before the game.
+
+    Returns:
+        tuple: The new ratings of the first and second player.
+    """
+    return rate(first, second, first_score), rate(second, first, 1 - first_score)
+
+
+def replay(games, ratings=None):
+    """
+    Replays a list of games from scratch, in order, keeping everything in memory.
+
+    A plain loop on purpose: each game needs both players' ratings after their previous games, and
+    without numpy (not a dependency of the bot) batching the independent games only adds bookkeeping.
+    20k games replay in about a quarter of a second.
+
+    Args:
+        games (list): `(match_id, first_id, second_id, first_score)` tuples, oldest first.
+        ratings (dict, optional): Starting ratings by user ID, everybody starts at the default otherwise.
+
+    Returns:
+        tuple: The final `{user_id: (rating, rd, volatility)}` and the history, a list of
+               `(match_id, user_id, rating, rd, volatility)` rows.
+    """
+    ratings = dict(ratings or {})
+    history = []
+
+    for match_id, first_id, second_id, first_score in games:
+        first, second = rate_game(ratings.get(first_id, DEFAULT), ratings.get(second_id, DEFAULT), first_score)
+        ratings[first_id], ratings[second_id] = first, second
+        history.append((match_id, first_id, *first))
+        history.append((match_id, second_id, *second))
+
+    return ratings, history
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+
+import discord
+
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Seconds an ID that came back 404/403 is answered with None without asking Discord again
+NEGATIVE_TTL = 60
+# Seconds a fetched message is reused: reactions come in bursts, the message rarely changes in between
+MESSAGE_TTL = 30
+# Entries kept in the negative/message cache before the oldest are dropped
+MAX_ENTRIES = 2048
+
+KINDS = ("guild", "channel", "role", "member", "message")
+
+
+class Resolver:
+    """
+    Cache-first lookup of Discord objects.
+
+    Every lookup tries the gateway cache of discord.py first (`get_channel`, `guild.get_role`...) and
+    only falls back to the REST API on a miss. On top of that:
+
+    - IDs that Discord answered with 404 or 403 are remembered for `NEGATIVE_TTL` seconds, so a
+      deleted role or channel isn't fetched again by every event that refers to it.
+    - Concurrent fetches of the same ID share one request (single-flight).
+    - Fetched messages, which the gateway cache only holds while they're recent, are kept for
+      `MESSAGE_TTL` seconds: a burst of reactions on an old message costs one `fetch_message`.
+
+    Every method returns `None` when the object doesn't exist or the bot can't see it; other HTTP
+    errors are raised and never cached.
+
+    Attributes:
+        bot (discord.Client): The client whose cache and HTTP session are used.
+    """
+    def __init__(self, bot: discord.Client):
+        self.bot = bot
+        # key -> (expiry, value), value is None for negative entries
+        self._cache = {}
+        self._inflight = {}
+        self._stats = {kind: dict.fromkeys(("hits", "cached", "shared", "fetches", "missing"), 0) for kind in KINDS}
+
+    async def guild(self, guild_id):
+        return await self._resolve(
+            "guild", ("guild", guild_id), self.bot.get_guild(guild_id),
+            lambda: self.bot.fetch_guild(guild_id)
+        )
+
+    async def channel(self, channel_id):
+        return await self._resolve(
+            "channel", ("channel", channel_id), self.bot.get_channel(channel_id),
+            lambda: self.bot.fetch_channel(channel_id)
+        )
+
+    async def role(self, guild: discord.Guild, role_id):
+        return await self._resolve(
+            "role", ("role", guild.id, role_id), guild.get_role(role_id),
+            lambda: guild.fetch_role(role_id)
+        )
+
+    async def member(self, guild: discord.Guild, user_id):
+        return await self._resolve(
+            "member", ("member", guild.id, user_id), guild.get_member(user_id),
+            lambda: guild.fetch_member(user_id)
+        )
+
+    async def message(self, channel, message_id):
+        cached = discord.utils.find(lambda m: m.id == message_id, reversed(self.bot.cached_messages))
+        return await self._resolve(
+            "message", ("message", channel.id, message_id), cached,
+            lambda: channel.fetch_message(message_id)
+        )
+
+    def forget_message(self, channel_id, message_id):
+        """Drops a message from the cache, e.g. after it was edited or deleted."""
+        self._cache.pop(("message", channel_id, message_id), None)
+
+    async def _resolve(self, kind, key, cached, fetch):
+        stats = self._stats[kind]
+        if cached is not None:
+            stats["hits"] += 1
+            return cached
+
+        entry = self._cache.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                stats["cached"] += 1
+                return entry[1]
+            del self._cache[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            stats["fetches"] += 1
+            task = asyncio.ensure_future(self._fetch(kind, key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            stats["shared"] += 1
+
+        # Shielded so a cancelled caller doesn't cancel the fetch shared with the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, kind, key, fetch):
+        try:
+            value = await fetch()
+        except (discord.NotFound, discord.Forbidden) as e:
+            self._stats[kind]["missing"] += 1
+            logger.warning(f"Could not resolve {kind} {key[-1]}: {e}")
+            self._store(key, None, NEGATIVE_TTL)
+            return None
+
+        if kind == "message":
+            self._store(key, value, MESSAGE_TTL)
+        return value
+
+    def _store(self, key, value, ttl):
+        now = time.monotonic()
+        if len(self._cache) >= MAX_ENTRIES:
+            self._cache = {k: entry for k, entry in self._cache.items() if entry[0] > now}
+            # Still full: drop the oldest half (dicts keep insertion order)
+            if len(self._cache) >= MAX_ENTRIES:
+                self._cache = dict(list(self._cache.items())[MAX_ENTRIES // 2:])
+        self._cache[key] = (now + ttl, value)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per kind of object, the lookups answered by the gateway cache (`hits`), by the
+                  resolver's own cache (`cached`), by a fetch already in flight (`shared`), the REST
+                  fetches made (`fetches`) and how many of them found nothing (`missing`).
+        """
+        return {kind: dict(stats) for kind, stats in self._stats.items()}
@@ -1,3 +1,5 @@
+import threading
+
 import mysql.connector
 
 from utils.database import BaseDatabase
@@ -10,12 +12,16 @@ class RoleSystem(BaseDatabase):
     This class handles communication with a MySQL database to manage self-roles messages within a specified Discord guild.
     It supports functionality such as creating a message, adding selectable roles to said message and edit the messages already created.
 
+    The `roles` table is mirrored in memory as a `message_id -> {emoji -> role_id}` index, loaded once at
+    startup and kept in sync by `add_role`, `remove_role` and `reset`, so reactions are resolved without
+    touching the database.
+
     Attributes:
-        conn (mysql.connector.connection.MySQLConnection): The MySQL database connection object.
+        pool (ConnectionPool): The shared pool of MySQL connections.
     """
     def __init__(self, host, user, password, database):
         """
-        Initializes the RoleSystem instance and establishes a connection to the MySQL database.
+        Initializes the RoleSystem instance on top of the shared MySQL connection pool.
 
         Args:
             host (str): The hostname or IP address of the MySQL server.
@@ -33,7 +39,11 @@ class RoleSystem(BaseDatabase):
             charset='utf8mb4',
             use_unicode = True
         )
+        self._index = {}
+        self._index_lock = threading.Lock()
+
         self.create_table()
+        self.load_index()
 
     def create_table(self):
         """
@@ -51,25 +61,42 @@ class RoleSystem(BaseDatabase):
         Returns:
             None
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS messages(
-                        message_id BIGINT,
-                        PRIMARY KEY(message_id)
-                    );
-                    
-                       """)
-        cursor.execute("""
-                   CREATE TABLE IF NOT EXISTS roles(
-                        role_id BIGINT,
-                        emoji VARCHAR(100),
-                        message BIGINT,
-                        PRIMARY KEY (role_id, message),
-                        FOREIGN KEY (message) REFERENCES messages(message_id)
-                    ) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin; 
-                     """)
-        cursor.close()
+        with self.cursor() as cursor:
+            cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS messages(
+                            message_id BIGINT,
+                            PRIMARY KEY(message_id)
+                        );
+                        
+                           """)
+            cursor.execute("""
+                       CREATE TABLE IF NOT EXISTS roles(
+                            role_id BIGINT,
+                            emoji VARCHAR(100),
+                            message BIGINT,
+                            PRIMARY KEY (role_id, message),
+                            FOREIGN KEY (message) REFERENCES messages(message_id)
+                        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin; 
+                         """)
     
+    def load_index(self):
+        """
+        (Re)loads the in-memory index of reaction roles from the `roles` table.
+        """
+        index = {}
+        for role_id, emoji, message_id in self.fetchall("SELECT role_id, emoji, message FROM roles"):
+            index.setdefault(int(message_id), {})[str(emoji)] = int(role_id)
+
+        # Swapped in one go, readers see either the old or the new index
+        with self._index_lock:
+            self._index = index
+
+    def is_role_message(self, message_id: int) -> bool:
+        """
+        Tells whether a message has any reaction role, without querying the database.
+        """
+        return int(message_id) in self._index
+
     def create_message(self, message_id: int):
         """
         Add a message in the `messages` table.
@@ -80,38 +107,33 @@ class RoleSystem(BaseDatabase):
         Returns:
             boolean: True for success, False for failure
         """
-        cursor = self.get_cursor()
-        cursor.execute("INSERT INTO messages(message_id) VALUES(%s)", (message_id,))
-        self.conn.commit()
-        cursor.close()
+        self.execute("INSERT INTO messages(message_id) VALUES(%s)", (message_id,))
 
     def reset(self):
         """
         Reset `roles` table
         """
-        cursor = self.get_cursor()
-        cursor.execute("DELETE FROM roles")
-        self.conn.commit()
-        cursor.close()
+        self.execute("DELETE FROM roles", idempotent=True)
+
+        with self._index_lock:
+            self._index = {}
 
     def get_role(self, message_id: int, emoji: str) -> int:
         """
-        Returns a role based on a message id
+        Returns a role based on a message id, looked up in the in-memory index.
+        Safe to call from the event loop: it never touches the database.
 
         Args:
             message_id (int): Unique ID of message.
-            emoji (int): Emoji of wanted role.
+            emoji (int): Emoji of wanted role (unicode name or custom emoji ID).
     
         Returns:
-            int: Role id
+            int: Role id, or `None` if the message/emoji pair has no role
         """
-
-        print(f"Getting: {emoji}")
-        cursor = self.get_cursor(buffered = True)
-        cursor.execute("SELECT role_id FROM roles WHERE message=%s AND BINARY emoji=%s", (message_id, emoji))
-
-        result = cursor.fetchone()
-        return result
+        roles = self._index.get(int(message_id))
+        if roles is None:
+            return None
+        return roles.get(str(emoji))
     
     def add_role(self, message_id: int, role_id: int, emoji: int):
         """
@@ -122,13 +144,15 @@ class RoleSystem(BaseDatabase):
             role_id (int): Unique ID of the role.
             emoji (int): Emoji that identifies the role.
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
+        self.execute("""
                         INSERT INTO roles(role_id, emoji, message)
                         VALUES (%s, %s, %s)
                        """, (role_id, emoji, message_id))
-        self.conn.commit()
-        cursor.close()
+
+        with self._index_lock:
+            roles = dict(self._index.get(int(message_id), {}))
+            roles[str(emoji)] = int(role_id)
+            self._index = {**self._index, int(message_id): roles}
 
     def get_emoji(self, message_id: int, role_id: int) -> str:
         """
@@ -141,15 +165,10 @@ class RoleSystem(BaseDatabase):
         Returns:
             str: Emoji ID
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
-                    SELECT emoji FROM roles
-                    WHERE message=%s AND role_id=%s
-        """, (message_id, role_id))
-
-        result = cursor.fetchone()
-        cursor.close()
-        return result[0] if result else None
+        for emoji, role in self._index.get(int(message_id), {}).items():
+            if role == int(role_id):
+                return emoji
+        return None
     
     def remove_role(self, message_id: int, role_id: int):
         """
@@ -159,10 +178,16 @@ class RoleSystem(BaseDatabase):
             message_id (int): Unique ID of message.
             role_id (int): Unique ID of the role.
         """
-        cursor = self.get_cursor()
-        cursor.execute("""
+        self.execute("""
                         DELETE FROM roles
                         WHERE message=%s AND role_id=%s
-                       """, (message_id, role_id))
-        self.conn.commit()
-        cursor.close()
+                       """, (message_id, role_id), idempotent=True)
+
+        with self._index_lock:
+            roles = {emoji: role for emoji, role in self._index.get(int(message_id), {}).items() if role != int(role_id)}
+            index = dict(self._index)
+            if roles:
+                index[int(message_id)] = roles
+            else:
+                index.pop(int(message_id), None)
+            self._index = index
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+import discord
+
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Discord lets a bot send 5 messages every 5 seconds per channel: more in flight would only queue up
+SEND_CONCURRENCY = 5
+
+
+async def send_all(channel, messages, concurrency=SEND_CONCURRENCY):
+    """
+    Sends many messages to a channel concurrently.
+
+    At most `concurrency` requests are in flight at once; discord.py follows the rate limit headers
+    and waits out 429s, so a burst never turns into failed requests. Messages may show up slightly out
+    of order.
+
+    Args:
+        channel (discord.abc.Messageable): The channel to send the messages to.
+        messages (list): Keyword arguments of `channel.send` (content, embed, view...), one dict per message.
+        concurrency (int, optional): Maximum number of messages being sent at the same time.
+
+    Returns:
+        list: The ID of each posted message in the same order as `messages`, `None` where sending failed.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(kwargs):
+        async with semaphore:
+            try:
+                message = await channel.send(**kwargs)
+                return message.id
+            except discord.HTTPException as e:
+                logger.error(f"Failed to send a message to channel {channel.id}: {e}")
+                return None
+
+    message_ids = await asyncio.gather(*(send(kwargs) for kwargs in messages))
+    logger.info(f"Sent {sum(1 for m in message_ids if m is not None)}/{len(messages)} messages to channel {channel.id}")
+    return message_ids
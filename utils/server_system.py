@@ -1,4 +1,5 @@
 import mysql.connector
+from mysql.connector import errorcode
 
 from utils.database import BaseDatabase
 
@@ -6,209 +7,163 @@ from utils.database import BaseDatabase
 class ServerSystem(BaseDatabase):
     def __init__(self, host, user, password, database):
         super().__init__(host, user, password, database)
-        
+
         self.create_table()
 
     def create_table(self):
-        cursor = self.get_cursor()
-        cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS channels(
-                            guild_id BIGINT,
-                            channel_id BIGINT,
-                            description varchar(100),
-                            PRIMARY KEY(guild_id, channel_id))
-                       """)
-        cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS descriptions(
-                            guild_id BIGINT,
-                            description TEXT,
-                            PRIMARY KEY(guild_id))
-                        """)
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS onjoin(
-                role_id BIGINT,
-                guild_id BIGINT,
-                PRIMARY KEY(role_id, guild_id))
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS level_roles(
-                guild_id BIGINT,
-                role_id BIGINT,
-                level INT,
-                PRIMARY KEY(guild_id, role_id))
-            """
-        )
-        cursor.close()
-
-    def add_channel(self, guild_id, channel_id, description = ""):
-        cursor = self.get_cursor(buffered = True)
-        
-        cursor.execute(
-            """
-            SELECT guild_id FROM channels WHERE guild_id = %s AND description = %s
-            """, (guild_id, description)
-        )
-
-        result = cursor.fetchone()
-
-        if result:
+        with self.cursor() as cursor:
             cursor.execute("""
-                UPDATE channels SET channel_id = %s WHERE guild_id = %s AND description = %s
-            """, (channel_id, guild_id, description))
-        else:
+                            CREATE TABLE IF NOT EXISTS channels(
+                                guild_id BIGINT,
+                                channel_id BIGINT,
+                                description varchar(100),
+                                PRIMARY KEY(guild_id, description))
+                           """)
             cursor.execute("""
-                            INSERT INTO channels VALUES(%s, %s, %s)
-                        """, (guild_id, channel_id, description))
-        self.conn.commit()
-        cursor.close()
-
-    def set_description(self, guild_id, description):
-        cursor = self.get_cursor()
-        cursor.execute("""
-            SELECT guild_id FROM descriptions WHERE guild_id = %s
-        """, (guild_id, ))
-
-        result = cursor.fetchone()
-
-        if result:
+                            CREATE TABLE IF NOT EXISTS descriptions(
+                                guild_id BIGINT,
+                                description TEXT,
+                                PRIMARY KEY(guild_id))
+                            """)
             cursor.execute(
                 """
-                UPDATE descriptions SET description = %s WHERE guild_id = %s
-                """, (description, guild_id)
+                CREATE TABLE IF NOT EXISTS onjoin(
+                    role_id BIGINT,
+                    guild_id BIGINT,
+                    PRIMARY KEY(guild_id))
+                """
             )
-        else:
             cursor.execute(
                 """
-                INSERT INTO descriptions VALUES(%s, %s)
-                """, (guild_id, description)
+                CREATE TABLE IF NOT EXISTS level_roles(
+                    guild_id BIGINT,
+                    role_id BIGINT,
+                    level INT,
+                    PRIMARY KEY(guild_id, role_id))
+                """
             )
 
-        self.conn.commit()
-        cursor.close()
+            # Tables created before the upserts were keyed by (guild_id, channel_id) and (role_id, guild_id).
+            # Of the rows sharing a new key, the one the bot already reads is kept: the config cache maps
+            # each description to the last channel listed (the highest ID), get_role returns the first role
+            self._migrate_primary_key(cursor, "channels", ["guild_id", "description"], "a.channel_id < b.channel_id")
+            self._migrate_primary_key(cursor, "onjoin", ["guild_id"], "a.role_id > b.role_id")
+
+    @staticmethod
+    def _migrate_primary_key(cursor, table, columns, dropped):
+        """
+        Re-keys `table` on `columns` if it still has another primary key, dropping first the rows that
+        the new key would make duplicates (`dropped` picks them out of each pair `a`, `b`). Runs once:
+        afterwards the key matches and only the check is left.
+        """
+        cursor.execute(
+            """
+            SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'
+            ORDER BY ORDINAL_POSITION
+            """, (table,)
+        )
+        if [row[0] for row in cursor.fetchall()] == columns:
+            return
+
+        same_key = " AND ".join(f"a.{column} = b.{column}" for column in columns)
+        cursor.execute(f"DELETE a FROM {table} a JOIN {table} b ON {same_key} AND {dropped}")
+        try:
+            cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY({', '.join(columns)})")
+        except mysql.connector.Error as e:
+            # A row written by another instance between the two statements: retried at the next start
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+
+    def add_channel(self, guild_id, channel_id, description = ""):
+        self.execute(
+            """
+            INSERT INTO channels VALUES(%s, %s, %s)
+            ON DUPLICATE KEY UPDATE channel_id = VALUES(channel_id)
+            """, (guild_id, channel_id, description), idempotent=True
+        )
+
+    def set_description(self, guild_id, description):
+        self.execute(
+            """
+            INSERT INTO descriptions VALUES(%s, %s)
+            ON DUPLICATE KEY UPDATE description = VALUES(description)
+            """, (guild_id, description), idempotent=True
+        )
 
     def get_description(self, guild_id):
-        cursor = self.get_cursor(buffered=True)
-        cursor.execute(
+        row = self.fetchone(
             """
             SELECT description
             FROM descriptions
             WHERE guild_id = %s
             """, (guild_id,)
         )
-        row = cursor.fetchone()
 
         # If the server doesn't have a description in the DB yet
         if not row:
             default_text = "Benvenuto %u!\nTi diamo il benvenuto nel nostro magnifico server.\nSpero tu ti possa trovare a tuo agio."
             # Use self. to call the class method properly
             self.set_description(guild_id, default_text)
-            cursor.close()
             return default_text
 
-        cursor.close()
         return row[0]  # Safely return the string out of the tuple
 
     def get_level_channel(self, guild_id):
-        cursor = self.get_cursor(buffered = True)
-        cursor.execute("""
+        return self.fetchone("""
                         SELECT channel_id FROM channels WHERE guild_id = %s AND description="level"
                        """, (guild_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        return result
 
     def get_announce_channel(self, guild_id):
-        cursor = self.get_cursor(buffered = True)
-        cursor.execute("""
+        result = self.fetchone("""
                         SELECT channel_id FROM channels WHERE guild_id = %s AND description="announce"
                        """, (guild_id,))
-        result = cursor.fetchone()
-        cursor.close()
         return result[0] if result else None
 
     def get_channels(self, guild_id):
-        cursor = self.get_cursor()
         # Make sure you are selecting BOTH the channel_id and the description column
-        cursor.execute("""
+        # fetchall() automatically returns a list of tuples: [(id1, desc1), (id2, desc2)]
+        return self.fetchall("""
                        SELECT channel_id, description
                        FROM channels
                        WHERE guild_id = %s
                        """, (guild_id,))
 
-        results = cursor.fetchall()
-        cursor.close()
-
-        # fetchall() automatically returns a list of tuples: [(id1, desc1), (id2, desc2)]
-        return results
-
     def set_role(self, guild_id, role_id):
-        cursor = self.get_cursor(buffered = True)
-        cursor.execute(
+        self.execute(
             """
-            SELECT guild_id FROM onjoin WHERE guild_id = %s AND role_id = %s
-            """, (guild_id, role_id)
+            INSERT INTO onjoin VALUES(%s, %s)
+            ON DUPLICATE KEY UPDATE role_id = VALUES(role_id)
+            """, (role_id, guild_id), idempotent=True
         )
 
-        result = cursor.fetchone()
-
-        if result:
-            cursor.execute(
-                """
-                UPDATE onjoin SET role_id = %s WHERE guild_id = %s
-                """, (role_id, guild_id)
-            )
-        else:
-            cursor.execute(
-                """
-                INSERT INTO onjoin VALUES(%s, %s)
-                """, (role_id, guild_id)
-            )
-        self.conn.commit()
-        cursor.close()
-
     def get_role(self, guild_id):
-        cursor = self.get_cursor(buffered = True)
-        cursor.execute("""
+        return self.fetchone("""
                         SELECT role_id FROM onjoin WHERE guild_id = %s
                        """, (guild_id,))
-        result = cursor.fetchone()
-        return result
-    
+
     def add_role(self, guild_id, role_id, level):
-        cursor = self.get_cursor(buffered = True)
-        cursor.execute(
+        self.execute(
             """
-            SELECT role_id FROM level_roles WHERE guild_id = %s AND role_id = %s
-            """, (guild_id, role_id)
+            INSERT INTO level_roles VALUES(%s, %s, %s)
+            ON DUPLICATE KEY UPDATE level = VALUES(level)
+            """, (guild_id, role_id, level), idempotent=True
         )
-        result = cursor.fetchone()
-
-        if result:
-            cursor.execute(
-                """
-                UPDATE level_roles SET level = %s WHERE guild_id = %s AND role_id = %s
-                """, (level, guild_id, role_id)
-            )
-        else:
-            cursor.execute(
-                """
-                INSERT INTO level_roles VALUES(%s, %s, %s)
-                """, (guild_id, role_id, level)
-            )
-        self.conn.commit()
-        cursor.close()
 
     def get_all_roles(self, guild_id, level):
-        cursor = self.get_cursor(buffered = True)
-
-        cursor.execute(
+        return self.fetchall(
             """
             SELECT role_id FROM level_roles WHERE guild_id = %s AND level = %s
             """, (guild_id, level)
         )
 
-        result = cursor.fetchall()
-        return result
+    def get_level_roles(self, guild_id):
+        """
+        Returns:
+            list: `(level, role_id)` of every level role of the guild, lowest level first.
+        """
+        return self.fetchall(
+            """
+            SELECT level, role_id FROM level_roles WHERE guild_id = %s ORDER BY level, role_id
+            """, (guild_id,)
+        )
@@ -0,0 +1,135 @@
+import threading
+
+
+class Standings:
+    """
+    In-memory standings of the chess tournament, with the Buchholz and Sonneborn-Berger tiebreaks.
+
+    Loaded once from the database and then updated incrementally as matches finish and penalties are
+    applied: a score change is propagated to the tiebreaks of the player's opponents right away, so
+    nothing is recomputed from the match history. The sorted table is rebuilt lazily, at most once per
+    change, and shared by every reader.
+
+    - Buchholz: sum of the current scores of the player's opponents.
+    - Sonneborn-Berger: sum of the current scores of the opponents the player beat, plus half of the
+      scores of the ones they drew with.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scores = {}
+        self._buchholz = {}
+        self._sonneborn = {}
+        # user_id -> list of [opponent_id, points scored against them]
+        self._games = {}
+        # (sorted table, user_id -> rank), rebuilt on the first read after a change
+        self._table = None
+
+    def load(self, scores, games):
+        """
+        Replaces the standings.
+
+        Args:
+            scores (list): `(user_id, score)` of every player.
+            games (list): `(match_id, first_id, second_id, first_score)` of every finished match.
+        """
+        with self._lock:
+            self._scores = {user_id: score for user_id, score in scores}
+            self._buchholz = dict.fromkeys(self._scores, 0.0)
+            self._sonneborn = dict.fromkeys(self._scores, 0.0)
+            self._games = {user_id: [] for user_id in self._scores}
+
+            for _, first_id, second_id, first_score in games:
+                self._link(first_id, second_id, first_score)
+                self._link(second_id, first_id, 1 - first_score)
+
+            for user_id, games_played in self._games.items():
+                for opponent_id, points in games_played:
+                    opponent_score = self._scores.get(opponent_id, 0.0)
+                    self._buchholz[user_id] += opponent_score
+                    self._sonneborn[user_id] += points * opponent_score
+            self._table = None
+
+    def clear(self):
+        self.load([], [])
+
+    def _link(self, user_id, opponent_id, points):
+        if user_id in self._scores:
+            self._games[user_id].append([opponent_id, points])
+
+    def _change_score(self, user_id, amount):
+        # Lock held by the caller
+        if user_id not in self._scores:
+            return
+        self._scores[user_id] += amount
+        for opponent_id, points in self._games[user_id]:
+            if opponent_id not in self._scores:
+                continue
+            # The opponent's points against this player: 1 - points
+            self._buchholz[opponent_id] += amount
+            self._sonneborn[opponent_id] += (1 - points) * amount
+        self._table = None
+
+    def add_player(self, user_id, score=0.0):
+        """Adds a newly signed up player, with no games."""
+        with self._lock:
+            if user_id not in self._scores:
+                self._scores[user_id] = score
+                self._buchholz[user_id] = 0.0
+                self._sonneborn[user_id] = 0.0
+                self._games[user_id] = []
+                self._table = None
+
+    def record_game(self, first_id, second_id, first_score, first_points, second_points):
+        """
+        Records a finished match.
+
+        Args:
+            first_id (int): One of the players.
+            second_id (int): The other player.
+            first_score (float): The result of the first player: 1, 0.5 or 0.
+            first_points (float): Points added to the first player's tournament score.
+            second_points (float): Points added to the second player's tournament score.
+        """
+        with self._lock:
+            for user_id, opponent_id, points in ((first_id, second_id, first_score), (second_id, first_id, 1 - first_score)):
+                if user_id in self._scores:
+                    self._link(user_id, opponent_id, points)
+                    opponent_score = self._scores.get(opponent_id, 0.0)
+                    self._buchholz[user_id] += opponent_score
+                    self._sonneborn[user_id] += points * opponent_score
+
+            # Applied after the link, so the new opponent's tiebreaks follow the change too
+            self._change_score(first_id, first_points)
+            self._change_score(second_id, second_points)
+
+    def penalize(self, user_ids, points):
+        """Takes `points` from each of the given players (once per occurrence)."""
+        with self._lock:
+            for user_id in user_ids:
+                self._change_score(user_id, -points)
+
+    def _snapshot(self):
+        snapshot = self._table
+        if snapshot is None:
+            with self._lock:
+                table = sorted(
+                    ((user_id, score, self._buchholz[user_id], self._sonneborn[user_id])
+                     for user_id, score in self._scores.items()),
+                    key=lambda row: (-row[1], -row[2], -row[3], row[0])
+                )
+                snapshot = self._table = (table, {row[0]: rank for rank, row in enumerate(table, start=1)})
+        return snapshot
+
+    def table(self):
+        """
+        Returns:
+            list: `(user_id, score, buchholz, sonneborn_berger)` of every player, best first.
+        """
+        return self._snapshot()[0]
+
+    def rank(self, user_id):
+        """Returns the position of a player (1 is the leader), or `None` if they aren't signed up."""
+        return self._snapshot()[1].get(user_id)
+
+    def __len__(self):
+        return len(self._scores)
@@ -0,0 +1,355 @@
+import asyncio
+import os
+
+import discord
+
+from utils.board_system import BoardSystem
+from utils.debug import Logger
+from utils.embed_factory import EmbedFactory
+from utils.guild_config import GuildConfigCache
+from utils.metrics import spawn
+from utils.resolver import Resolver
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif', 'webp')
+# 'webp' is excluded here because Discord avatars usually require PNG/JPG/GIF formats
+AVATAR_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif')
+# Stars past the board threshold that turn the message's image into the bot's avatar
+AVATAR_BONUS = 2
+# Seconds between two edits of the same board post: a burst of reactions becomes one edit
+EDIT_INTERVAL = 5
+# Board post IDs remembered before the oldest are dropped (and read again from the table if needed)
+MAX_BOARDED = 10_000
+
+
+class Starboard:
+    """
+    Keeps the board in sync with the ⭐ reactions, one message at a time.
+
+    Every message has at most one worker: the reactions that arrive while it's busy are added up,
+    and the worker applies them as a single count update followed by a single board decision. So
+    concurrent reactions on the same message can't race each other past the threshold (no duplicate
+    or missing posts), and a burst of reactions on a viral message costs one query and at most one
+    post instead of one of each per reaction.
+
+    Board posts show the current count. Changes are debounced, so each post is edited at most once
+    every `EDIT_INTERVAL` seconds, and an edit only touches the post's content through its stored ID:
+    the source message is never fetched again after the first post.
+
+    Attributes:
+        bot (discord.Client): The bot posting to the board.
+        board_system (BoardSystem): The board counters and posts.
+        guild_config (GuildConfigCache): Board channel and threshold of each guild.
+        resolver (Resolver): Cache-first lookup of the channels and messages.
+    """
+    def __init__(self, bot: discord.Client, board_system: BoardSystem, guild_config: GuildConfigCache, resolver: Resolver):
+        self.bot = bot
+        self.board_system = board_system
+        self.guild_config = guild_config
+        self.resolver = resolver
+        # message_id -> [delta, guild_id, channel_id, count to reset to or None] not applied yet
+        self._pending = {}
+        self._workers = {}
+        # message_id -> ID of its board post, 0 when it isn't on the board
+        self._boarded = {}
+        # message_id -> (guild_id, reactions) waiting for the next edit of the board post
+        self._edits = {}
+        self._edit_tasks = {}
+        # message_id -> ⭐ delta received since watch(), i.e. not seen by a count read from Discord since
+        self._watched = {}
+
+    async def reaction(self, guild_id, channel_id, message_id, delta):
+        """
+        Counts `delta` ⭐ on a message (negative when removed) and waits until the board reflects it.
+        """
+        if message_id in self._watched:
+            self._watched[message_id] += delta
+        entry = self._pending.get(message_id)
+        if entry is None:
+            self._pending[message_id] = [delta, guild_id, channel_id, None]
+        else:
+            entry[0] += delta
+        await self._wait(message_id)
+
+    async def reset(self, guild_id, channel_id, message_id, reactions):
+        """
+        Replaces the ⭐ count of a message with an authoritative one (read from Discord, or 0 when the
+        reactions were cleared) and waits until the board reflects it. Events queued before are
+        superseded by it, except the ones received since `watch()`: the count was read after them, so
+        they're added on top, as are the events arriving afterwards.
+        """
+        after = self._watched.pop(message_id, 0)
+        self._pending[message_id] = [after, guild_id, channel_id, reactions]
+        await self._wait(message_id)
+
+    def watch(self, message_id):
+        """Starts counting the ⭐ events of a message, before its count is read from Discord for `reset`."""
+        self._watched[message_id] = 0
+
+    def unwatch(self, message_id):
+        self._watched.pop(message_id, None)
+
+    async def verify(self, guild_id, channel_id, message_id, reactions):
+        """
+        Makes sure the board matches a count that is already right: posts the message when its board post
+        is missing (never sent, or deleted by hand), removes a post left up below the threshold.
+
+        Returns:
+            bool: Whether the board had to be repaired.
+        """
+        config = await self.guild_config.get(guild_id)
+        board_message_id = await self._board_message(message_id)
+        if reactions < config.min_reactions:
+            if not board_message_id:
+                return False
+        elif board_message_id:
+            channel = await self.resolver.channel(config.board_channel) if config.board_channel else None
+            if not channel or await self._board_post_exists(channel, board_message_id):
+                return False
+            logger.warning(f"Board message {board_message_id} not found. It may have been manually deleted.")
+            await self.board_system.aio.remove_boarded(message_id)
+            self._remember(message_id, 0)
+        elif not config.board_channel:
+            return False
+
+        # Through the worker, in order with the live events
+        await self.reset(guild_id, channel_id, message_id, reactions)
+        return True
+
+    async def _wait(self, message_id):
+        task = self._workers.get(message_id)
+        if task is None:
+            task = self._workers[message_id] = spawn(self._work(message_id))
+        # Shielded so a cancelled handler doesn't cancel the work of the others
+        await asyncio.shield(task)
+
+    async def _work(self, message_id):
+        try:
+            while True:
+                entry = self._pending.pop(message_id, None)
+                if entry is None:
+                    return
+                delta, guild_id, channel_id, reset = entry
+                if not delta and reset is None:
+                    continue
+                try:
+                    await self._apply(guild_id, channel_id, message_id, delta, reset)
+                except Exception as e:
+                    logger.error(f"Failed to update the board for message {message_id}", exc_info=e)
+        finally:
+            # No await since the last pop: a reaction arriving now starts a new worker
+            self._workers.pop(message_id, None)
+
+    async def _apply(self, guild_id, channel_id, message_id, delta, reset):
+        if reset is None:
+            reactions = await self.board_system.aio.change_reactions(message_id, delta, guild_id, channel_id)
+            before = reactions - delta
+        else:
+            reactions = max(reset + delta, 0)
+            before = await self.board_system.aio.set_reactions(message_id, reactions, guild_id, channel_id)
+
+        config = await self.guild_config.get(guild_id)
+        min_react = config.min_reactions
+        logger.info(f"Message {message_id}: {before} -> {reactions} reactions / Target: {min_react}")
+
+        # Events only need to act when crossing the threshold; a reset also repairs a board that
+        # drifted (a post missing because the bot was offline, or left up after the stars were lost)
+        posted = False
+        if reactions >= min_react and (before < min_react or reset is not None):
+            posted = await self._post(config, channel_id, message_id, reactions)
+        elif reactions < min_react and (before >= min_react or reset is not None):
+            await self._unpost(config, message_id)
+
+        # A new post already shows the count
+        if reactions >= min_react and reactions != before and not posted:
+            if await self._board_message(message_id):
+                self._schedule_edit(guild_id, message_id, reactions)
+
+        if before < min_react + AVATAR_BONUS <= reactions:
+            message = await self._source(channel_id, message_id)
+            if message:
+                await self._set_avatar(message)
+
+    async def _source(self, channel_id, message_id):
+        source_channel = await self.resolver.channel(channel_id)
+        if not source_channel:
+            logger.error(f"Could not find source channel {channel_id}.")
+            return None
+
+        # Cached by the resolver: posting and the avatar share one fetch
+        message = await self.resolver.message(source_channel, message_id)
+        if not message:
+            logger.error(f"Message {message_id} not found or not readable. It may have been deleted.")
+        return message
+
+    async def _board_message(self, message_id):
+        """Returns the ID of the board post of a message (0 if it has none), from memory when possible."""
+        board_message_id = self._boarded.get(message_id)
+        if board_message_id is None:
+            boarded = await self.board_system.aio.get_boarded(message_id)
+            board_message_id = (boarded[0] if boarded else 0) or 0
+            self._remember(message_id, board_message_id)
+        return board_message_id
+
+    async def _board_post_exists(self, channel, board_message_id):
+        """
+        Whether a board post is still there. Only a 404 means it was deleted: when the bot can't read
+        the board channel (403) the post is assumed to be there, so it isn't posted twice.
+        """
+        if discord.utils.get(self.bot.cached_messages, id=board_message_id):
+            return True
+        try:
+            await channel.fetch_message(board_message_id)
+        except discord.NotFound:
+            return False
+        except discord.Forbidden:
+            logger.error("Bot lacks permissions in the board channel.")
+        return True
+
+    def _remember(self, message_id, board_message_id):
+        if len(self._boarded) >= MAX_BOARDED:
+            # Dicts keep insertion order: drop the oldest half
+            self._boarded = dict(list(self._boarded.items())[MAX_BOARDED // 2:])
+        self._boarded[message_id] = board_message_id
+
+    @staticmethod
+    def _content(reactions):
+        return f"⭐ **{reactions}** · get a load of this chud..."
+
+    async def _post(self, config, channel_id, message_id, reactions):
+        """
+        Posts a message on the board, unless it's already there.
+
+        Returns:
+            bool: Whether a new post was sent.
+        """
+        if not config.board_channel:
+            logger.warning("No board channel set for this guild. Use /setboard to set it.")
+            return False
+
+        board_message_id = await self._board_message(message_id)
+        if board_message_id:
+            logger.info(f"Message {message_id} is already on the board as {board_message_id}")
+            return False
+
+        message = await self._source(channel_id, message_id)
+        if not message:
+            return False
+
+        channel = await self.resolver.channel(config.board_channel)
+        if not channel:
+            logger.error(f"Board channel {config.board_channel} not found.")
+            return False
+
+        sent_msg = await channel.send(content=self._content(reactions), embed=self._embed(message))
+        await self.board_system.aio.add_boarded(message_id, sent_msg.id)
+        self._remember(message_id, sent_msg.id)
+        logger.info(f"Saved to DB: Original {message_id} -> Board {sent_msg.id}")
+        return True
+
+    def _schedule_edit(self, guild_id, message_id, reactions):
+        """Shows `reactions` on the board post at the next edit, starting the timer if none is running."""
+        self._edits[message_id] = (guild_id, reactions)
+        if message_id not in self._edit_tasks:
+            self._edit_tasks[message_id] = spawn(self._edit_later(message_id))
+
+    async def _edit_later(self, message_id):
+        try:
+            await asyncio.sleep(EDIT_INTERVAL)
+            guild_id, reactions = self._edits.pop(message_id)
+            await self._edit(guild_id, message_id, reactions)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to edit the board post of message {message_id}", exc_info=e)
+        finally:
+            # A cancelled timer may already have been replaced by a new one
+            if self._edit_tasks.get(message_id) is asyncio.current_task():
+                del self._edit_tasks[message_id]
+                # Changed again during the edit: one more, a full interval later
+                if message_id in self._edits:
+                    self._edit_tasks[message_id] = spawn(self._edit_later(message_id))
+
+    async def _edit(self, guild_id, message_id, reactions):
+        # Read again from the table if it was dropped from memory since the edit was scheduled
+        board_message_id = await self._board_message(message_id)
+        config = await self.guild_config.get(guild_id)
+        channel = await self.resolver.channel(config.board_channel) if config.board_channel else None
+        if not board_message_id or not channel:
+            return
+
+        try:
+            # Only the content changes: the embed stays as posted, no fetch needed
+            await channel.get_partial_message(board_message_id).edit(content=self._content(reactions))
+        except discord.NotFound:
+            # Deleted by hand: forgotten, so it's posted again only by a new threshold crossing or a reconciliation
+            logger.warning(f"Board message {board_message_id} not found. It may have been manually deleted.")
+            await self.board_system.aio.remove_boarded(message_id)
+            self._remember(message_id, 0)
+
+    def _cancel_edit(self, message_id):
+        self._edits.pop(message_id, None)
+        task = self._edit_tasks.pop(message_id, None)
+        if task is not None:
+            task.cancel()
+
+    def close(self):
+        """Drops the pending edits of the board posts."""
+        self._edits.clear()
+        for task in self._edit_tasks.values():
+            task.cancel()
+        self._edit_tasks.clear()
+
+    @staticmethod
+    def _embed(message):
+        description = f"{message.content}\n\n**[Jump to message!]({message.jump_url})**"
+        embed = EmbedFactory.create_embed(
+            description=description,
+            colour=discord.Color.gold(),
+            timestamp=True
+        )
+
+        avatar_url = message.author.avatar.url if message.author.avatar else message.author.default_avatar.url
+        embed.set_author(name=message.author.display_name, icon_url=avatar_url)
+
+        # Extract first image attachment if it exists
+        for attachment in message.attachments:
+            if attachment.filename.lower().endswith(IMAGE_EXTENSIONS):
+                embed.set_image(url=attachment.url)
+                break
+        return embed
+
+    async def _unpost(self, config, message_id):
+        """Deletes the board post of a message that fell below the threshold."""
+        self._cancel_edit(message_id)
+        board_message_id = await self._board_message(message_id)
+        if not board_message_id:
+            return
+
+        channel = await self.resolver.channel(config.board_channel) if config.board_channel else None
+        if channel:
+            try:
+                # The ID is all delete() needs: no fetch
+                await channel.get_partial_message(board_message_id).delete()
+                logger.info(f"Deleted board message {board_message_id} because reactions fell below threshold.")
+            except discord.NotFound:
+                logger.error(f"Board message {board_message_id} not found. It may have been manually deleted.")
+            except discord.Forbidden:
+                logger.error("Bot lacks permissions in the board channel.")
+                return
+        await self.board_system.aio.remove_boarded(message_id)
+        self._remember(message_id, 0)
+
+    async def _set_avatar(self, message):
+        for attachment in message.attachments:
+            if attachment.filename.lower().endswith(AVATAR_EXTENSIONS):
+                try:
+                    await self.bot.user.edit(avatar=await attachment.read())
+                    logger.info(f"Successfully updated bot profile picture to {attachment.filename}!")
+                except discord.HTTPException as e:
+                    # Discord heavily rate-limits avatar changes (usually a few times an hour)
+                    logger.error(f"Failed to update avatar (may be rate-limited): {e}")
+                # Only the first valid image
+                return
@@ -0,0 +1,300 @@
+import asyncio
+import os
+import random
+
+from utils.chess_db import ChessSystem
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Nodes the backtracking search may visit before the plain maximum matching is used instead
+SEARCH_BUDGET = 20_000
+
+
+class Pairing:
+    """
+    The pairings of a round.
+
+    Attributes:
+        pairs (list): `(player1_id, player2_id)` tuples, highest scores first.
+        bye (int): The player who rests this round, `None` with an even number of players.
+        rematches (int): Pairs that already met; only non-zero when no pairing without rematches exists,
+            and then the fewest possible.
+        scores (dict): The score of every player when the round was paired.
+    """
+    def __init__(self, pairs, bye, rematches, scores):
+        self.pairs = pairs
+        self.bye = bye
+        self.rematches = rematches
+        self.scores = scores
+
+
+class _Matching:
+    """
+    Maximum matching of the players who haven't met yet, with Edmonds' blossom algorithm.
+
+    Its size gives the fewest rematches of any pairing: the players it leaves unmatched have already
+    met each other (or they could be matched), so they can only be paired in rematches.
+    """
+    def __init__(self, players, scores, opponents):
+        self.players = players
+        n = len(players)
+        self.match = [-1] * n
+        # Closest scores first, so the greedy start is already close to a Swiss pairing
+        self.adjacency = []
+        for i, player in enumerate(players):
+            others = [j for j, other in enumerate(players) if j != i and other not in opponents[player]]
+            others.sort(key=lambda j: abs(scores[player] - scores[players[j]]))
+            self.adjacency.append(others)
+
+        for i in range(n):
+            if self.match[i] == -1:
+                for j in self.adjacency[i]:
+                    if self.match[j] == -1:
+                        self.match[i], self.match[j] = j, i
+                        break
+        # A vertex without an augmenting path never gets one later: one search per vertex is enough
+        for i in range(n):
+            if self.match[i] == -1:
+                self._augment(i)
+
+    def _augment(self, root, banned=-1):
+        """Looks for an augmenting path from the unmatched `root`, avoiding `banned`, and applies it."""
+        match, adjacency = self.match, self.adjacency
+        n = len(match)
+        parent = [-1] * n
+        base = list(range(n))
+        used = [False] * n
+        used[root] = True
+        queue = [root]
+
+        def lca(a, b):
+            seen = [False] * n
+            while True:
+                a = base[a]
+                seen[a] = True
+                if match[a] == -1:
+                    break
+                a = parent[match[a]]
+            while True:
+                b = base[b]
+                if seen[b]:
+                    return b
+                b = parent[match[b]]
+
+        def mark_path(v, b, child, blossom):
+            while base[v] != b:
+                blossom[base[v]] = blossom[base[match[v]]] = True
+                parent[v] = child
+                child = match[v]
+                v = parent[match[v]]
+
+        head = 0
+        while head < len(queue):
+            v = queue[head]
+            head += 1
+            for to in adjacency[v]:
+                if to == banned or base[v] == base[to] or match[v] == to:
+                    continue
+                if to == root or (match[to] != -1 and parent[match[to]] != -1):
+                    # Odd cycle: contract the blossom into its base
+                    current = lca(v, to)
+                    blossom = [False] * n
+                    mark_path(v, current, to, blossom)
+                    mark_path(to, current, v, blossom)
+                    for i in range(n):
+                        if blossom[base[i]]:
+                            base[i] = current
+                            if not used[i]:
+                                used[i] = True
+                                queue.append(i)
+                elif parent[to] == -1:
+                    parent[to] = v
+                    if match[to] == -1:
+                        while to != -1:
+                            previous = match[parent[to]]
+                            match[to], match[parent[to]] = parent[to], to
+                            to = previous
+                        return True
+                    used[match[to]] = True
+                    queue.append(match[to])
+        return False
+
+    def drop(self, player_index):
+        """
+        Takes a player out (the bye) and keeps the matching of the others maximum.
+
+        Returns:
+            bool: `False` if the others have one pair less than before (the matching is left unchanged).
+        """
+        partner = self.match[player_index]
+        if partner == -1:
+            return True
+
+        saved = list(self.match)
+        self.match[player_index] = self.match[partner] = -1
+        if self._augment(partner, banned=player_index):
+            return True
+        self.match = saved
+        return False
+
+    def pairs(self, excluded=-1):
+        """Returns the matched pairs, then the unmatched players paired with each other (the rematches)."""
+        pairs = [(self.players[i], self.players[j]) for i, j in enumerate(self.match) if i < j]
+        unmatched = [player for i, player in enumerate(self.players) if self.match[i] == -1 and i != excluded]
+        return pairs + list(zip(unmatched[::2], unmatched[1::2]))
+
+    def unmatched(self, excluded=-1):
+        return sum(1 for i, j in enumerate(self.match) if j == -1 and i != excluded)
+
+
+class _Search:
+    """
+    Backtracking search for a perfect matching of players sorted by score, cheapest choices first,
+    with at most `max_rematches` pairs of players who already met.
+    """
+    def __init__(self, scores, opponents, max_rematches=0):
+        self.scores = scores
+        self.opponents = opponents
+        self.max_rematches = max_rematches
+        self.rematches = 0
+        self.visited = 0
+
+    def candidates(self, remaining):
+        # Dutch system: within a score group the top half plays the bottom half (1 vs n/2+1, ...)
+        player = remaining[0]
+        score = self.scores[player]
+        group = sum(1 for other in remaining if self.scores[other] == score)
+        half = group // 2
+
+        def preference(index):
+            other = remaining[index]
+            return other in self.opponents[player], abs(score - self.scores[other]), abs(index - half)
+
+        indexes = range(1, len(remaining))
+        if self.rematches >= self.max_rematches:
+            indexes = [i for i in indexes if remaining[i] not in self.opponents[player]]
+        return sorted(indexes, key=preference)
+
+    def run(self, remaining):
+        """Returns the pairs of `remaining`, or `None` if there's no valid pairing (or the budget ran out)."""
+        if not remaining:
+            return []
+
+        self.visited += 1
+        if self.visited > SEARCH_BUDGET:
+            return None
+
+        for index in self.candidates(remaining):
+            rematch = remaining[index] in self.opponents[remaining[0]]
+            self.rematches += rematch
+            pairs = self.run(remaining[1:index] + remaining[index + 1:])
+            self.rematches -= rematch
+            if pairs is not None:
+                return [(remaining[0], remaining[index])] + pairs
+            if self.visited > SEARCH_BUDGET:
+                break
+        return None
+
+
+def pair_round(scores, opponents, byes, seed=None):
+    """
+    Pairs a Swiss round: players are paired within their score group (top half against bottom half),
+    the ones left over float down to the next group, and players who already met are never paired
+    again unless there's no other way, and then in as few pairs as possible. With an odd number of
+    players the bye goes to the lowest ranked player who hasn't had one yet (or had the fewest), among
+    the ones whose rest doesn't add a rematch.
+
+    A maximum matching of the players who haven't met gives the fewest rematches; the Dutch
+    preferences are then searched within that limit, falling back to the matching itself if the search
+    runs out of budget.
+
+    Args:
+        scores (dict): Score of every player taking part, by user ID.
+        opponents (dict): Set of past opponents of each player, by user ID.
+        byes (dict): Number of byes each player already had, by user ID.
+        seed (int, optional): Seed breaking the ties between players with the same score.
+
+    Returns:
+        Pairing: The pairings of the round.
+    """
+    rng = random.Random(seed)
+    players = list(scores)
+    rng.shuffle(players)
+    # Stable sort: equal scores keep the random order
+    players.sort(key=lambda player: scores[player], reverse=True)
+    opponents = {player: opponents.get(player, set()) for player in players}
+
+    matching = _Matching(players, scores, opponents)
+    bye, excluded = None, -1
+    if len(players) % 2:
+        index = {player: i for i, player in enumerate(players)}
+        # Fewest byes first, then the lowest ranked. An unmatched player always qualifies, so one is found
+        for candidate in sorted(reversed(players), key=lambda player: byes.get(player, 0)):
+            if matching.drop(index[candidate]):
+                bye, excluded = candidate, index[candidate]
+                break
+
+    fewest_rematches = matching.unmatched(excluded) // 2
+    search = _Search(scores, opponents, fewest_rematches)
+    pairs = search.run([player for player in players if player != bye])
+    if pairs is None:
+        logger.warning(f"Pairing search ran out of budget after {search.visited} steps, using the plain matching")
+        pairs = sorted(matching.pairs(excluded), key=lambda pair: max(scores[pair[0]], scores[pair[1]]), reverse=True)
+
+    rematches = sum(1 for a, b in pairs if b in opponents[a])
+    logger.info(f"Paired {len(players)} players in {search.visited} steps, {rematches} rematches, bye: {bye}")
+    return Pairing(pairs, bye, rematches, dict(scores))
+
+
+class SwissPairer:
+    """
+    Pairs the rounds of the chess tournament with the Swiss system, from the players, scores, past
+    matches and byes stored by `ChessSystem`.
+
+    Usage:
+        pairing = await pairer.plan()   # dry run, nothing is written
+        match_ids = await pairer.commit(pairing)
+
+    Attributes:
+        chess_system (ChessSystem): The chess system storing the tournament.
+    """
+    def __init__(self, chess_system: ChessSystem):
+        self.chess_system = chess_system
+
+    async def plan(self, seed=None):
+        """
+        Computes the pairings of the next round without writing anything.
+
+        Args:
+            seed (int, optional): Seed breaking the ties, derived from the tournament state by default.
+
+        Returns:
+            Pairing: The pairings, or `None` if less than two players are signed up.
+        """
+        scores = dict(await self.chess_system.aio.get_standings())
+        if len(scores) < 2:
+            return None
+
+        history = await self.chess_system.aio.get_pairing_history()
+        opponents = {}
+        for player, opponent in history:
+            opponents.setdefault(player, set()).add(opponent)
+            opponents.setdefault(opponent, set()).add(player)
+
+        byes = dict(await self.chess_system.aio.get_byes())
+        if seed is None:
+            # Same tournament state, same pairings: a dry run shows exactly what the real run will create
+            seed = len(history) * 1009 + sum(byes.values())
+        # CPU-bound for big tournaments: off the event loop, so the gateway keeps being served
+        return await asyncio.to_thread(pair_round, scores, opponents, byes, seed)
+
+    async def commit(self, pairing: Pairing):
+        """
+        Creates the matches of the pairings, all in one transaction, and records the bye.
+
+        Returns:
+            list: The match ID of each pair, in the same order as `pairing.pairs`.
+        """
+        return await self.chess_system.aio.create_round(pairing.pairs, pairing.bye)
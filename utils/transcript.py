@@ -0,0 +1,185 @@
+import gzip
+import html
+import json
+import os
+import tempfile
+
+import discord
+
+from utils.debug import Logger
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+# Compressed transcripts larger than this are moved from memory to a temporary file
+SPOOL_THRESHOLD = 4 * 1024 * 1024
+
+HTML_HEADER = """<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; background: #313338; color: #dbdee1; }}
+.message {{ padding: 4px 8px; border-bottom: 1px solid #3f4147; }}
+.author {{ font-weight: bold; color: #f2f3f5; }}
+.time {{ font-size: 0.8em; color: #949ba4; margin-left: 6px; }}
+.content {{ white-space: pre-wrap; }}
+.attachment, .embed {{ font-size: 0.9em; margin-left: 12px; }}
+.embed {{ border-left: 4px solid #5865f2; padding-left: 6px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+HTML_FOOTER = "</body>\n</html>\n"
+
+
+def message_record(message: discord.Message) -> dict:
+    """
+    Returns the transcript entry of a message, including the metadata of its attachments and embeds.
+
+    Args:
+        message (discord.Message): The message to record.
+
+    Returns:
+        dict: A JSON-serializable dictionary.
+    """
+    return {
+        "id": message.id,
+        "author": str(message.author),
+        "author_id": message.author.id,
+        "content": message.content,
+        "timestamp": message.created_at.isoformat(),
+        "edited": message.edited_at.isoformat() if message.edited_at else None,
+        "reply_to": message.reference.message_id if message.reference else None,
+        "attachments": [
+            {
+                "filename": attachment.filename,
+                "url": attachment.url,
+                "size": attachment.size,
+                "content_type": attachment.content_type
+            }
+            for attachment in message.attachments
+        ],
+        "embeds": [embed.to_dict() for embed in message.embeds]
+    }
+
+
+def html_record(record: dict) -> str:
+    """Renders a transcript entry as an HTML block, escaping everything written by the users."""
+    parts = [
+        f'<div class="message" id="m{record["id"]}">',
+        f'<span class="author">{html.escape(record["author"])}</span>',
+        f'<span class="time">{html.escape(record["timestamp"])}</span>',
+        f'<div class="content">{html.escape(record["content"])}</div>'
+    ]
+    for attachment in record["attachments"]:
+        url = html.escape(attachment["url"], quote=True)
+        parts.append(f'<div class="attachment">📎 <a href="{url}">{html.escape(attachment["filename"])}</a></div>')
+    for embed in record["embeds"]:
+        text = " — ".join(filter(None, (embed.get("title"), embed.get("description"))))
+        parts.append(f'<div class="embed">{html.escape(text)}</div>')
+    parts.append("</div>\n")
+    return "\n".join(parts)
+
+
+class CompressedSpool:
+    """
+    Gzip stream that stays in memory while small and spills to a temporary file past `SPOOL_THRESHOLD`.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD)
+        self._gzip = gzip.GzipFile(filename=filename, mode="wb", fileobj=self._file)
+        self.size = 0
+        self._attachment = None
+
+    def write(self, text: str):
+        self._gzip.write(text.encode("utf-8"))
+
+    def to_file(self) -> discord.File:
+        """Finishes the stream and returns it as an attachment named `<filename>.gz`."""
+        self._gzip.close()
+        self.size = self._file.tell()
+        self._file.seek(0)
+        self._attachment = discord.File(fp=self._file, filename=f"{self.filename}.gz")
+        return self._attachment
+
+    def close(self):
+        self._gzip.close()
+        if self._attachment is not None:
+            # discord.File disables close() on the buffers it is given: give it back first
+            self._attachment.close()
+        self._file.close()
+
+
+class TranscriptWriter:
+    """
+    Writes the transcript of a channel incrementally, one message at a time, as gzip-compressed NDJSON
+    (one JSON object per line) and optionally HTML. Only one message is held in memory at once, so the
+    memory used doesn't depend on the length of the channel.
+
+    Usage:
+        with TranscriptWriter(channel.name, as_html=True) as transcript:
+            await transcript.write_history(channel)
+            await log_channel.send(files=transcript.files())
+
+    Attributes:
+        name (str): Base name of the transcript files.
+        count (int): Number of messages written so far.
+    """
+    def __init__(self, name, as_html=False):
+        self.name = name
+        self.count = 0
+        self._json = CompressedSpool(f"{name}_transcript.ndjson")
+        self._html = CompressedSpool(f"{name}_transcript.html") if as_html else None
+
+        if self._html is not None:
+            self._html.write(HTML_HEADER.format(title=html.escape(f"Transcript #{name}")))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, message: discord.Message):
+        """Appends a message to the transcript."""
+        record = message_record(message)
+        self._json.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if self._html is not None:
+            self._html.write(html_record(record))
+        self.count += 1
+
+    async def write_history(self, channel):
+        """
+        Appends the whole history of a channel, oldest message first, as the pages arrive.
+
+        Returns:
+            int: The number of messages written.
+        """
+        async for message in channel.history(limit=None, oldest_first=True):
+            self.write(message)
+        return self.count
+
+    def files(self):
+        """
+        Finishes the transcript.
+
+        Returns:
+            list: The `discord.File` attachments, NDJSON first.
+        """
+        if self._html is not None:
+            self._html.write(HTML_FOOTER)
+        spools = [self._json] if self._html is None else [self._json, self._html]
+        files = [spool.to_file() for spool in spools]
+
+        logger.info(f"Transcript of {self.name}: {self.count} messages, {sum(spool.size for spool in spools)} bytes compressed")
+        return files
+
+    def close(self):
+        """Releases the buffers and temporary files."""
+        self._json.close()
+        if self._html is not None:
+            self._html.close()
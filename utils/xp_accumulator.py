@@ -0,0 +1,203 @@
+import asyncio
+import os
+
+from utils.debug import Logger
+from utils.level_system import LevelSystem, apply_xp
+from utils.metrics import spawn
+from utils.rank_index import RankIndex
+
+# Initialize logger
+logger = Logger(os.path.basename(__file__).replace(".py", ""))
+
+
+class XPAccumulator:
+    """
+    Write-behind buffer for the XP earned by chatting.
+
+    Each user's XP and level are loaded once, then updated in memory with the same level-up rule as
+    `LevelSystem.add_xp`, so a level-up is known (and can be announced) as soon as the message arrives.
+    Changed users are written back with a single multi-row upsert every `flush_interval` seconds,
+    as soon as `max_dirty` users are waiting, and on shutdown.
+
+    Attributes:
+        level_system (LevelSystem): The level system the XP is written to.
+        flush_interval (float): Seconds between two periodic flushes.
+        max_dirty (int): Number of changed users that triggers an early flush.
+        rank_index (RankIndex): Per-guild rankings, kept in sync with every change.
+    """
+    def __init__(self, level_system: LevelSystem, flush_interval=30, max_dirty=500, rank_index: RankIndex = None):
+        self.level_system = level_system
+        self.rank_index = rank_index
+        self.flush_interval = flush_interval
+        self.max_dirty = max_dirty
+
+        self._users = {}  # (user_id, guild_id) -> [xp, level]
+        self._dirty = set()
+        self._loading = {}
+        # Bumped by admin writes, so a load that raced with them doesn't cache stale data
+        self._versions = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._timer = None
+
+    def start(self):
+        """Starts the periodic flush, to be called once the event loop is running."""
+        if self._timer is None:
+            self._timer = spawn(self._flush_periodically())
+
+    async def close(self):
+        """Stops the periodic flush and writes every pending change."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Periodic XP flush failed", exc_info=e)
+
+    async def _state(self, key):
+        while key not in self._users:
+            task = self._loading.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._load(key))
+                self._loading[key] = task
+                task.add_done_callback(lambda _: self._loading.pop(key, None))
+            await asyncio.shield(task)
+        return self._users[key]
+
+    async def _load(self, key):
+        version = self._versions.get(key, 0)
+        row = await self.level_system.aio.get_user(*key)
+        if self._versions.get(key, 0) == version and key not in self._users:
+            self._users[key] = list(row) if row else [0, 0]
+
+    async def add_xp(self, user_id, guild_id, amount):
+        """
+        Adds XP to a user in memory; the database is updated by the next flush.
+
+        Args:
+            user_id (int): The unique ID of the user.
+            guild_id (int): The ID of the guild (Discord server) where the user is active.
+            amount (int): The amount of XP to add.
+
+        Returns:
+            tuple: The new XP and level of the user, and whether the user just leveled up.
+        """
+        key = (user_id, guild_id)
+        state = await self._state(key)
+
+        old_level = state[1]
+        state[0], state[1] = apply_xp(state[0], state[1], amount)
+        self._dirty.add(key)
+        if self.rank_index is not None:
+            self.rank_index.update(user_id, guild_id, *state)
+
+        if len(self._dirty) >= self.max_dirty and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = spawn(self.flush())
+
+        return state[0], state[1], state[1] > old_level
+
+    async def get_user(self, user_id, guild_id):
+        """
+        Returns the up-to-date XP and level of a user, including the XP not flushed yet.
+
+        Returns:
+            tuple: The user's XP and level, or `None` if the user has no level data.
+        """
+        state = self._users.get((user_id, guild_id))
+        if state is not None:
+            return tuple(state)
+        return await self.level_system.aio.get_user(user_id, guild_id)
+
+    async def flush(self):
+        """
+        Writes every changed user to the database with a single multi-row upsert.
+
+        Returns:
+            int: The number of users written.
+        """
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self):
+        if not self._dirty:
+            return 0
+
+        keys = list(self._dirty)
+        self._dirty.clear()
+        rows = [(*key, *self._users[key]) for key in keys if key in self._users]
+
+        try:
+            await self.level_system.aio.save_users(rows)
+        except Exception:
+            # Keep them for the next flush, unless they were changed by an admin in the meantime
+            self._dirty.update(key for key in keys if key in self._users)
+            raise
+
+        logger.debug(f"Flushed XP of {len(rows)} user(s)")
+        return len(rows)
+
+    async def update(self, user_id, guild_id, write):
+        """
+        Runs a direct write on a user's row (e.g. an admin setting the level), making sure it isn't
+        overwritten by buffered XP: pending changes are flushed first and the cached entry is dropped after.
+
+        Args:
+            user_id (int): The unique ID of the user.
+            guild_id (int): The ID of the guild (Discord server) where the user is active.
+            write (Callable): Coroutine function doing the write and returning the user's `(xp, level)`
+                after it, e.g. `lambda: level_system.aio.set_xp(...)`.
+
+        Returns:
+            tuple: The user's XP and level after the write.
+        """
+        def sync(row):
+            if self.rank_index is not None:
+                self.rank_index.update(user_id, guild_id, *row)
+        return await self._direct(user_id, guild_id, write, sync)
+
+    async def reset(self, user_id, guild_id):
+        """
+        Deletes a user's level data, like `update` does for the other writes.
+
+        Returns:
+            bool: `True` if the user had level data.
+        """
+        def sync(_):
+            if self.rank_index is not None:
+                self.rank_index.remove(user_id, guild_id)
+        return await self._direct(user_id, guild_id, lambda: self.level_system.aio.reset_level(user_id, guild_id), sync)
+
+    async def _direct(self, user_id, guild_id, write, sync):
+        key = (user_id, guild_id)
+        async with self._flush_lock:
+            await self._flush()
+            try:
+                result = await write()
+            finally:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._users.pop(key, None)
+                self._dirty.discard(key)
+
+            # The write returns what the ranking needs: no read-back
+            sync(result)
+            return result
+
+    async def ranking(self, guild_id):
+        """
+        Returns the up-to-date ranking of a guild, including the XP not flushed yet.
+
+        Returns:
+            GuildRanking: The ranking of the guild.
+        """
+        ranking = self.rank_index.get(guild_id)
+        if ranking is None:
+            # The ranking is loaded from the database: write the buffered XP first
+            await self.flush()
+            ranking = await self.rank_index.load(guild_id)
+        return ranking
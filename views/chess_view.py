@@ -1,23 +1,32 @@
 import discord
 from utils.chess_db import ChessSystem
+from utils.embed_factory import EmbedFactory
 
 
 class MatchResultView(discord.ui.View):
-    """Fase 2: I giocatori inseriscono il risultato."""
+    """Fase 2: I giocatori inseriscono il risultato.
 
-    def __init__(self, chess_system: ChessSystem, match_id: int, p1: discord.Member, p2: discord.Member):
+    Vista persistente: i custom_id contengono l'ID del match (`chess:<azione>:<match_id>`) e lo stato
+    è letto da `players_matches`, quindi i bottoni funzionano anche dopo un riavvio del bot.
+    """
+
+    def __init__(self, chess_system: ChessSystem, match_id: int, p1_id: int, p2_id: int):
         super().__init__(timeout=None)
         self.chess_system = chess_system
         self.match_id = match_id
-        self.p1 = p1
-        self.p2 = p2
+        self.p1_id = p1_id
+        self.p2_id = p2_id
+
+        self.btn_win.custom_id = f"chess:win:{match_id}"
+        self.btn_loss.custom_id = f"chess:loss:{match_id}"
+        self.btn_draw.custom_id = f"chess:draw:{match_id}"
 
     async def handle_result(self, interaction: discord.Interaction, result: str):
-        if interaction.user.id not in [self.p1.id, self.p2.id]:
+        if interaction.user.id not in [self.p1_id, self.p2_id]:
             await interaction.response.send_message("Non fai parte di questo match!", ephemeral=True)
             return
 
-        status_data = self.chess_system.report_result(self.match_id, interaction.user.id, result)
+        status_data = await self.chess_system.aio.report_result(self.match_id, interaction.user.id, result)
         status = status_data[0]
 
         if status == "RESOLVED":
@@ -31,62 +40,123 @@ class MatchResultView(discord.ui.View):
             for child in self.children:
                 child.disabled = True
             await interaction.response.edit_message(content=msg, view=self)
+            self.stop()
 
         elif status == "DISPUTE":
             msg = f"⚠️ **Disputa nel Match #{self.match_id}!**\nI risultati inseriti non coincidono. Contattate uno staffer."
             for child in self.children:
                 child.disabled = True
             await interaction.response.edit_message(content=msg, view=self)
+            self.stop()
         else:
             await interaction.response.send_message(f"Hai segnalato: **{result}**. In attesa dell'avversario...",
                                                     ephemeral=True)
 
-    @discord.ui.button(label="Ho Vinto", style=discord.ButtonStyle.success, emoji="🏆")
+    @discord.ui.button(label="Ho Vinto", style=discord.ButtonStyle.success, emoji="🏆", custom_id="chess:win")
     async def btn_win(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.handle_result(interaction, "WIN")
 
-    @discord.ui.button(label="Ho Perso", style=discord.ButtonStyle.danger, emoji="💀")
+    @discord.ui.button(label="Ho Perso", style=discord.ButtonStyle.danger, emoji="💀", custom_id="chess:loss")
     async def btn_loss(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.handle_result(interaction, "LOSS")
 
-    @discord.ui.button(label="Pareggio", style=discord.ButtonStyle.secondary, emoji="🤝")
+    @discord.ui.button(label="Pareggio", style=discord.ButtonStyle.secondary, emoji="🤝", custom_id="chess:draw")
     async def btn_draw(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.handle_result(interaction, "DRAW")
 
 
 class MatchAcceptView(discord.ui.View):
-    """Fase 1: I giocatori accettano la partita."""
+    """Fase 1: I giocatori accettano la partita.
 
-    def __init__(self, chess_system: ChessSystem, match_id: int, p1: discord.Member, p2: discord.Member):
+    Vista persistente come `MatchResultView`: chi ha già accettato è salvato in `players_matches`.
+    """
+
+    def __init__(self, chess_system: ChessSystem, match_id: int, p1_id: int, p2_id: int):
         super().__init__(timeout=None)
         self.chess_system = chess_system
         self.match_id = match_id
-        self.p1 = p1
-        self.p2 = p2
-        self.accepted_users = set()
+        self.p1_id = p1_id
+        self.p2_id = p2_id
+
+        self.btn_accept.custom_id = f"chess:accept:{match_id}"
 
-    @discord.ui.button(label="Accetta Partita", style=discord.ButtonStyle.primary, emoji="✅")
+    @discord.ui.button(label="Accetta Partita", style=discord.ButtonStyle.primary, emoji="✅", custom_id="chess:accept")
     async def btn_accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id not in [self.p1.id, self.p2.id]:
+        if interaction.user.id not in [self.p1_id, self.p2_id]:
             await interaction.response.send_message("Non sei uno dei giocatori di questa partita!", ephemeral=True)
             return
 
-        if interaction.user.id in self.accepted_users:
-            await interaction.response.send_message("Hai già accettato questa partita.", ephemeral=True)
-            return
-
         # Register in DB
-        both_ready = self.chess_system.confirm_availability(self.match_id, interaction.user.id)
-        self.accepted_users.add(interaction.user.id)
+        status = await self.chess_system.aio.confirm_availability(self.match_id, interaction.user.id)
 
-        if both_ready:
+        if status == "ALREADY":
+            await interaction.response.send_message("Hai già accettato questa partita.", ephemeral=True)
+        elif status == "CLOSED":
+            await interaction.response.send_message("Questa partita non può più essere accettata.", ephemeral=True)
+        elif status == "READY":
             # Switch to Phase 2 (Result Reporting)
-            new_view = MatchResultView(self.chess_system, self.match_id, self.p1, self.p2)
+            new_view = MatchResultView(self.chess_system, self.match_id, self.p1_id, self.p2_id)
             await interaction.response.edit_message(
-                content=f"⚔️ **Match #{self.match_id} INIZIATO!**\n{self.p1.mention} vs {self.p2.mention}\n\n*Entrambi i giocatori hanno accettato. Giocate la partita e dichiarate il risultato qui sotto.*",
+                content=f"⚔️ **Match #{self.match_id} INIZIATO!**\n<@{self.p1_id}> vs <@{self.p2_id}>\n\n*Entrambi i giocatori hanno accettato. Giocate la partita e dichiarate il risultato qui sotto.*",
                 embed=None,
                 view=new_view
             )
+            self.stop()
         else:
             await interaction.response.send_message(f"Hai accettato il match! In attesa del tuo avversario...",
-                                                    ephemeral=True)
\ No newline at end of file
+                                                    ephemeral=True)
+
+
+def match_view(chess_system: ChessSystem, match_id: int, status: str, p1_id: int, p2_id: int):
+    """Ricrea la vista giusta per lo stato del match: accettazione se PENDING, risultato se STARTED."""
+    view_class = MatchAcceptView if status == "PENDING" else MatchResultView
+    return view_class(chess_system, match_id, p1_id, p2_id)
+
+
+class StandingsView(discord.ui.View):
+    """Classifica paginata: i bottoni scorrono le pagine della stessa istantanea."""
+
+    PAGE_SIZE = 10
+
+    def __init__(self, table: list, author_id: int, page: int = 0):
+        super().__init__(timeout=300)
+        self.table = table
+        self.author_id = author_id
+        self.pages = max(1, -(-len(table) // self.PAGE_SIZE))
+        self.page = min(max(page, 0), self.pages - 1)
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.btn_previous.disabled = self.page == 0
+        self.btn_next.disabled = self.page >= self.pages - 1
+
+    def create_embed(self) -> discord.Embed:
+        start = self.page * self.PAGE_SIZE
+        lines = [
+            f"`{rank:>3}.` <@{user_id}> — **{score:g}** pt · Bh {buchholz:g} · SB {sonneborn:g}"
+            for rank, (user_id, score, buchholz, sonneborn) in enumerate(self.table[start:start + self.PAGE_SIZE], start=start + 1)
+        ]
+        embed = EmbedFactory.create_embed(
+            title="🏆 Classifica Scacchi",
+            description="\n".join(lines) or "Nessun giocatore iscritto.",
+            colour=discord.Color.gold()
+        )
+        embed.set_footer(text=f"Pagina {self.page + 1}/{self.pages} · Spareggi: Buchholz (Bh), Sonneborn-Berger (SB)")
+        return embed
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Usa `/chess standings` per sfogliare la classifica.", ephemeral=True)
+            return
+
+        self.page = page
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.create_embed(), view=self)
+
+    @discord.ui.button(label="Precedente", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def btn_previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="Successiva", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def btn_next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
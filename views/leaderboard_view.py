@@ -0,0 +1,64 @@
+import discord
+from utils.embed_factory import EmbedFactory
+from utils.rank_index import GuildRanking
+
+
+class LeaderboardView(discord.ui.View):
+    """
+    Paginated leaderboard of a guild. Every page is read from the live ranking when it is shown,
+    which only costs a lookup in the index.
+    """
+
+    PAGE_SIZE = 10
+
+    def __init__(self, ranking: GuildRanking, guild: discord.Guild, author_id: int, page: int = 0):
+        super().__init__(timeout=300)
+        self.ranking = ranking
+        self.guild = guild
+        self.author_id = author_id
+        self.page = page
+        self._clamp()
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self.ranking) // self.PAGE_SIZE))
+
+    def _clamp(self):
+        self.page = min(max(self.page, 0), self.pages - 1)
+        self.btn_previous.disabled = self.page == 0
+        self.btn_next.disabled = self.page >= self.pages - 1
+
+    def create_embed(self, interaction: discord.Interaction) -> discord.Embed:
+        rows = self.ranking.page(self.page * self.PAGE_SIZE, self.PAGE_SIZE)
+        lines = [f"`#{rank:>3}` <@{user_id}> · level **{level}** ({xp} XP)" for rank, user_id, level, xp in rows]
+
+        embed = EmbedFactory.create_embed(
+            title=f"Leaderboard of {self.guild.name}",
+            description="\n".join(lines) or "Nobody has earned XP yet.",
+            author="Level System",
+            colour=discord.Color.gold(),
+            interaction=interaction
+        )
+        embed.add_field(name="Page", value=f"{self.page + 1}/{self.pages}")
+
+        rank = self.ranking.rank(self.author_id)
+        if rank:
+            embed.add_field(name="Your rank", value=f"#{rank} of {len(self.ranking)}")
+        return embed
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Use `/leaderboard` to browse the leaderboard.", ephemeral=True)
+            return
+
+        self.page = page
+        self._clamp()
+        await interaction.response.edit_message(embed=self.create_embed(interaction), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def btn_previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def btn_next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
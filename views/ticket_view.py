@@ -6,9 +6,7 @@ import os
 
 logger = Logger(os.path.basename(__file__).replace(".py", ""))
 
-import json
-import io
-# (Make sure your other imports like os, Logger, uuid, etc. are still at the top)
+from utils.transcript import TranscriptWriter
 
 class TicketControlView(discord.ui.View):
     def __init__(self):
@@ -21,35 +19,22 @@ class TicketControlView(discord.ui.View):
         await interaction.response.send_message("Sto salvando il transcript e chiudendo il ticket...", ephemeral=True)
 
         try:
-            # 1. Fetch all messages in the channel (from oldest to newest)
-            messages_data = []
-            async for msg in interaction.channel.history(limit=None, oldest_first=True):
-                messages_data.append({
-                    "author": str(msg.author),
-                    "author_id": msg.author.id,
-                    "content": msg.content,
-                    "timestamp": msg.created_at.isoformat()
-                })
-
-            # 2. Convert dictionary to a formatted JSON string and load it into a BytesIO object
-            json_data = json.dumps(messages_data, indent=4, ensure_ascii=False)
-            file_bytes = io.BytesIO(json_data.encode('utf-8'))
-
-            # 3. Get the log channel
+            # 1. Get the log channel
             log_channel_id = 1538771506618695750
             log_channel = interaction.guild.get_channel(log_channel_id)
 
-            # 4. Send the JSON file to the log channel
+            # 2. Stream the messages (from oldest to newest) into a compressed transcript and send it
             if log_channel:
-                transcript_file = discord.File(fp=file_bytes, filename=f"{interaction.channel.name}_transcript.json")
-                await log_channel.send(
-                    content=f"📑 Transcript del ticket `{interaction.channel.name}` (Chiuso da {interaction.user.mention})",
-                    file=transcript_file
-                )
+                with TranscriptWriter(interaction.channel.name, as_html=True) as transcript:
+                    await transcript.write_history(interaction.channel)
+                    await log_channel.send(
+                        content=f"📑 Transcript del ticket `{interaction.channel.name}` ({transcript.count} messaggi, chiuso da {interaction.user.mention})",
+                        files=transcript.files()
+                    )
             else:
                 logger.warning(f"Log channel {log_channel_id} non trovato.")
 
-            # 5. Delete the ticket channel
+            # 3. Delete the ticket channel
             await interaction.channel.delete(reason=f"Ticket closed by {interaction.user}")
             logger.info(f"Ticket {interaction.channel.name} closed by {interaction.user.name}.")
 